@@ -4,6 +4,8 @@ from garminconnect import Garmin
 from pathlib import Path
 import logging
 
+from activity.fit_streams import decode_activity_streams
+
 logger = logging.getLogger(__name__)
 
 class Activity(TypedDict):
@@ -110,12 +112,17 @@ def download_fit_file(email: str, password: str, user_id: int, activity_id: int,
             f.write(fit_bytes)
             
         logger.info(f"Downloaded .fit file for activity {activity_id}")
-        return fit_path
-        
     except Exception as e:
         logger.error(f"Failed to download .fit file for activity {activity_id}: {e}")
         return None
 
+    try:
+        decode_activity_streams(fit_path)
+    except Exception as e:
+        # Streams can be decoded later with `python -m src.activity.fit_streams`
+        logger.warning(f"Failed to decode streams for activity {activity_id}: {e}")
+    return fit_path
+
 def fetch_recent_activities(email: str, password: str, user_id: int, start_date: str, end_date: str, activities_dir: Path, store_fit_files: bool = False) -> List[Activity]:
     """Fetch recent activities and their .fit files."""
     client = Garmin(email=email, password=password)
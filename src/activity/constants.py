@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Dict, Set
 from enum import Enum
 
@@ -28,6 +29,14 @@ ACTIVITY_TYPE_MAPPINGS: Dict[ActivityCategory, Set[str]] = {
     },
 }
 
+# Reverse lookup from normalized activity type to category
+CATEGORY_BY_ACTIVITY_TYPE: Dict[str, ActivityCategory] = {
+    activity_type: category
+    for category, types in ACTIVITY_TYPE_MAPPINGS.items()
+    for activity_type in types
+}
+
+@lru_cache(maxsize=1024)
 def get_activity_category(activity_type: str) -> ActivityCategory:
     """
     Maps a specific activity type to its high-level category.
@@ -39,12 +48,24 @@ def get_activity_category(activity_type: str) -> ActivityCategory:
         The high-level ActivityCategory
     """
     activity_type = activity_type.lower().replace(" ", "_")
+    return CATEGORY_BY_ACTIVITY_TYPE.get(activity_type, ActivityCategory.OTHER)
+
+def activity_category_sql(column: str = "activity_type") -> str:
+    """
+    Renders get_activity_category as a SQL CASE expression over a text column.
     
+    Args:
+        column: SQL expression holding the Garmin activity type
+        
+    Returns:
+        SQL expression evaluating to the ActivityCategory value
+    """
+    normalized = f"lower(replace({column}, ' ', '_'))"
+    branches = []
     for category, types in ACTIVITY_TYPE_MAPPINGS.items():
-        if activity_type in types:
-            return category
-            
-    return ActivityCategory.OTHER 
+        type_list = ", ".join(f"'{activity_type}'" for activity_type in sorted(types))
+        branches.append(f"WHEN {normalized} IN ({type_list}) THEN '{category.value}'")
+    return f"CASE {' '.join(branches)} ELSE '{ActivityCategory.OTHER.value}' END"
 
 def is_cycling(activity_type: str) -> bool:
     return get_activity_category(activity_type) == ActivityCategory.CYCLING
@@ -0,0 +1,313 @@
+"""Streaming decoder for the record messages of activity FIT files.
+
+Multi-hour rides and ultra runs produce FIT files of several megabytes.
+`iter_records` and `iter_record_batches` read a file, buffer or binary
+stream in chunks and yield its record messages (one per sample) as they are
+decoded, so memory is bounded by the chunk and batch sizes, not the file
+size.
+
+The header is validated before the first record. The file CRC is computed
+over each chunk as it is read and checked once the last record has been
+decoded, so a corrupt file raises ValueError at the end of the iteration,
+after its records have been yielded. Callers that store what they decode
+should only keep it once iteration completes.
+
+Columns (RECORD_COLUMNS), in the units of the yielded values:
+
+- timestamp: Unix seconds
+- distance: meters; latitude, longitude: degrees
+- speed: m/s; heart_rate: bpm; power: W; cadence: rpm or spm; altitude: meters
+
+Enhanced speed and altitude are used when a record carries them. Only the
+first FIT file of a chained file is read.
+"""
+
+import contextlib
+import io
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.fit_crc import crc16
+
+FitSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 4096
+
+# Seconds between the Unix epoch and the FIT epoch (1989-12-31T00:00:00Z)
+FIT_EPOCH_OFFSET_S = 631065600
+SEMICIRCLES_PER_DEGREE = 2 ** 31 / 180
+
+RECORD_MESSAGE = 20
+TIMESTAMP_FIELD = 253
+
+# Column -> (dtype, scale, offset); value = raw / scale - offset
+RECORD_COLUMNS: Dict[str, Tuple[str, float, float]] = {
+    "timestamp": ("<i8", 1, -FIT_EPOCH_OFFSET_S),
+    "distance": ("<f8", 100, 0),
+    "speed": ("<f4", 1000, 0),
+    "heart_rate": ("<f4", 1, 0),
+    "power": ("<f4", 1, 0),
+    "cadence": ("<f4", 1, 0),
+    "altitude": ("<f4", 5, 500),
+    "latitude": ("<f8", SEMICIRCLES_PER_DEGREE, 0),
+    "longitude": ("<f8", SEMICIRCLES_PER_DEGREE, 0),
+}
+_COLUMN_NAMES = list(RECORD_COLUMNS)
+_TIMESTAMP = _COLUMN_NAMES.index("timestamp")
+
+# Record message field number -> column
+RECORD_FIELDS = {
+    TIMESTAMP_FIELD: "timestamp",
+    0: "latitude",
+    1: "longitude",
+    2: "altitude",
+    3: "heart_rate",
+    4: "cadence",
+    5: "distance",
+    6: "speed",
+    7: "power",
+    73: "speed",  # enhanced_speed
+    78: "altitude",  # enhanced_altitude
+}
+ENHANCED_FIELDS = {73, 78}
+
+# FIT base type -> (struct format, invalid value)
+BASE_TYPES = {
+    0x00: ("B", 0xFF),  # enum
+    0x01: ("b", 0x7F),  # sint8
+    0x02: ("B", 0xFF),  # uint8
+    0x83: ("h", 0x7FFF),  # sint16
+    0x84: ("H", 0xFFFF),  # uint16
+    0x85: ("i", 0x7FFFFFFF),  # sint32
+    0x86: ("I", 0xFFFFFFFF),  # uint32
+    0x88: ("f", None),  # float32, invalid is NaN
+    0x89: ("d", None),  # float64, invalid is NaN
+    0x0A: ("B", 0),  # uint8z
+    0x8B: ("H", 0),  # uint16z
+    0x8C: ("I", 0),  # uint32z
+    0x0D: ("B", 0xFF),  # byte
+    0x8E: ("q", 0x7FFFFFFFFFFFFFFF),  # sint64
+    0x8F: ("Q", 0xFFFFFFFFFFFFFFFF),  # uint64
+    0x90: ("Q", 0),  # uint64z
+}
+
+
+class _Definition:
+    """Unpacks a local message type's data messages into the fields we keep."""
+    __slots__ = ("global_number", "unpack", "size", "fields", "timestamp_index")
+
+    def __init__(self, global_number: int, big_endian: bool, fields: bytes, developer_size: int):
+        self.global_number = global_number
+        wanted = RECORD_FIELDS if global_number == RECORD_MESSAGE else {TIMESTAMP_FIELD: "timestamp"}
+        formats = [">" if big_endian else "<"]
+        chosen: Dict[str, Tuple[int, int, Optional[int]]] = {}  # column -> (field number, index, invalid)
+        index = 0
+        for i in range(0, len(fields), 3):
+            number, size, base_type = fields[i], fields[i + 1], fields[i + 2]
+            column = wanted.get(number)
+            fmt, invalid = BASE_TYPES.get(base_type, (None, None))
+            # Arrays and unknown types are skipped
+            if column is None or fmt is None or struct.calcsize(fmt) != size:
+                formats.append(f"{size}x")
+                continue
+            formats.append(fmt)
+            if column not in chosen or number in ENHANCED_FIELDS:
+                chosen[column] = (number, index, invalid)
+            index += 1
+        if developer_size:
+            formats.append(f"{developer_size}x")
+        packed = struct.Struct("".join(formats))
+        self.unpack = packed.unpack_from
+        self.size = packed.size
+        # (position in a row of _COLUMN_NAMES, index in the unpacked values, invalid value)
+        self.fields = [(_COLUMN_NAMES.index(column), index, invalid) for column, (_, index, invalid) in chosen.items()]
+        self.timestamp_index = chosen["timestamp"][1] if "timestamp" in chosen else None
+
+
+class _ChunkedReader:
+    """Reads a FIT file's record section in chunks, computing its CRC as it goes."""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        header = self._read_exact(12, "header")
+        header_size, data_size, signature = header[0], struct.unpack_from("<I", header, 4)[0], header[8:12]
+        if signature != b".FIT" or header_size not in (12, 14):
+            raise ValueError("Not a FIT file: bad header")
+        if header_size == 14:
+            header_crc = struct.unpack("<H", self._read_exact(2, "header"))[0]
+            if header_crc and header_crc != crc16(header):
+                raise ValueError("FIT header CRC mismatch")
+            header += struct.pack("<H", header_crc)
+        self.crc = crc16(header)
+        self.remaining = data_size  # record bytes not read yet
+
+    def _read_exact(self, size: int, part: str) -> bytes:
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise ValueError(f"FIT file is truncated in its {part}")
+        return data
+
+    def refill(self, buf: bytes, pos: int, needed: int) -> bytes:
+        """Return buf[pos:] extended with new chunks to at least `needed` bytes."""
+        parts = [buf[pos:]]
+        available = len(parts[0])
+        while available < needed:
+            if self.remaining == 0:
+                raise ValueError("FIT message runs past the end of the records")
+            chunk = self.stream.read(min(max(self.chunk_size, needed - available), self.remaining))
+            if not chunk:
+                raise ValueError("FIT file is truncated in its records")
+            self.remaining -= len(chunk)
+            self.crc = crc16(chunk, self.crc)
+            parts.append(chunk)
+            available += len(chunk)
+        return b"".join(parts)
+
+    def check_crc(self) -> None:
+        if struct.unpack("<H", self._read_exact(2, "CRC"))[0] != self.crc:
+            raise ValueError("FIT file CRC mismatch")
+
+
+def _open(source: FitSource):
+    if isinstance(source, (str, Path)):
+        return open(source, "rb")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    # Caller-owned streams are left open
+    return contextlib.nullcontext(source)
+
+
+def _iter_raw_records(source: FitSource, chunk_size: int) -> Iterator[List]:
+    """Yield each record message as a row of raw values in _COLUMN_NAMES order, None where not recorded."""
+    with _open(source) as stream:
+        reader = _ChunkedReader(stream, chunk_size)
+        definitions: Dict[int, _Definition] = {}
+        last_timestamp = None
+        buf, pos = b"", 0
+        while pos < len(buf) or reader.remaining:
+            if pos >= len(buf):
+                buf, pos = reader.refill(buf, pos, 1), 0
+            header = buf[pos]
+            if header & 0x80:
+                # Compressed timestamp header: 5-bit offset from the last full timestamp
+                definition = definitions.get((header >> 5) & 0x03)
+                if last_timestamp is None:
+                    raise ValueError("FIT compressed timestamp has no full timestamp before it")
+                offset = header & 0x1F
+                timestamp = (last_timestamp & ~0x1F) + offset
+                if offset < last_timestamp & 0x1F:
+                    timestamp += 0x20
+            elif header & 0x40:
+                if pos + 6 > len(buf):
+                    buf, pos = reader.refill(buf, pos, 6), 0
+                big_endian = buf[pos + 2] == 1
+                global_number, num_fields = struct.unpack_from(">HB" if big_endian else "<HB", buf, pos + 3)
+                size = 6 + 3 * num_fields + (1 if header & 0x20 else 0)
+                if pos + size > len(buf):
+                    buf, pos = reader.refill(buf, pos, size), 0
+                fields = buf[pos + 6:pos + 6 + 3 * num_fields]
+                developer_size = 0
+                if header & 0x20:
+                    num_developer_fields = buf[pos + size - 1]
+                    if pos + size + 3 * num_developer_fields > len(buf):
+                        buf, pos = reader.refill(buf, pos, size + 3 * num_developer_fields), 0
+                    developer_size = sum(buf[pos + size + 1:pos + size + 3 * num_developer_fields:3])
+                    size += 3 * num_developer_fields
+                definitions[header & 0x0F] = _Definition(global_number, big_endian, fields, developer_size)
+                pos += size
+                continue
+            else:
+                definition = definitions.get(header & 0x0F)
+                timestamp = None
+            if definition is None:
+                raise ValueError(f"FIT data message for local type {header & 0x0F} has no definition")
+
+            if pos + 1 + definition.size > len(buf):
+                buf, pos = reader.refill(buf, pos, 1 + definition.size), 0
+            values = definition.unpack(buf, pos + 1)
+            pos += 1 + definition.size
+            if definition.timestamp_index is not None:
+                recorded = values[definition.timestamp_index]
+                if recorded != 0xFFFFFFFF:
+                    timestamp = recorded
+            if timestamp is not None:
+                last_timestamp = timestamp
+            if definition.global_number != RECORD_MESSAGE or last_timestamp is None:
+                continue
+
+            row = [None] * len(_COLUMN_NAMES)
+            for column, index, invalid in definition.fields:
+                value = values[index]
+                if value != invalid:
+                    row[column] = value
+            row[_TIMESTAMP] = last_timestamp
+            yield row
+        reader.check_crc()
+
+
+def iter_records(source: FitSource, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Optional[float]]]:
+    """Yield each record message as {column: value}, with None for values not recorded.
+
+    Args:
+        source: Path, bytes-like buffer or binary stream of a FIT file
+        chunk_size: Bytes read from the source at a time
+
+    Raises:
+        ValueError: if the file is not a FIT file, is truncated or fails its CRC
+    """
+    scales = [RECORD_COLUMNS[column][1:] for column in _COLUMN_NAMES]
+    for row in _iter_raw_records(source, chunk_size):
+        record = {}
+        for column, value, (scale, offset) in zip(_COLUMN_NAMES, row, scales):
+            record[column] = None if value is None else value / scale - offset
+        record["timestamp"] = row[_TIMESTAMP] + FIT_EPOCH_OFFSET_S
+        yield record
+
+
+def iter_record_batches(
+    source: FitSource,
+    batch_size: int = BATCH_SIZE,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield record messages as {column: array} batches of batch_size samples (the last may be shorter).
+
+    Values not recorded are NaN. Arrays have the dtypes of RECORD_COLUMNS.
+
+    Args:
+        source: Path, bytes-like buffer or binary stream of a FIT file
+        batch_size: Samples per batch
+        chunk_size: Bytes read from the source at a time
+
+    Raises:
+        ValueError: if the file is not a FIT file, is truncated or fails its CRC
+    """
+    rows = []
+    for row in _iter_raw_records(source, chunk_size):
+        rows.append(row)
+        if len(rows) == batch_size:
+            yield _to_batch(rows)
+            rows = []
+    if rows:
+        yield _to_batch(rows)
+
+
+def empty_batch() -> Dict[str, np.ndarray]:
+    """A batch with no samples."""
+    return {column: np.empty(0, dtype=dtype) for column, (dtype, _, _) in RECORD_COLUMNS.items()}
+
+
+def _to_batch(rows: List[List]) -> Dict[str, np.ndarray]:
+    batch = {}
+    for column, raw in zip(_COLUMN_NAMES, zip(*rows)):
+        dtype, scale, offset = RECORD_COLUMNS[column]
+        if np.dtype(dtype).kind == "i":
+            batch[column] = (np.array(raw, dtype=np.int64) // scale - offset).astype(dtype)
+        else:
+            # None (not recorded) becomes NaN
+            batch[column] = (np.array(raw, dtype=np.float64) / scale - offset).astype(dtype)
+    return batch
@@ -0,0 +1,210 @@
+"""Columnar per-second streams decoded from activity FIT files.
+
+download_fit_file stores each activity's original FIT file.
+`decode_activity_streams` streams the file's record messages (one per
+sample, normally one per second) through fit_reader in fixed-size batches
+and stores them as one array per stream in a .streams file next to the FIT
+file. `load_streams` maps the arrays back without decoding anything.
+
+Garmin's original-format downloads are zip archives holding the FIT file;
+`decode_activity_streams` reads either.
+
+Streams are the columns of fit_reader.RECORD_COLUMNS, in recording order.
+A value the device didn't record for a sample is NaN.
+
+.streams layout (little endian):
+
+- 8 bytes: STREAMS_MAGIC
+- uint32: length of the JSON header that follows
+- JSON header: {"num_samples": n, "columns": {name: {"dtype", "offset"}}}
+- each column's n values, starting at its offset, which is a multiple of 64
+
+Usage:
+    python -m src.activity.fit_streams <fit file or directory>...
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import shutil
+import struct
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from activity.fit_reader import BATCH_SIZE, CHUNK_SIZE, RECORD_COLUMNS, FitSource, empty_batch, iter_record_batches
+
+logger = logging.getLogger(__name__)
+
+STREAMS_SUFFIX = ".streams"
+STREAMS_MAGIC = b"FITSTRM1"
+COLUMN_ALIGNMENT = 64
+STREAM_DTYPES = {column: dtype for column, (dtype, _, _) in RECORD_COLUMNS.items()}
+
+
+def decode_records(source: FitSource) -> Dict[str, np.ndarray]:
+    """Decode all of a FIT file's record messages into one array per column of RECORD_COLUMNS.
+
+    Raises:
+        ValueError: if the file is not a FIT file, is truncated or fails its CRC
+    """
+    batches = list(iter_record_batches(source))
+    if not batches:
+        return empty_batch()
+    return {column: np.concatenate([batch[column] for batch in batches]) for column in RECORD_COLUMNS}
+
+
+def streams_path_for(fit_path: Path) -> Path:
+    """The .streams file stored next to an activity's FIT file."""
+    return Path(fit_path).with_suffix(STREAMS_SUFFIX)
+
+
+def write_streams(path: Path, streams: Dict[str, np.ndarray]) -> None:
+    """Store equal-length arrays as a .streams file."""
+    write_stream_batches(path, [streams])
+
+
+def write_stream_batches(
+    path: Path,
+    batches: Iterable[Dict[str, np.ndarray]],
+    dtypes: Optional[Dict[str, str]] = None
+) -> None:
+    """Store consecutive batches of equal-length arrays as the columns of a .streams file.
+
+    Each column is spooled to a temporary file as batches arrive, so only one
+    batch is held in memory.
+
+    Args:
+        path: .streams file to write
+        batches: {column: array} batches, all with the same columns
+        dtypes: Stored dtype of each column (default: the first batch's dtypes)
+    """
+    def aligned(offset):
+        return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+    # Written under a temporary name and swapped in, so readers never map a partial file
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    spools: Dict[str, BinaryIO] = {}
+    try:
+        num_samples = 0
+        for batch in batches:
+            lengths = {len(values) for values in batch.values()}
+            if len(lengths) > 1:
+                raise ValueError(f"Streams have different lengths: {sorted(lengths)}")
+            if dtypes is None:
+                dtypes = {column: np.asarray(values).dtype.str for column, values in batch.items()}
+            if set(batch) != set(dtypes):
+                raise ValueError(f"Batch columns {sorted(batch)} differ from {sorted(dtypes)}")
+            for column, values in batch.items():
+                if column not in spools:
+                    spools[column] = tempfile.TemporaryFile(dir=path.parent)
+                np.ascontiguousarray(values, dtype=dtypes[column]).tofile(spools[column])
+            num_samples += lengths.pop() if lengths else 0
+        dtypes = {column: np.dtype(dtype).str for column, dtype in (dtypes or {}).items()}
+
+        # The header's length depends on the offsets it lists, so size it with placeholder offsets first
+        placeholder = {column: {"dtype": dtype, "offset": 10 ** 12} for column, dtype in dtypes.items()}
+        offset = aligned(len(STREAMS_MAGIC) + 4 + len(json.dumps({"num_samples": num_samples, "columns": placeholder})))
+        columns = {}
+        for column, dtype in dtypes.items():
+            columns[column] = {"dtype": dtype, "offset": offset}
+            offset = aligned(offset + num_samples * np.dtype(dtype).itemsize)
+        header = json.dumps({"num_samples": num_samples, "columns": columns}).encode("utf-8")
+
+        with open(tmp_path, "wb") as f:
+            f.write(STREAMS_MAGIC + struct.pack("<I", len(header)) + header)
+            for column, spool in spools.items():
+                f.seek(columns[column]["offset"])
+                spool.seek(0)
+                shutil.copyfileobj(spool, f, CHUNK_SIZE)
+            f.truncate(offset)
+        tmp_path.replace(path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+
+def load_streams(path: Path) -> Dict[str, np.ndarray]:
+    """Map a .streams file's columns as read-only arrays."""
+    with open(path, "rb") as f:
+        if f.read(len(STREAMS_MAGIC)) != STREAMS_MAGIC:
+            raise ValueError(f"{path} is not a streams file")
+        header = json.loads(f.read(struct.unpack("<I", f.read(4))[0]))
+    num_samples = header["num_samples"]
+    if num_samples == 0:
+        return {name: np.empty(0, dtype=column["dtype"]) for name, column in header["columns"].items()}
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    streams = {}
+    for name, column in header["columns"].items():
+        dtype = np.dtype(column["dtype"])
+        start = column["offset"]
+        streams[name] = mapped[start:start + num_samples * dtype.itemsize].view(dtype)
+    return streams
+
+
+def decode_activity_streams(fit_path: Path, overwrite: bool = False, batch_size: int = BATCH_SIZE) -> Path:
+    """Decode an activity FIT file into the .streams file next to it.
+
+    Memory use is bounded by `batch_size`, not by the size of the activity.
+
+    Args:
+        fit_path: Downloaded activity FIT file
+        overwrite: Decode again even if the .streams file is newer than the FIT file
+        batch_size: Samples decoded at a time
+    """
+    fit_path = Path(fit_path)
+    path = streams_path_for(fit_path)
+    if not overwrite and path.exists() and path.stat().st_mtime >= fit_path.stat().st_mtime:
+        return path
+    with _open_fit_file(fit_path) as stream:
+        write_stream_batches(path, iter_record_batches(stream, batch_size), STREAM_DTYPES)
+    return path
+
+
+@contextlib.contextmanager
+def _open_fit_file(fit_path: Path) -> Iterator[BinaryIO]:
+    """Open a FIT file, or the FIT file inside a Garmin zip download."""
+    with open(fit_path, "rb") as f:
+        if f.read(2) != b"PK":
+            f.seek(0)
+            yield f
+            return
+        f.seek(0)
+        with zipfile.ZipFile(f) as archive:
+            names = [name for name in archive.namelist() if name.lower().endswith(".fit")]
+            if not names:
+                raise ValueError("Zip archive holds no FIT file")
+            with archive.open(names[0]) as member:
+                yield member
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Decode activity FIT files into .streams files.")
+    parser.add_argument("paths", nargs="+", type=Path, help="FIT files, or directories of them")
+    parser.add_argument("--overwrite", action="store_true", help="Decode files that are already decoded")
+    args = parser.parse_args(argv)
+
+    fit_paths: List[Path] = []
+    for path in args.paths:
+        fit_paths.extend(sorted(path.glob("*.fit")) if path.is_dir() else [path])
+    failed = 0
+    for fit_path in fit_paths:
+        try:
+            streams_path = decode_activity_streams(fit_path, overwrite=args.overwrite)
+            logger.info(f"Decoded {fit_path} -> {streams_path}")
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to decode {fit_path}: {e}")
+    logger.info(f"Decoded {len(fit_paths) - failed} of {len(fit_paths)} FIT files")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
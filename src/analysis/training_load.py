@@ -0,0 +1,124 @@
+"""Fitness, fatigue and form from daily training load.
+
+Acute training load (ATL, fatigue) and chronic training load (CTL, fitness)
+are exponentially weighted moving averages of the daily sum of
+`activity_training_load`, with time constants of 7 and 42 days:
+
+    load_avg[d] = load_avg[d-1] + (load[d] - load_avg[d-1]) * (1 - exp(-1 / tau))
+
+Training stress balance (TSB, form) is yesterday's CTL minus yesterday's ATL,
+so a hard session lowers form from the next day on.
+
+`advance` moves a state forward by one day in O(1), and over a run of rest
+days in O(1) as well. `ewma` computes a whole series with NumPy for
+rebuilds; both produce the same values up to float rounding.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ATL_TIME_CONSTANT = 7
+CTL_TIME_CONSTANT = 42
+
+# Days per closed-form block in ewma. Keeps decay**-i far from overflow.
+EWMA_BLOCK_DAYS = 256
+
+
+def _alpha(time_constant: float) -> float:
+    return 1 - math.exp(-1 / time_constant)
+
+
+@dataclass(frozen=True)
+class TrainingLoadState:
+    """Fitness and fatigue at the end of a day."""
+    day: date
+    training_load: float  # sum of activity_training_load on the day
+    atl: float
+    ctl: float
+    tsb: float  # CTL - ATL at the end of the previous day
+
+    @classmethod
+    def initial(cls, day: date) -> "TrainingLoadState":
+        """State before any training: the day before the first recorded day."""
+        return cls(day=day, training_load=0.0, atl=0.0, ctl=0.0, tsb=0.0)
+
+
+def advance(state: TrainingLoadState, day: date, training_load: float) -> TrainingLoadState:
+    """Return the state at the end of `day` given the state at the end of an earlier day.
+
+    Days between the two carry no training and decay both averages in one step.
+    """
+    gap = (day - state.day).days
+    if gap < 1:
+        raise ValueError(f"Cannot advance training load state from {state.day} to {day}")
+
+    atl_decay = math.exp(-1 / ATL_TIME_CONSTANT)
+    ctl_decay = math.exp(-1 / CTL_TIME_CONSTANT)
+    # State at the end of the previous day, after gap - 1 rest days
+    atl = state.atl * atl_decay ** (gap - 1)
+    ctl = state.ctl * ctl_decay ** (gap - 1)
+    return TrainingLoadState(
+        day=day,
+        training_load=training_load,
+        atl=atl + (training_load - atl) * _alpha(ATL_TIME_CONSTANT),
+        ctl=ctl + (training_load - ctl) * _alpha(CTL_TIME_CONSTANT),
+        tsb=ctl - atl,
+    )
+
+
+def ewma(loads: np.ndarray, time_constant: float, initial: float = 0.0) -> np.ndarray:
+    """Exponentially weighted moving average of a daily series, vectorized.
+
+    Within each block the recurrence y[i] = d * y[i-1] + a * x[i] has the
+    closed form y[i] = d**(i+1) * y[-1] + a * d**i * cumsum(x[j] / d**j).
+
+    Args:
+        loads: Training load per consecutive day
+        time_constant: Days for the average to decay by a factor of e
+        initial: Average at the end of the day before loads[0]
+
+    Returns:
+        Average at the end of each day
+    """
+    alpha = _alpha(time_constant)
+    decay = 1 - alpha
+    result = np.empty(len(loads))
+    previous = initial
+    powers = decay ** np.arange(EWMA_BLOCK_DAYS)
+    for start in range(0, len(loads), EWMA_BLOCK_DAYS):
+        block = np.asarray(loads[start:start + EWMA_BLOCK_DAYS], dtype=np.float64)
+        block_powers = powers[:len(block)]
+        values = block_powers * (alpha * np.cumsum(block / block_powers) + decay * previous)
+        result[start:start + len(block)] = values
+        previous = values[-1]
+    return result
+
+
+def compute_series(
+    first_day: date,
+    loads: np.ndarray,
+    previous: Optional[TrainingLoadState] = None
+) -> Tuple[List[date], np.ndarray, np.ndarray, np.ndarray]:
+    """Compute ATL, CTL and TSB for consecutive days starting at first_day.
+
+    Args:
+        first_day: Day of loads[0]
+        loads: Training load per consecutive day
+        previous: State at the end of the day before first_day (default: no training)
+
+    Returns:
+        (days, atl, ctl, tsb) with one entry per day
+    """
+    previous = previous or TrainingLoadState.initial(first_day - timedelta(days=1))
+    if previous.day != first_day - timedelta(days=1):
+        # Decay across rest days up to the day before first_day
+        previous = advance(previous, first_day - timedelta(days=1), 0.0)
+    atl = ewma(loads, ATL_TIME_CONSTANT, previous.atl)
+    ctl = ewma(loads, CTL_TIME_CONSTANT, previous.ctl)
+    tsb = np.concatenate(([previous.ctl - previous.atl], (ctl - atl)[:-1]))[:len(loads)]
+    days = [first_day + timedelta(days=i) for i in range(len(loads))]
+    return days, atl, ctl, tsb
@@ -0,0 +1,127 @@
+"""Set-based weekly summary backfill.
+
+`WeeklySummaryCalculator` handles one week per call: one SELECT, a Python
+aggregation pass and one upsert. `WeeklySummaryBackfill` reads the
+daily_summary rows of every week in a range with a single query and writes
+the results with a single multi-row upsert. Both compose a week from its
+daily rows with `compose_weekly_metrics`, so they produce the same
+`WeeklySummary` objects.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from analysis.weekly_summary import WeeklySummary
+from analysis.weekly_summary_engine import compose_weekly_metrics
+from database.daily_summary_db import DailySummaryDB
+from database.dirty_weeks_db import DirtyWeeksDB
+from database.rollup_db import RollupDB
+from database.training_load_db import TrainingLoadDB
+from database.weekly_summary_db import WeeklySummaryDB
+
+
+def week_start_for(day: datetime) -> datetime:
+    """Return midnight on the Monday of the week containing `day`."""
+    week_start = day - timedelta(days=day.weekday())
+    return week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def week_end_for(week_start: datetime) -> datetime:
+    """Return the last second of the week starting at `week_start`."""
+    return week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
+
+
+def completed_week_starts(start_date: datetime, current_date: Optional[datetime] = None) -> List[datetime]:
+    """List the Monday of every completed week from `start_date` up to the most recent Sunday.
+
+    Weeks that are still in progress are not included.
+    """
+    current_date = current_date or datetime.now()
+    week_start = week_start_for(start_date)
+    most_recent_sunday = current_date - timedelta(days=current_date.weekday() + 1)
+
+    week_starts = []
+    while week_start <= most_recent_sunday:
+        week_starts.append(week_start)
+        week_start += timedelta(days=7)
+    return week_starts
+
+
+class WeeklySummaryBackfill:
+    """Computes and stores weekly summaries for many weeks at once."""
+
+    def __init__(
+        self,
+        athlete_id: int,
+        weekly_summary_db: Optional[WeeklySummaryDB] = None,
+        dirty_weeks_db: Optional[DirtyWeeksDB] = None,
+        rollup_db: Optional[RollupDB] = None,
+        training_load_db: Optional[TrainingLoadDB] = None,
+        daily_summary_db: Optional[DailySummaryDB] = None
+    ):
+        self.athlete_id = athlete_id
+        self.weekly_summary_db = weekly_summary_db or WeeklySummaryDB()
+        self.dirty_weeks_db = dirty_weeks_db or DirtyWeeksDB()
+        self.rollup_db = rollup_db or RollupDB()
+        self.training_load_db = training_load_db or TrainingLoadDB()
+        self.daily_summary_db = daily_summary_db or DailySummaryDB()
+
+    def fetch_daily_summaries(self, week_starts: Sequence[datetime]) -> Dict[datetime, List[Any]]:
+        """Read the daily_summary rows of all requested weeks with one query.
+
+        Returns:
+            Mapping of week start to its daily rows, oldest first. Weeks without activities are omitted.
+        """
+        if not week_starts:
+            return {}
+
+        days = self.daily_summary_db.get_days(
+            self.athlete_id,
+            min(week_starts).date(),
+            (max(week_starts) + timedelta(days=6)).date()
+        )
+        requested = set(week_starts)
+        weeks: Dict[datetime, List[Any]] = {}
+        for day in days:
+            week_start = week_start_for(datetime.combine(day.day, datetime.min.time()))
+            if week_start in requested:
+                weeks.setdefault(week_start, []).append(day)
+        return weeks
+
+    def compute(self, week_starts: Sequence[datetime]) -> List[WeeklySummary]:
+        """Compute summaries for the given week starts (Mondays at midnight)."""
+        weeks = self.fetch_daily_summaries(week_starts)
+        return [
+            self._build_summary(week_start, weeks.get(week_start, []))
+            for week_start in sorted(week_starts)
+        ]
+
+    def run(self, week_starts: Sequence[datetime]) -> List[WeeklySummary]:
+        """Compute summaries for the given weeks, store them with one upsert and
+        refresh the daily training load series and the rollups that include them.
+
+        Dirty marks for these weeks are claimed before computing, so weeks
+        changed by ingest while this runs are marked again and refreshed later.
+        """
+        claimed = self.dirty_weeks_db.claim(self.athlete_id, week_starts).get(self.athlete_id, [])
+        try:
+            summaries = self.compute(week_starts)
+            self.weekly_summary_db.upsert_weekly_summaries(summaries)
+            if week_starts:
+                self.training_load_db.refresh(self.athlete_id, from_day=min(week_starts).date())
+            self.rollup_db.refresh_for_weeks(self.athlete_id, week_starts)
+        except Exception:
+            # Leave the weeks dirty so the next refresh retries them
+            self.dirty_weeks_db.mark((self.athlete_id, week_start) for week_start in claimed)
+            raise
+        return summaries
+
+    def _build_summary(self, week_start: datetime, days: Sequence[Any]) -> WeeklySummary:
+        """Compose one week's daily rows into a WeeklySummary, matching WeeklySummaryCalculator output."""
+        return WeeklySummary(
+            summary_id=f"{self.athlete_id}_{week_start.strftime('%m_%d_%Y')}",
+            athlete_id=self.athlete_id,
+            start_date=week_start,
+            end_date=week_end_for(week_start),
+            **compose_weekly_metrics(days)
+        )
@@ -0,0 +1,83 @@
+"""Weekly summary metrics composed from daily_summary rows.
+
+`compose_weekly_metrics` combines a week's daily_summary rows (at most
+seven, however many activities the week has) into every `WeeklySummary`
+metric field. Zone totals are returned as `ZoneVector`s; their formatted
+strings are derived by `WeeklySummary` when read.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from analysis.zone_vector import ZONES, ZoneVector
+from utils.data_processing import format_seconds_to_time_string
+
+SPORTS = ("cycling", "running", "swimming")
+# Sports that carry power zone totals in WeeklySummary
+POWER_SPORTS = ("cycling", "running")
+
+
+def _zone_total(days: Sequence[Any], column: str) -> ZoneVector:
+    totals = [0.0] * len(ZONES)
+    for day in days:
+        for i, seconds in enumerate(day[column]):
+            totals[i] += seconds
+    return ZoneVector(totals)
+
+
+def _present(days: Sequence[Any], column: str) -> List[float]:
+    return [day[column] for day in days if day[column] is not None]
+
+
+def compose_weekly_metrics(days: Sequence[Any]) -> Dict[str, Any]:
+    """Compute WeeklySummary metric fields from a week's daily_summary rows.
+
+    Args:
+        days: The week's daily_summary rows (records or dicts), oldest first.
+            Days without activities have no row.
+
+    Returns:
+        Dict of WeeklySummary fields (all but id and dates)
+    """
+    metrics: Dict[str, Any] = {
+        "num_sessions": sum(day["num_sessions"] for day in days),
+        "total_duration_seconds": sum(day["total_duration_seconds"] for day in days),
+        "total_distance_meters": sum(day["total_distance_meters"] for day in days),
+        "total_training_load": sum(day["total_training_load"] for day in days),
+        "time_in_hr_zones": _zone_total(days, "time_in_hr_zones"),
+        "time_in_power_zones": _zone_total(days, "time_in_power_zones"),
+    }
+    metrics["total_duration_formatted"] = format_seconds_to_time_string(metrics["total_duration_seconds"])
+    metrics["total_distance_formatted"] = f"{metrics['total_distance_meters'] / 1000:.2f} km"
+
+    for sport in SPORTS:
+        metrics[f"num_sessions_{sport}"] = sum(day[f"num_sessions_{sport}"] for day in days)
+        metrics[f"total_duration_{sport}_seconds"] = sum(day[f"total_duration_{sport}_seconds"] for day in days)
+        metrics[f"total_duration_{sport}_formatted"] = format_seconds_to_time_string(
+            metrics[f"total_duration_{sport}_seconds"]
+        )
+        metrics[f"total_training_load_{sport}"] = sum(day[f"total_training_load_{sport}"] for day in days)
+        metrics[f"time_in_hr_zones_{sport}"] = _zone_total(days, f"time_in_hr_zones_{sport}")
+        if sport in POWER_SPORTS:
+            metrics[f"time_in_power_zones_{sport}"] = _zone_total(days, f"time_in_power_zones_{sport}")
+
+    best_5k = min(_present(days, "best_5k_time"), default=None)
+    best_10k = min(_present(days, "best_10k_time"), default=None)
+    metrics.update({
+        "best_5k_time": best_5k,
+        "best_10k_time": best_10k,
+        "best_5k_formatted": format_seconds_to_time_string(best_5k),
+        "best_10k_formatted": format_seconds_to_time_string(best_10k),
+    })
+
+    firsts = _present(days, "vo2max_first")
+    lasts = _present(days, "vo2max_last")
+    start: Optional[float] = firsts[0] if firsts else None
+    end: Optional[float] = lasts[-1] if lasts else None
+    metrics.update({
+        "vo2max_start": start,
+        "vo2max_end": end,
+        "vo2max_change": end - start if start is not None else None,
+        "vo2max_max": max(_present(days, "vo2max_max"), default=None),
+        "vo2max_min": min(_present(days, "vo2max_min"), default=None),
+    })
+    return metrics
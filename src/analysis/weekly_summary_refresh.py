@@ -0,0 +1,40 @@
+"""Incremental weekly summary maintenance.
+
+Ingest (`ActivityDB.upsert_activities` / `bulk_load_activities`) marks every
+(athlete, week) bucket whose activities changed in `weekly_summary_dirty`.
+`refresh_dirty_weeks` recomputes only those weeks, including the week that
+is still in progress, so summaries stay fresh without re-running backfills.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from analysis.weekly_summary import WeeklySummary
+from analysis.weekly_summary_backfill import WeeklySummaryBackfill
+from database.dirty_weeks_db import DirtyWeeksDB
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_dirty_weeks(
+    athlete_id: Optional[int] = None,
+    dirty_weeks_db: Optional[DirtyWeeksDB] = None
+) -> Dict[int, List[WeeklySummary]]:
+    """Recompute and store the summaries of all dirty weeks.
+
+    Args:
+        athlete_id: Only refresh this athlete's weeks (default: every athlete)
+        dirty_weeks_db: Optional DirtyWeeksDB instance to use
+
+    Returns:
+        Refreshed summaries grouped by athlete ID
+    """
+    dirty_weeks_db = dirty_weeks_db or DirtyWeeksDB()
+    refreshed = {}
+
+    for dirty_athlete_id, week_starts in dirty_weeks_db.pending(athlete_id).items():
+        backfill = WeeklySummaryBackfill(dirty_athlete_id, dirty_weeks_db=dirty_weeks_db)
+        refreshed[dirty_athlete_id] = backfill.run(week_starts)
+        logger.info(f"Refreshed {len(week_starts)} weekly summaries for athlete {dirty_athlete_id}")
+
+    return refreshed
@@ -0,0 +1,80 @@
+"""Fixed-length time-in-zone vectors.
+
+Weekly summaries carry seconds in zones 1-5 for several sport and zone type
+combinations. `ZoneVector` holds the five values in an `array('d')`, which
+maps directly onto a FLOAT8[] column. The string-keyed dicts and HH:MM:SS
+strings used by API responses are derived from it when needed, so they are
+never stored.
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from utils.data_processing import format_seconds_to_time_string
+
+ZONES = range(1, 6)
+
+
+class ZoneVector:
+    """Seconds spent in zones 1-5."""
+    __slots__ = ("_seconds",)
+
+    def __init__(self, seconds: Optional[Iterable[float]] = None):
+        self._seconds = array("d", seconds if seconds is not None else (0.0,) * len(ZONES))
+        if len(self._seconds) != len(ZONES):
+            raise ValueError(f"ZoneVector needs {len(ZONES)} values, got {len(self._seconds)}")
+
+    @classmethod
+    def from_dict(cls, zones: Dict[Union[str, int], float]) -> "ZoneVector":
+        """Build from a {"1": seconds, ...} mapping; missing zones are 0."""
+        return cls(float(zones.get(str(zone), zones.get(zone, 0.0)) or 0.0) for zone in ZONES)
+
+    def __getitem__(self, zone: int) -> float:
+        """Seconds in `zone` (1-5)."""
+        if zone not in ZONES:
+            raise IndexError(f"Zone {zone} out of range")
+        return self._seconds[zone - 1]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._seconds)
+
+    def __len__(self) -> int:
+        return len(self._seconds)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ZoneVector):
+            return self._seconds == other._seconds
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ZoneVector({self._seconds.tolist()})"
+
+    # Slotted classes need explicit state for pickling/copying
+    def __getstate__(self):
+        return self._seconds.tolist()
+
+    def __setstate__(self, state) -> None:
+        self._seconds = array("d", state)
+
+    @property
+    def total(self) -> float:
+        return sum(self._seconds)
+
+    def tolist(self):
+        """Values as a list, which psycopg2 adapts to a FLOAT8[] array."""
+        return self._seconds.tolist()
+
+    def to_dict(self) -> Dict[str, float]:
+        """{"1": seconds, ..., "5": seconds}, the shape of the API responses."""
+        return {str(zone): seconds for zone, seconds in zip(ZONES, self._seconds.tolist())}
+
+    def formatted(self, has_activities: bool = True) -> Dict[str, Union[str, float]]:
+        """Each zone as HH:MM:SS.
+
+        Args:
+            has_activities: False for a sport without activities that week, whose
+                zones are reported as 0.0 placeholders instead of formatted times
+        """
+        if not has_activities:
+            return {str(zone): 0.0 for zone in ZONES}
+        return {str(zone): format_seconds_to_time_string(seconds) for zone, seconds in zip(ZONES, self._seconds.tolist())}
@@ -1,3 +1,4 @@
+from concurrent.futures import Executor
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
@@ -6,6 +7,7 @@ from collections import defaultdict
 
 from activity.Activity import Activity, fetch_recent_activities
 from database.activities_db import ActivityDB
+from database.training_load_db import TrainingLoadDB
 from utils.fit_file_generator import FitFileGenerator
 from schemas.training_plan import TrainingPlan, Workout
 from utils.types import TrainingPlanInput, GoalEvent, TimeTrial
@@ -13,7 +15,8 @@ from api_factory import create_api
 from utils.upload_fit_file import upload_workout
 import logging
 import json
-from analysis.weekly_summary import WeeklySummaryCalculator
+from analysis.weekly_summary_backfill import WeeklySummaryBackfill, completed_week_starts
+from analysis.weekly_summary_refresh import refresh_dirty_weeks
 
 
 @dataclass
@@ -21,9 +24,10 @@ class WorkoutFile:
     """Container for workout file information."""
     workout_id: str          # Format: week{n}_{date}_{type}
     external_id: str         # Format: {athlete_id}_week{n}_{date}_{type}
-    fit_file_path: Path
+    fit_file_path: Optional[Path]  # None when workout files are not persisted
     scheduled_date: str
     week_number: int
+    fit_bytes: Optional[bytes] = None  # encoded file, kept in memory when not persisted
 
 class Athlete:
     def __init__(
@@ -33,7 +37,8 @@ class Athlete:
         password: str, 
         intervals_icu_id: str,
         training_plan_input: TrainingPlanInput,
-        training_plan_dir: str
+        training_plan_dir: str,
+        persist_workout_files: bool = True
     ) -> None:
         """Initialize an Athlete instance.
 
@@ -44,6 +49,8 @@ class Athlete:
             intervals_icu_id: Athlete's intervals.icu ID
             training_plan_input: Input parameters for generating training plan
             training_plan_dir: Directory path where workout files will be stored
+            persist_workout_files: Write generated .fit files to the workout directory.
+                If False they are kept in memory and uploaded from there.
 
         Returns:
             None
@@ -67,6 +74,7 @@ class Athlete:
 
         # Initialize database connection
         self.activity_db = ActivityDB()
+        self.training_load_db = TrainingLoadDB()
 
         # Load current plan if it exists
         self.current_plan = self._load_plan()
@@ -75,8 +83,10 @@ class Athlete:
         self.logger = logging.getLogger(__name__)
 
         # fit file generation related fields
-        self.fit_generator = FitFileGenerator(self.workout_dir) # .fit files are stored in self.workout_dir
+        # .fit files are stored in self.workout_dir, or only kept in memory
+        self.fit_generator = FitFileGenerator(self.workout_dir if persist_workout_files else None)
         self.workout_files: Dict[str, WorkoutFile] = {}  # workout_id -> WorkoutFile
+        self.workout_file_errors: Dict[str, str] = {}  # workout_id -> error of the last generation
 
     @property
     def sex(self) -> str:
@@ -102,46 +112,49 @@ class Athlete:
     def training_days_per_week(self) -> int:
         return self.training_plan_input['training_days_per_week']
 
-    def generate_workout_files(self, training_plan: TrainingPlan) -> List[WorkoutFile]:
-        """Generate FIT files for all workouts in the training plan and store them in self.workout_dir.
+    def generate_workout_files(
+        self,
+        training_plan: TrainingPlan,
+        max_workers: int = 1,
+        executor: Optional[Executor] = None
+    ) -> List[WorkoutFile]:
+        """Generate FIT files for all workouts in the training plan and store them in self.workout_dir
+        (or keep them in memory when workout files are not persisted).
         
         Args:
             training_plan: Training plan containing workouts
+            max_workers: Processes encoding workouts in parallel (1 encodes in this process)
+            executor: Process pool to encode on instead, e.g. one shared by a multi-athlete run
             
         Returns:
-            List of successfully generated WorkoutFiles
+            List of successfully generated WorkoutFiles. Errors of the workouts that
+            failed are kept in self.workout_file_errors (workout_id -> error).
         """
+        result = self.fit_generator.generate_plan_artifacts(training_plan, max_workers=max_workers, executor=executor)
         generated_files = []
 
         for week in training_plan.weeks:
             for workout in week.workouts:
-                try:
-                    # Generate unique IDs
-                    workout_id = self._create_workout_id(week.week_number, workout)
-                    external_id = self._create_external_id(workout_id)
-
-                    # Generate FIT file
-                    fit_file_path = self.fit_generator._generate_workout_file(
-                        workout, 
-                        week.week_number
-                    )
-
-                    # Create and store WorkoutFile
-                    workout_file = WorkoutFile(
-                        workout_id=workout_id,
-                        external_id=external_id,
-                        fit_file_path=fit_file_path,
-                        scheduled_date=workout.scheduled_date,
-                        week_number=week.week_number
-                    )
-                    
-                    self.workout_files[workout_id] = workout_file
-                    generated_files.append(workout_file)
-                    self.logger.info(f"Generated FIT file for workout: {workout_id}")
-
-                except Exception as e:
-                    self.logger.error(f"Error generating workout for {workout.scheduled_date}: {e}")
+                workout_id = self._create_workout_id(week.week_number, workout)
+                artifacts = result.artifacts.get(workout_id)
+                if artifacts is None:
                     continue
+
+                workout_file = WorkoutFile(
+                    workout_id=workout_id,
+                    external_id=self._create_external_id(workout_id),
+                    fit_file_path=artifacts.fit_file_path,
+                    scheduled_date=workout.scheduled_date,
+                    week_number=week.week_number,
+                    fit_bytes=artifacts.fit_bytes
+                )
+                self.workout_files[workout_id] = workout_file
+                generated_files.append(workout_file)
+
+        self.workout_file_errors = result.errors
+        for workout_id, error in result.errors.items():
+            self.logger.error(f"Error generating workout {workout_id}: {error}")
+        self.logger.info(f"Generated {len(generated_files)} FIT files ({len(result.errors)} failed)")
         return generated_files
     
     def upload_workout_files(self, workout_ids: Optional[List[str]] = None) -> List[str]:
@@ -170,10 +183,12 @@ class Athlete:
             workout_file = self.workout_files[workout_id]
             try:
                 response = upload_workout(
-                    file_path=str(workout_file.fit_file_path),
+                    file_path=str(workout_file.fit_file_path) if workout_file.fit_file_path else None,
                     athlete_id=self.intervals_icu_id,
                     start_date=f"{workout_file.scheduled_date}T09:00:00",  # Default to 9 AM
-                    external_id=workout_file.external_id
+                    external_id=workout_file.external_id,
+                    fit_bytes=workout_file.fit_bytes,
+                    filename=f"{workout_file.workout_id}.fit"
                 )
                 
                 if response and response.status_code == 200:
@@ -188,8 +203,14 @@ class Athlete:
 
         return uploaded_workouts
     
-    def fetch_historical_activities(self, days: int = 30):
-        """Fetch historical activities from Garmin Connect and merge with existing."""
+    def fetch_historical_activities(self, days: int = 30, refresh_summaries: bool = True):
+        """Fetch historical activities from Garmin Connect and merge with existing.
+
+        Args:
+            days: Number of days of history to fetch
+            refresh_summaries: Recompute the weekly summaries of weeks touched by new or
+                changed activities after storing them
+        """
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
@@ -208,19 +229,45 @@ class Athlete:
         
         # Persist to database
         try:
-            self.activity_db.upsert_activities(new_activities)
-            self.logger.info(f"Successfully stored {len(new_activities)} activities in database")
+            changed_activity_ids = self.activity_db.upsert_activities(new_activities)
+            self.logger.info(
+                f"Successfully stored {len(new_activities)} activities in database "
+                f"({len(changed_activity_ids)} new or changed)"
+            )
         except Exception as e:
             self.logger.error(f"Failed to store activities in database: {e}")
             # Optionally raise the exception if you want to handle it at a higher level
             raise
 
+        if refresh_summaries:
+            self.refresh_weekly_summaries()
+
+    def refresh_weekly_summaries(self) -> None:
+        """Recompute weekly summaries for the weeks marked dirty by activity ingest,
+        including the week currently in progress."""
+        try:
+            refreshed = refresh_dirty_weeks(athlete_id=self.user_id).get(self.user_id, [])
+            self.logger.info(f"Refreshed {len(refreshed)} weekly summaries")
+        except Exception as e:
+            self.logger.error(f"Failed to refresh weekly summaries: {e}")
+            raise
+
     def generate_training_plan(self) -> None:
         """Generate a training plan for the athlete using the configured API."""
         try:
             api = create_api()
             # Convert to dict first, then to json string
-            user_prompt = json.dumps(self.training_plan_input.model_dump())
+            plan_input = self.training_plan_input.model_dump()
+            training_load = self.training_load_db.get_state(self.user_id)
+            if training_load is not None:
+                # Current fitness, fatigue and form, precomputed at ingest
+                plan_input["training_load"] = {
+                    "date": training_load.day.isoformat(),
+                    "fitness_ctl": round(training_load.ctl, 1),
+                    "fatigue_atl": round(training_load.atl, 1),
+                    "form_tsb": round(training_load.tsb, 1),
+                }
+            user_prompt = json.dumps(plan_input)
             
             # Generate and validate plan
             plan_json = api.generate_plan(user_prompt)
@@ -269,51 +316,46 @@ class Athlete:
         By default, this will backfill 1 year of data.
         
         Note: this should only be called once at the beginning of onboarding the athlete.
-        After this, the athlete's workouts should be fetched regularly/automatically (TODO)
+        After this, fetch_historical_activities keeps the summaries of touched weeks up to date.
         """
         try:
-            self.fetch_historical_activities(days=days)
-            start_date = datetime.now() - timedelta(days=days)
-            self._populate_historical_weekly_summaries(start_date=start_date)
+            self.fetch_historical_activities(days=days, refresh_summaries=False)
+            self.backfill_weekly_summaries(days=days)
         except Exception as e:
             self.logger.error(f"Failed to backfill historical data: {e}")
             raise
 
+    def backfill_weekly_summaries(self, days: int = 365) -> None:
+        """Summary stage of the historical backfill: write the weekly summaries of the
+        last `days` days from activities already stored by fetch_historical_activities.
+
+        Exposed separately so athlete/backfill_scheduler.py can bound Garmin fetches
+        and database work independently.
+        """
+        start_date = datetime.now() - timedelta(days=days)
+        self._populate_historical_weekly_summaries(start_date=start_date)
+        # Completed weeks were written above; this picks up the week in progress
+        self.refresh_weekly_summaries()
+
     def _populate_historical_weekly_summaries(self, start_date: datetime) -> None:
         """Populate weekly summaries from historical activities. 
         Make private because:
         1. Depends on fetch_historical_activities being called first to ensure activities table is populated
-        2. Should only be called through backfill_historical_data
+        2. Should only be called through backfill_historical_data / backfill_weekly_summaries
         3. Prevents incorrect usage outside the class
         
         Args:
             start_date: Start date for fetching historical data.
         """
         try:
-            # Get start (Monday) and end dates of each week from start_date to now
-            week_ranges = []
-            current_date = datetime.now()
-            week_start = start_date - timedelta(days=start_date.weekday())
-            week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-            most_recent_sunday = current_date - timedelta(days=current_date.weekday() + 1)
             # Only process weeks that have completed (ended on a Sunday). In other words,
             # we don't process weeks that are currently in progress. 
-            while week_start <= most_recent_sunday:
-                week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
-                calculator = WeeklySummaryCalculator(
-                    athlete_id=self.user_id,
-                    start_date=week_start,
-                    end_date=week_end
-                )
+            current_date = datetime.now()
+            week_starts = completed_week_starts(start_date, current_date)
+            self.logger.info(f"Processing {len(week_starts)} weeks from {start_date} to {current_date}")
 
-                week_range = f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-                self.logger.info(f"Processing week: {week_range}")
-                week_ranges.append(week_range)
-                
-                # Calculate and store the summary
-                calculator.run()
-                # Increment to next week
-                week_start += timedelta(days=7)
+            # All weeks are aggregated with one grouped query and stored with one upsert
+            WeeklySummaryBackfill(athlete_id=self.user_id).run(week_starts)
             
             self.logger.info(
                 f"Successfully generated weekly summaries from {start_date} to {current_date}"
@@ -0,0 +1,223 @@
+"""Parallel historical backfill for many athletes.
+
+`Athlete.backfill_historical_data` runs one athlete at a time. A Garmin
+fetch, then that athlete's weekly summaries. `BackfillScheduler` runs the
+same two stages for a list of athletes on a thread pool, so the total
+wall time depends on the number of workers rather than the number of
+athletes:
+
+- fetch: `Athlete.fetch_historical_activities`, network bound on Garmin Connect
+- summaries: `Athlete.backfill_weekly_summaries`, bound by the database
+
+Every stage holds a slot of its service's semaphore while it runs. That
+caps the number of concurrent Garmin logins and the number of concurrent
+database stages (by default the connection pool size), whatever the
+worker count. Each athlete is isolated from the others: a failure is
+logged and recorded, and the remaining athletes carry on.
+
+Finished stages are recorded in a JSON state file, written atomically
+after every stage. Re-running with the same file skips work that is
+already done and retries failed athletes from the stage that failed.
+
+Usage:
+    scheduler = BackfillScheduler(max_workers=8, state_path=Path("backfill_state.json"))
+    status = scheduler.run(athletes, days=365)
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from database.config import POOL_PARAMS
+
+if TYPE_CHECKING:
+    from athlete.Athlete import Athlete
+
+logger = logging.getLogger(__name__)
+
+FETCH = "fetch"
+SUMMARIES = "summaries"
+STAGES = (FETCH, SUMMARIES)
+
+# External service each stage is bounded by
+STAGE_SERVICES = {FETCH: "garmin", SUMMARIES: "database"}
+
+# Concurrent stages allowed per service
+DEFAULT_SERVICE_LIMITS = {
+    # Garmin blocks accounts that log in too often in parallel
+    "garmin": 4,
+    "database": POOL_PARAMS["max_size"],
+}
+
+
+@dataclass
+class BackfillStatus:
+    """Progress of a scheduler run, passed to the progress callback after every athlete."""
+    total: int
+    completed: int = 0  # athletes with every stage done
+    failed: int = 0
+    skipped: int = 0  # athletes already completed by an earlier run
+    started_at: float = field(default_factory=time.monotonic)
+    failures: Dict[int, str] = field(default_factory=dict)  # athlete_id -> error
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.completed - self.failed
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+class BackfillState:
+    """Per-athlete stage completion, persisted to a JSON file so a run can resume.
+
+    Args:
+        path: State file (default: keep state in memory only)
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._athletes: Dict[str, Dict[str, Any]] = {}
+        if self.path is not None and self.path.exists():
+            with open(self.path) as f:
+                self._athletes = json.load(f).get("athletes", {})
+
+    def is_done(self, athlete_id: int, stage: str) -> bool:
+        with self._lock:
+            return stage in self._athletes.get(str(athlete_id), {}).get("done", {})
+
+    def mark_done(self, athlete_id: int, stage: str) -> None:
+        with self._lock:
+            entry = self._athletes.setdefault(str(athlete_id), {"done": {}})
+            entry["done"][stage] = datetime.now().isoformat()
+            entry.pop("error", None)
+            self._save()
+
+    def mark_failed(self, athlete_id: int, stage: str, error: str) -> None:
+        with self._lock:
+            entry = self._athletes.setdefault(str(athlete_id), {"done": {}})
+            entry["error"] = {"stage": stage, "message": error, "at": datetime.now().isoformat()}
+            self._save()
+
+    def failed(self) -> List[int]:
+        """Athlete IDs whose last attempted stage failed."""
+        with self._lock:
+            return sorted(int(athlete_id) for athlete_id, entry in self._athletes.items() if "error" in entry)
+
+    def _save(self) -> None:
+        """Write the whole state to a temporary file and swap it in, so readers never see a partial file."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"athletes": self._athletes}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class BackfillScheduler:
+    """Runs the historical backfill of many athletes concurrently.
+
+    Args:
+        max_workers: Athletes processed at the same time
+        service_limits: Concurrent stages per service, overriding DEFAULT_SERVICE_LIMITS
+        state_path: JSON file recording finished stages (default: no resume)
+        on_progress: Called with a BackfillStatus after every finished or failed athlete
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        service_limits: Optional[Dict[str, int]] = None,
+        state_path: Optional[Path] = None,
+        on_progress: Optional[Callable[[BackfillStatus], None]] = None
+    ):
+        limits = {**DEFAULT_SERVICE_LIMITS, **(service_limits or {})}
+        self.max_workers = max_workers
+        self.semaphores = {service: threading.BoundedSemaphore(limit) for service, limit in limits.items()}
+        self.state = BackfillState(state_path)
+        self.on_progress = on_progress
+
+    def run(self, athletes: Iterable["Athlete"], days: int = 365) -> BackfillStatus:
+        """Backfill `days` days of history for every athlete.
+
+        Args:
+            athletes: Athletes to backfill
+            days: Days of history to fetch and summarize
+
+        Returns:
+            Final BackfillStatus; failed athletes are listed in status.failures
+        """
+        athletes = list(athletes)
+        status = BackfillStatus(total=len(athletes))
+        pending = []
+        for athlete in athletes:
+            if all(self.state.is_done(athlete.user_id, stage) for stage in STAGES):
+                status.completed += 1
+                status.skipped += 1
+            else:
+                pending.append(athlete)
+        logger.info(
+            f"Backfilling {len(pending)} athletes ({status.skipped} already done) "
+            f"with {self.max_workers} workers"
+        )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(self._backfill_athlete, athlete, days): athlete for athlete in pending}
+            for future in as_completed(futures):
+                athlete = futures[future]
+                error = future.exception()
+                if error is None:
+                    status.completed += 1
+                else:
+                    status.failed += 1
+                    status.failures[athlete.user_id] = str(error)
+                self._report(status)
+
+        logger.info(
+            f"Backfill finished in {status.elapsed_seconds:.1f}s: "
+            f"{status.completed} completed, {status.failed} failed"
+        )
+        return status
+
+    def _backfill_athlete(self, athlete: "Athlete", days: int) -> None:
+        """Run the stages an athlete has not finished yet, in order."""
+        stages: Dict[str, Callable[[], None]] = {
+            FETCH: lambda: athlete.fetch_historical_activities(days=days, refresh_summaries=False),
+            SUMMARIES: lambda: athlete.backfill_weekly_summaries(days=days),
+        }
+        for stage in STAGES:
+            if self.state.is_done(athlete.user_id, stage):
+                continue
+            try:
+                with self.semaphores[STAGE_SERVICES[stage]]:
+                    stages[stage]()
+            except Exception as e:
+                logger.error(f"Backfill {stage} failed for athlete {athlete.user_id}: {e}")
+                self.state.mark_failed(athlete.user_id, stage, str(e))
+                raise
+            self.state.mark_done(athlete.user_id, stage)
+            logger.debug(f"Backfill {stage} done for athlete {athlete.user_id}")
+
+    def _report(self, status: BackfillStatus) -> None:
+        logger.info(
+            f"Backfill progress: {status.completed + status.failed}/{status.total} athletes "
+            f"({status.failed} failed, {status.elapsed_seconds:.1f}s elapsed)"
+        )
+        if self.on_progress is not None:
+            self.on_progress(status)
+
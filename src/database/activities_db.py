@@ -1,155 +1,493 @@
 """Database operations for activities table."""
 
-import psycopg2
+import itertools
+import uuid
+from psycopg2 import sql
 from psycopg2.extras import execute_values
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
 from datetime import datetime
-from .config import DB_PARAMS
+from activity.constants import ActivityCategory, activity_category_sql, get_activity_category
+from .bulk_load import BulkLoadResult, CopyRowStream
+from .column_backfill import BACKFILL_BATCH_SIZE, BackfillProgress, ColumnBackfill
+from .config import DB_PARAMS, PARTITION_PARAMS
+from .connection_pool import get_pool
+from .daily_summary_db import refresh_daily_summaries
+from .dirty_weeks_db import mark_dirty_weeks
+from .fingerprint import with_fingerprint
+from .migrations import set_lock_timeout
+from .personal_records_db import update_personal_records
+from .partitioning import create_partitions, ensure_year_partitions, partition_by_sql, partition_key, table_layout
+from .row_mapping import RowRecord, fetch_records, iter_records, schema_registry
+
+# Rows staged and merged per transaction by bulk_load_activities
+BULK_LOAD_CHUNK_SIZE = 50_000
+
+# Rows fetched per round trip by iter_activities
+ITER_FETCH_SIZE = 2_000
+
+# Column definitions shared by the plain and partitioned layouts
+ACTIVITIES_COLUMNS_SQL = """
+        -- Basic Identification
+        activity_id BIGINT NOT NULL,
+        user_id INTEGER NOT NULL,
+        device_id VARCHAR(50),
+        data_source VARCHAR(50),
+
+        -- Activity Metadata
+        start_time TIMESTAMP NOT NULL,
+        activity_type VARCHAR(50),
+        activity_category VARCHAR(20),  -- ActivityCategory of activity_type, set at ingest
+        has_splits BOOLEAN,
+
+        -- Duration Metrics
+        duration FLOAT,
+        moving_time FLOAT,
+        elapsed_time FLOAT,
+
+        -- Distance and Speed
+        distance FLOAT,
+        average_speed FLOAT,
+        max_speed FLOAT,
+        average_grade_adjusted_speed FLOAT,
+
+        -- Heart Rate Data
+        average_heart_rate FLOAT,
+        max_heart_rate FLOAT,
+        hr_time_z1_seconds FLOAT,
+        hr_time_z2_seconds FLOAT,
+        hr_time_z3_seconds FLOAT,
+        hr_time_z4_seconds FLOAT,
+        hr_time_z5_seconds FLOAT,
+
+        -- Power Data
+        average_power FLOAT,
+        max_power FLOAT,
+        power_time_z1_seconds FLOAT,
+        power_time_z2_seconds FLOAT,
+        power_time_z3_seconds FLOAT,
+        power_time_z4_seconds FLOAT,
+        power_time_z5_seconds FLOAT,
+
+        -- Cadence
+        average_cadence FLOAT,
+        max_cadence FLOAT,
+
+        -- Elevation Data
+        elevation_gain FLOAT,
+        elevation_loss FLOAT,
+        min_elevation FLOAT,
+        max_elevation FLOAT,
+
+        -- Temperature
+        average_temperature FLOAT,
+        max_temperature FLOAT,
+
+        -- Split Times
+        fastest_split_1_mile FLOAT,
+        fastest_split_1k FLOAT,
+        fastest_split_5k FLOAT,
+        fastest_split_10k FLOAT,
+        split_summaries JSONB,
+
+        -- Training Effect and Load
+        training_effect_label VARCHAR(50),
+        aerobic_training_effect FLOAT,
+        anaerobic_training_effect FLOAT,
+        aerobic_training_effect_message TEXT,
+        anaerobic_training_effect_message TEXT,
+        activity_training_load FLOAT,
+        vo2_max FLOAT,
+
+        -- Intensity Minutes
+        moderate_intensity_minutes FLOAT,
+        vigorous_intensity_minutes FLOAT,
+
+        -- Energy
+        calories FLOAT,
+
+        -- Metadata
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        fit_file_path VARCHAR(255),
+        fit_file_downloaded_at TIMESTAMP,
+        content_hash CHAR(32)  -- fingerprint of the synced payload, see fingerprint.py
+"""
+
+# Indexes for common queries, created on the table (or the partitioned parent)
+ACTIVITIES_INDEXES = {
+    "idx_activities_user_time": "(user_id, start_time DESC)",
+    "idx_activities_type": "(activity_type)",
+    # Index for per-sport queries
+    "idx_activities_user_category": "(user_id, activity_category, start_time)",
+    "idx_activities_date": "(start_time)",
+    # Index for power activities
+    "idx_activities_power": "(user_id, average_power) WHERE average_power IS NOT NULL",
+    # Index for heart rate data
+    "idx_activities_hr": "(user_id, average_heart_rate) WHERE average_heart_rate IS NOT NULL",
+}
+
+
+def prepare_activity_row(activity: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the activity with its content_hash and activity_category filled in."""
+    activity_type = activity.get('activity_type')
+    category = get_activity_category(activity_type) if activity_type else ActivityCategory.OTHER
+    return {**with_fingerprint(activity), 'activity_category': category.value}
+
+
+def activities_indexes_sql() -> str:
+    """CREATE INDEX statements for the standard activities indexes."""
+    return "\n        ".join(
+        f"CREATE INDEX IF NOT EXISTS {name} ON activities {definition};"
+        for name, definition in ACTIVITIES_INDEXES.items()
+    )
+
 
 class ActivityDB:
     def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
         self.db_params = db_params
     
     def _get_connection(self):
-        return psycopg2.connect(**self.db_params)
-
-    def create_activities_table(self):
-        """Create activities table and indexes if they don't exist."""
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS activities (
-            -- Basic Identification
-            activity_id BIGINT PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            device_id VARCHAR(50),
-            data_source VARCHAR(50),
-
-            -- Activity Metadata
-            start_time TIMESTAMP NOT NULL,
-            activity_type VARCHAR(50),
-            has_splits BOOLEAN,
-
-            -- Duration Metrics
-            duration FLOAT,
-            moving_time FLOAT,
-            elapsed_time FLOAT,
-
-            -- Distance and Speed
-            distance FLOAT,
-            average_speed FLOAT,
-            max_speed FLOAT,
-            average_grade_adjusted_speed FLOAT,
-
-            -- Heart Rate Data
-            average_heart_rate FLOAT,
-            max_heart_rate FLOAT,
-            hr_time_z1_seconds FLOAT,
-            hr_time_z2_seconds FLOAT,
-            hr_time_z3_seconds FLOAT,
-            hr_time_z4_seconds FLOAT,
-            hr_time_z5_seconds FLOAT,
-
-            -- Power Data
-            average_power FLOAT,
-            max_power FLOAT,
-            power_time_z1_seconds FLOAT,
-            power_time_z2_seconds FLOAT,
-            power_time_z3_seconds FLOAT,
-            power_time_z4_seconds FLOAT,
-            power_time_z5_seconds FLOAT,
-
-            -- Cadence
-            average_cadence FLOAT,
-            max_cadence FLOAT,
-
-            -- Elevation Data
-            elevation_gain FLOAT,
-            elevation_loss FLOAT,
-            min_elevation FLOAT,
-            max_elevation FLOAT,
-
-            -- Temperature
-            average_temperature FLOAT,
-            max_temperature FLOAT,
-
-            -- Split Times
-            fastest_split_1_mile FLOAT,
-            fastest_split_1k FLOAT,
-            fastest_split_5k FLOAT,
-            fastest_split_10k FLOAT,
-            split_summaries JSONB,
-
-            -- Training Effect and Load
-            training_effect_label VARCHAR(50),
-            aerobic_training_effect FLOAT,
-            anaerobic_training_effect FLOAT,
-            aerobic_training_effect_message TEXT,
-            anaerobic_training_effect_message TEXT,
-            activity_training_load FLOAT,
-            vo2_max FLOAT,
-
-            -- Intensity Minutes
-            moderate_intensity_minutes FLOAT,
-            vigorous_intensity_minutes FLOAT,
-
-            -- Energy
-            calories FLOAT,
-
-            -- Metadata
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            fit_file_path VARCHAR(255),
-            fit_file_downloaded_at TIMESTAMP
-        );
-
-        -- Create indexes for common queries
-        CREATE INDEX IF NOT EXISTS idx_activities_user_time 
-        ON activities (user_id, start_time DESC);
-
-        CREATE INDEX IF NOT EXISTS idx_activities_type 
-        ON activities (activity_type);
-
-        CREATE INDEX IF NOT EXISTS idx_activities_date 
-        ON activities (start_time);
-
-        -- Create index for power activities
-        CREATE INDEX IF NOT EXISTS idx_activities_power 
-        ON activities (user_id, average_power) 
-        WHERE average_power IS NOT NULL;
-
-        -- Create index for heart rate data
-        CREATE INDEX IF NOT EXISTS idx_activities_hr 
-        ON activities (user_id, average_heart_rate) 
-        WHERE average_heart_rate IS NOT NULL;
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_activities_table(self, partitioning: Optional[str] = PARTITION_PARAMS["strategy"]):
+        """Create activities table and indexes if they don't exist.
+
+        Args:
+            partitioning: "range" for yearly start_time partitions, "hash" for
+                user_id partitions, or None for a single table (see partitioning.py).
+                An existing table keeps its layout; migrate it with
+                `python -m src.database.partitioning migrate`.
+        """
+        create_table_sql = f"""
+        CREATE TABLE activities (
+            {ACTIVITIES_COLUMNS_SQL},
+            PRIMARY KEY ({', '.join(partition_key(partitioning))})
+        ){' ' + partition_by_sql(partitioning) if partitioning else ''};
+
+        -- Create indexes for common queries. Indexes added later go in
+        -- migrations.py, which builds them without blocking writes.
+        {activities_indexes_sql()}
         """
         with self._get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(create_table_sql)
+                layout = table_layout(cur, 'activities')
+                if layout is None:
+                    layout = partitioning or 'plain'
+                    cur.execute(create_table_sql)
+                    if partitioning:
+                        create_partitions(
+                            cur,
+                            partitioning,
+                            years=range(PARTITION_PARAMS["first_year"], datetime.now().year + 2),
+                            hash_partitions=PARTITION_PARAMS["hash_partitions"]
+                        )
+                elif partitioning and layout != partitioning:
+                    print(f"Activities table is {layout}, not {partitioning} partitioned; "
+                          f"migrate it with python -m src.database.partitioning")
+                if layout == 'range':
+                    # Keep next year's partition ready before its first activity arrives
+                    ensure_year_partitions(cur, [datetime.now().year, datetime.now().year + 1])
             conn.commit()
+        schema_registry.invalidate('activities')
 
-    def upsert_activities(self, activities: List[Dict[str, Any]]) -> None:
-        """Insert or update multiple activities in the database."""
-        if not activities:
-            return
+    def upsert_activities(self, activities: List[Dict[str, Any]]) -> List[int]:
+        """Insert or update multiple activities in the database.
 
-        columns = activities[0].keys()
-        values = [[activity[column] for column in columns] for activity in activities]
-        
-        upsert_sql = f"""
-        INSERT INTO activities ({', '.join(columns)})
-        VALUES %s
-        ON CONFLICT (activity_id) DO UPDATE SET
-        {', '.join(f"{col} = EXCLUDED.{col}" for col in columns if col != 'activity_id')};
+        Each row carries a content fingerprint, and existing rows are only
+        rewritten (and their updated_at bumped) when the fingerprint differs.
+        The weeks touched by changed rows, including the week a moved
+        activity used to be in, are marked dirty, their days are recomputed
+        in daily_summary and the changed rows are merged into
+        personal_records, all in the same transaction.
+
+        Returns:
+            IDs of the activities that were inserted or changed
         """
-        
+        if not activities:
+            return []
+
+        rows = [prepare_activity_row(activity) for activity in activities]
+        columns = rows[0].keys()
+        values = [[row[column] for column in columns] for row in rows]
+
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    execute_values(cur, upsert_sql, values)
+                    key = self._conflict_key(cur, columns)
+                    key_list = ', '.join(key)
+                    upsert_sql = f"""
+                    INSERT INTO activities ({', '.join(columns)})
+                    VALUES %s
+                    ON CONFLICT ({key_list}) DO UPDATE SET
+                    {', '.join(f"{col} = EXCLUDED.{col}" for col in columns if col not in key)},
+                    updated_at = CURRENT_TIMESTAMP
+                    WHERE activities.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                    RETURNING activity_id, user_id, date_trunc('week', start_time), start_time::date, {key_list};
+                    """
+
+                    # Weeks (and keys) the activities had before this upsert
+                    cur.execute(f"""
+                        SELECT activity_id, user_id, date_trunc('week', start_time), start_time::date, {key_list}
+                        FROM activities
+                        WHERE activity_id = ANY(%s)
+                    """, ([row['activity_id'] for row in rows],))
+                    previous = {row[0]: row for row in cur.fetchall()}
+
+                    changed = execute_values(cur, upsert_sql, values, fetch=True)
+
+                    touched_weeks = {(user_id, week) for _, user_id, week, *_ in changed}
+                    touched_days = {(user_id, day) for _, user_id, _, day, *_ in changed}
+                    moved_keys = []
+                    for activity_id, _, _, _, *new_key in changed:
+                        old = previous.get(activity_id)
+                        if old is None:
+                            continue
+                        touched_weeks.add((old[1], old[2]))
+                        touched_days.add((old[1], old[3]))
+                        if list(old[4:]) != new_key:
+                            # A changed partition key inserts a new row; drop the old one
+                            moved_keys.append(old[4:])
+                    if moved_keys:
+                        execute_values(cur, f"DELETE FROM activities WHERE ({key_list}) IN (VALUES %s)", moved_keys)
+                    mark_dirty_weeks(cur, touched_weeks)
+                    refresh_daily_summaries(cur, touched_days)
+                    update_personal_records(cur, [row[0] for row in changed])
                 conn.commit()
         except Exception as e:
             print(f"Error upserting activities: {e}")
             raise 
 
+        return [row[0] for row in changed]
+
+    def bulk_load_activities(
+        self,
+        activities: Iterable[Dict[str, Any]],
+        chunk_size: int = BULK_LOAD_CHUNK_SIZE
+    ) -> BulkLoadResult:
+        """Stream activities into the table with COPY and merge them in one statement per chunk.
+
+        Rows are fingerprinted, copied into a temporary staging table and
+        merged into `activities` with a single INSERT ... ON CONFLICT per
+        chunk, so client memory stays flat no matter how long the history is.
+        Stored rows are only rewritten when their fingerprint changes, the
+        weeks they touch are marked dirty, their days are recomputed in
+        daily_summary and personal records are updated. Each chunk is
+        committed separately to keep transactions short.
+
+        Args:
+            activities: Iterable (e.g. a generator) of Activity dicts. All rows must
+                share the keys of the first row.
+            chunk_size: Number of rows staged and merged per transaction
+
+        Returns:
+            BulkLoadResult with counts of inserted, updated and skipped rows
+        """
+        rows = iter(activities)
+        first = next(rows, None)
+        if first is None:
+            return BulkLoadResult()
+
+        first = prepare_activity_row(first)
+        columns = list(first.keys())
+        rows = itertools.chain([first], map(prepare_activity_row, rows))
+        result = BulkLoadResult()
+
+        while True:
+            chunk = CopyRowStream(itertools.islice(rows, chunk_size), columns)
+            result += self._copy_and_merge(chunk, columns)
+            if chunk.rows_written < chunk_size:
+                break
+
+        return result
+
+    @staticmethod
+    def _conflict_key(cur, columns: Iterable[str]) -> Tuple[str, ...]:
+        """Primary key of activities, which includes the partition key on partitioned layouts."""
+        key = schema_registry.primary_key(cur, 'activities')
+        missing = [col for col in key if col not in columns]
+        if missing:
+            raise ValueError(f"Activities are missing key column(s): {', '.join(missing)}")
+        return key
+
+    @staticmethod
+    def _merge_sql(columns: List[str], key: Sequence[str]) -> str:
+        """Statement merging activities_staging into activities and marking dirty weeks."""
+        column_list = ', '.join(columns)
+        update_columns = [col for col in columns if col not in key]
+        partition_columns = [col for col in key if col != 'activity_id']
+
+        moved_cte = ""
+        if partition_columns:
+            # A changed partition key means the row is inserted under its new key
+            moved_cte = f"""
+        ), moved AS (
+            DELETE FROM activities a
+            USING staged s
+            WHERE a.activity_id = s.activity_id
+            AND ({', '.join(f'a.{col}' for col in partition_columns)})
+                IS DISTINCT FROM ({', '.join(f's.{col}' for col in partition_columns)})"""
+
+        return f"""
+        WITH staged AS (
+            -- Keep the last occurrence of each activity within the chunk
+            SELECT DISTINCT ON (activity_id) {column_list}
+            FROM activities_staging
+            ORDER BY activity_id, load_seq DESC
+        ), previous AS (
+            -- Stored rows and their weeks before the merge (CTEs share one snapshot)
+            SELECT
+                a.activity_id,
+                a.user_id,
+                date_trunc('week', a.start_time) AS week_start,
+                a.start_time::date AS day,
+                a.content_hash IS DISTINCT FROM s.content_hash AS changing
+            FROM activities a
+            JOIN staged s USING (activity_id){moved_cte}
+        ), merged AS (
+            INSERT INTO activities ({column_list})
+            SELECT {column_list} FROM staged
+            ON CONFLICT ({', '.join(key)}) DO UPDATE SET
+            {', '.join(f"{col} = EXCLUDED.{col}" for col in update_columns)},
+            updated_at = CURRENT_TIMESTAMP
+            WHERE activities.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING activity_id, user_id, date_trunc('week', start_time) AS week_start, start_time::date AS day
+        ), dirty AS (
+            INSERT INTO weekly_summary_dirty (athlete_id, week_start)
+            SELECT user_id, week_start FROM merged
+            UNION
+            SELECT user_id, week_start FROM previous WHERE changing
+            ON CONFLICT (athlete_id, week_start) DO UPDATE SET marked_at = CURRENT_TIMESTAMP
+        ), touched_days AS (
+            SELECT user_id, day FROM merged
+            UNION
+            SELECT user_id, day FROM previous WHERE changing
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE previous.activity_id IS NULL),
+            COUNT(previous.activity_id),
+            COALESCE(array_agg(merged.activity_id), ARRAY[]::bigint[]),
+            (SELECT array_agg(user_id ORDER BY user_id, day) FROM touched_days),
+            (SELECT array_agg(day ORDER BY user_id, day) FROM touched_days)
+        FROM merged
+        LEFT JOIN previous USING (activity_id);
+        """
+
+    def _copy_and_merge(self, stream: CopyRowStream, columns: List[str]) -> BulkLoadResult:
+        """COPY one chunk into a staging table and merge it into activities."""
+        column_list = ', '.join(columns)
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        CREATE TEMP TABLE activities_staging (
+                            LIKE activities INCLUDING DEFAULTS,
+                            load_seq BIGSERIAL
+                        ) ON COMMIT DROP
+                    """)
+                    cur.copy_expert(
+                        f"COPY activities_staging ({column_list}) FROM STDIN",
+                        stream
+                    )
+                    if stream.rows_written == 0:
+                        return BulkLoadResult()
+                    cur.execute(self._merge_sql(columns, self._conflict_key(cur, columns)))
+                    inserted, updated, changed_ids, day_athletes, days = cur.fetchone()
+                    # Aggregates must see the merged rows, so they run as separate statements
+                    refresh_daily_summaries(cur, zip(day_athletes or [], days or []))
+                    update_personal_records(cur, changed_ids)
+                conn.commit()
+        except Exception as e:
+            print(f"Error bulk loading activities: {e}")
+            raise
+
+        return BulkLoadResult(
+            inserted=inserted,
+            updated=updated,
+            skipped=stream.rows_written - inserted - updated
+        )
+
+    def iter_activities(
+        self,
+        user_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+        fetch_size: int = ITER_FETCH_SIZE
+    ) -> Iterator[RowRecord]:
+        """Lazily yield an athlete's activities in start_time order.
+
+        Rows are read through a named server-side cursor, fetch_size rows per
+        round trip, so memory stays bounded however many years are scanned.
+        The user_id/start_time filter is served by idx_activities_user_time.
+        The pooled connection is held until the iterator is exhausted or closed.
+
+        Args:
+            user_id: Athlete whose activities to read
+            start: Optional inclusive lower bound on start_time
+            end: Optional exclusive upper bound on start_time
+            columns: Optional subset of columns to select (default: all columns)
+            fetch_size: Number of rows fetched from the server per round trip
+
+        Yields:
+            ActivityRecord rows supporting attribute and key access
+        """
+        conditions = [sql.SQL("user_id = %s")]
+        params: List[Any] = [user_id]
+        if start is not None:
+            conditions.append(sql.SQL("start_time >= %s"))
+            params.append(start)
+        if end is not None:
+            conditions.append(sql.SQL("start_time < %s"))
+            params.append(end)
+
+        with self._get_connection() as conn:
+            if columns:
+                with conn.cursor() as cur:
+                    columns = schema_registry.validate(cur, 'activities', columns)
+                select_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+            else:
+                select_list = sql.SQL('*')
+
+            query = sql.SQL("SELECT {} FROM activities WHERE {} ORDER BY start_time ASC").format(
+                select_list, sql.SQL(' AND ').join(conditions)
+            )
+            with conn.cursor(name=f"iter_activities_{uuid.uuid4().hex}") as cur:
+                cur.itersize = fetch_size
+                cur.execute(query, params)
+                yield from iter_records(cur, "ActivityRecord")
+
+    def get_category_totals(self, user_id: int, start: datetime, end: datetime) -> List[RowRecord]:
+        """Per-sport session count, duration, distance and training load in [start, end).
+
+        Served by idx_activities_user_category.
+
+        Returns:
+            One CategoryTotals record per activity_category with activities in the range
+        """
+        query = """
+        SELECT
+            activity_category,
+            COUNT(*) AS num_sessions,
+            COALESCE(SUM(duration), 0) AS total_duration_seconds,
+            COALESCE(SUM(distance), 0) AS total_distance_meters,
+            COALESCE(SUM(activity_training_load), 0) AS total_training_load
+        FROM activities
+        WHERE user_id = %s AND start_time >= %s AND start_time < %s
+        GROUP BY activity_category
+        ORDER BY activity_category
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (user_id, start, end))
+                return fetch_records(cur, "CategoryTotals")
+
+    def get_columns(self) -> List[str]:
+        """Return the activities table's column names, cached until the schema changes."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                return list(schema_registry.columns(cur, 'activities'))
+
     def add_column(self, column_name: str, column_type: str, default_value: Any = None) -> None:
         """Add a new column to the activities table if it doesn't exist.
         
@@ -169,7 +507,9 @@ class ActivityDB:
                 """, (column_name,))
                 
                 if not cur.fetchone():
-                    # Column doesn't exist, so add it
+                    # Column doesn't exist, so add it. Fail fast rather than queue
+                    # writers behind the exclusive lock if the table is busy.
+                    set_lock_timeout(cur)
                     sql = f"ALTER TABLE activities ADD COLUMN {column_name} {column_type}"
                     if default_value is not None:
                         sql += f" DEFAULT {default_value}"
@@ -178,22 +518,75 @@ class ActivityDB:
                 else:
                     print(f"Column {column_name} already exists in activities table")
             conn.commit()
+        # Cached column lists for this table are now stale
+        schema_registry.invalidate('activities')
 
-    def update_column_values(self, column_name: str, value: Any, where_clause: str = None) -> None:
+    def update_column_values(
+        self,
+        column_name: str,
+        value: Any = None,
+        where_clause: str = None,
+        value_sql: str = None,
+        batch_size: int = BACKFILL_BATCH_SIZE,
+        pause: float = 0.0
+    ) -> BackfillProgress:
         """Update values in a specific column for existing rows.
-        
+
+        Rows are updated in key-ordered batches with a checkpoint after each
+        one, so the update never holds locks on the whole table and resumes
+        after an interruption (see column_backfill.py).
+
         Args:
             column_name: Name of the column to update
             value: Value to set
             where_clause: Optional WHERE clause to filter which rows to update
+            value_sql: Optional SQL expression to set instead of a constant value
+            batch_size: Rows per transaction
+            pause: Seconds to sleep between batches
+
+        Returns:
+            BackfillProgress with row counts and throughput
         """
-        with self._get_connection() as conn:
-            with conn.cursor() as cur:
-                sql = f"UPDATE activities SET {column_name} = %s"
-                if where_clause:
-                    sql += f" WHERE {where_clause}"
-                
-                cur.execute(sql, (value,))
-                rows_updated = cur.rowcount
-                print(f"Updated {rows_updated} rows in column {column_name}")
-            conn.commit()
+        progress = ColumnBackfill(
+            'activities',
+            column_name,
+            value=value,
+            value_sql=value_sql,
+            where_clause=where_clause,
+            batch_size=batch_size,
+            pause=pause,
+            db_params=self.db_params
+        ).run()
+        print(f"Updated {progress.rows_updated} rows in column {column_name}")
+        return progress
+
+    def reclassify_activities(self, batch_size: int = BACKFILL_BATCH_SIZE, pause: float = 0.0) -> BackfillProgress:
+        """Recompute activity_category after ACTIVITY_TYPE_MAPPINGS changes.
+
+        Only rows whose stored category differs from the current mapping are
+        rewritten, in resumable batches. Each batch recomputes the daily
+        summaries of the days it changed and marks their weeks dirty so the
+        weekly summaries are recomputed.
+
+        Args:
+            batch_size: Rows per transaction
+            pause: Seconds to sleep between batches
+
+        Returns:
+            BackfillProgress with row counts and throughput
+        """
+        category_sql = activity_category_sql()
+        progress = ColumnBackfill(
+            'activities',
+            'activity_category',
+            value_sql=category_sql,
+            where_clause=f"activity_category IS DISTINCT FROM {category_sql}",
+            batch_size=batch_size,
+            pause=pause,
+            job_name='activities.activity_category.reclassify',
+            dirty_week_columns=('user_id', 'start_time'),
+            on_updated_rows=refresh_daily_summaries,
+            db_params=self.db_params
+        ).run()
+        print(f"Reclassified {progress.rows_updated} activities")
+        return progress
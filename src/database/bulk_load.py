@@ -0,0 +1,97 @@
+"""Helpers for streaming rows into PostgreSQL with COPY.
+
+Rows are encoded lazily into COPY text format and handed to
+`cursor.copy_expert` through a file-like object, so the client never holds
+more than one read buffer of encoded data regardless of how many rows are
+loaded.
+"""
+
+import io
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, Sequence
+
+
+@dataclass
+class BulkLoadResult:
+    """Row counts reported by a bulk load."""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0  # duplicates within the load or rows identical to what is stored
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.skipped
+
+    def __add__(self, other: "BulkLoadResult") -> "BulkLoadResult":
+        return BulkLoadResult(
+            inserted=self.inserted + other.inserted,
+            updated=self.updated + other.updated,
+            skipped=self.skipped + other.skipped,
+        )
+
+
+_COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
+
+def format_copy_value(value: Any) -> str:
+    """Encode a Python value as a field in PostgreSQL COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.translate(_COPY_ESCAPES)
+
+
+class CopyRowStream(io.TextIOBase):
+    """Read-only file object that encodes rows into COPY text format on demand.
+
+    Args:
+        rows: Iterable of dict-like rows
+        columns: Columns to emit, in COPY column order
+    """
+
+    def __init__(self, rows: Iterable[Any], columns: Sequence[str]):
+        self._rows: Iterator[Any] = iter(rows)
+        self._columns = list(columns)
+        self._buffer = ""
+        self.rows_written = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _encode(self, row: Any) -> str:
+        self.rows_written += 1
+        return "\t".join(format_copy_value(row.get(column)) for column in self._columns) + "\n"
+
+    def read(self, size: int = -1) -> str:
+        if size is None or size < 0:
+            chunk = self._buffer + "".join(self._encode(row) for row in self._rows)
+            self._buffer = ""
+            return chunk
+
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = self._encode(row)
+            parts.append(line)
+            length += len(line)
+
+        data = "".join(parts)
+        self._buffer = data[size:]
+        return data[:size]
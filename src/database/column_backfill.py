@@ -0,0 +1,282 @@
+"""Chunked, resumable column backfills.
+
+A single `UPDATE table SET col = ...` over a large table holds row locks for
+the whole run and writes all of its WAL at once. `ColumnBackfill` walks the
+table in key order instead, updating `batch_size` rows per short transaction
+and optionally sleeping between batches. Each batch records its last key
+in column_backfill_checkpoints in the same transaction, so an interrupted
+backfill resumes exactly where it stopped.
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from psycopg2 import sql
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import schema_registry
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per transaction
+BACKFILL_BATCH_SIZE = 5_000
+
+
+@dataclass
+class BackfillProgress:
+    """Progress of a backfill run."""
+    rows_scanned: int = 0
+    rows_updated: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    done: bool = False
+    resumed_from: int = 0  # rows scanned by an interrupted earlier run
+
+    @property
+    def rows_per_second(self) -> float:
+        """Scan rate of this run."""
+        scanned = self.rows_scanned - self.resumed_from
+        return scanned / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class ColumnBackfill:
+    """Sets a column in key-ordered batches, with a checkpoint after every batch.
+
+    Args:
+        table: Table to update
+        column: Column to set
+        value: Value to set (ignored if value_sql is given)
+        value_sql: SQL expression over the row's columns to set instead of a constant,
+            e.g. "duration / 60"
+        where_clause: Optional SQL filter on which rows to update
+        key: Columns that uniquely identify a row, in index order (default: primary key)
+        batch_size: Rows examined per transaction
+        pause: Seconds to sleep between batches
+        job_name: Checkpoint name (default: "<table>.<column>")
+        dirty_week_columns: Optional (athlete, timestamp) columns; the weekly summaries
+            of changed rows are marked dirty in the same transaction
+        on_updated_rows: Optional callable run in each batch's transaction, after its
+            update, with the cursor and the (athlete, timestamp) pairs of the rows it
+            changed. Requires dirty_week_columns.
+        db_params: Connection parameters
+    """
+
+    def __init__(
+        self,
+        table: str,
+        column: str,
+        value: Any = None,
+        value_sql: Optional[str] = None,
+        where_clause: Optional[str] = None,
+        key: Optional[Sequence[str]] = None,
+        batch_size: int = BACKFILL_BATCH_SIZE,
+        pause: float = 0.0,
+        job_name: Optional[str] = None,
+        dirty_week_columns: Optional[Tuple[str, str]] = None,
+        on_updated_rows: Optional[Callable[[Any, List[Tuple[Any, Any]]], None]] = None,
+        db_params: Dict[str, Any] = DB_PARAMS
+    ):
+        if on_updated_rows is not None and not dirty_week_columns:
+            raise ValueError("on_updated_rows needs dirty_week_columns to know which columns to report")
+        self.table = table
+        self.column = column
+        self.value = value
+        self.value_sql = value_sql
+        self.where_clause = where_clause
+        self.key = tuple(key) if key else None
+        self.batch_size = batch_size
+        self.pause = pause
+        self.job_name = job_name or f"{table}.{column}"
+        self.dirty_week_columns = dirty_week_columns
+        self.on_updated_rows = on_updated_rows
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_checkpoint_table(self):
+        """Create column_backfill_checkpoints table if it doesn't exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS column_backfill_checkpoints (
+            job_name VARCHAR(200) PRIMARY KEY,
+            table_name VARCHAR(100) NOT NULL,
+            column_name VARCHAR(100) NOT NULL,
+            last_key JSONB,  -- key of the last row examined, NULL before the first batch
+            rows_scanned BIGINT DEFAULT 0,
+            rows_updated BIGINT DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def _resolve_key(self, cur) -> Tuple[str, ...]:
+        key = self.key or schema_registry.primary_key(cur, self.table)
+        if not key:
+            raise ValueError(f"{self.table} has no primary key; pass the columns of a unique index as key")
+        schema_registry.validate(cur, self.table, [self.column, *key])
+        return key
+
+    def _load_checkpoint(self, cur) -> Tuple[Optional[list], int, int]:
+        """Return (last_key, rows_scanned, rows_updated) of an unfinished run, starting one if needed."""
+        cur.execute("""
+            SELECT last_key, rows_scanned, rows_updated, completed_at
+            FROM column_backfill_checkpoints
+            WHERE job_name = %s
+            FOR UPDATE
+        """, (self.job_name,))
+        row = cur.fetchone()
+        if row is not None and row[3] is None:
+            return row[0], row[1], row[2]
+
+        # No checkpoint, or the last run finished: start over
+        cur.execute("""
+            INSERT INTO column_backfill_checkpoints (job_name, table_name, column_name)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (job_name) DO UPDATE SET
+                table_name = EXCLUDED.table_name,
+                column_name = EXCLUDED.column_name,
+                last_key = NULL,
+                rows_scanned = 0,
+                rows_updated = 0,
+                started_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP,
+                completed_at = NULL
+        """, (self.job_name, self.table, self.column))
+        return None, 0, 0
+
+    def _batch_sql(self, key: Sequence[str], resume: bool) -> sql.Composed:
+        key_list = sql.SQL(", ").join(map(sql.Identifier, key))
+        conditions = []
+        if resume:
+            conditions.append(sql.SQL("({}) > ({})").format(
+                key_list, sql.SQL(", ").join(sql.Placeholder(f"key{i}") for i in range(len(key)))
+            ))
+        if self.where_clause:
+            conditions.append(sql.SQL("({})").format(sql.SQL(self.where_clause)))
+        where = sql.SQL("WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("")
+        value = sql.SQL(self.value_sql) if self.value_sql else sql.Placeholder("value")
+
+        returning = sql.SQL("1")
+        dirty = sql.SQL("")
+        updated_rows = sql.SQL("NULL, NULL")
+        if self.dirty_week_columns:
+            athlete_column, time_column = self.dirty_week_columns
+            returning = sql.SQL("{}, {}").format(sql.Identifier(athlete_column), sql.Identifier(time_column))
+            dirty = sql.SQL("""
+            , dirty AS (
+                INSERT INTO weekly_summary_dirty (athlete_id, week_start)
+                SELECT DISTINCT {athlete}, date_trunc('week', {time}) FROM updated
+                ON CONFLICT (athlete_id, week_start) DO UPDATE SET marked_at = CURRENT_TIMESTAMP
+            )""").format(athlete=sql.Identifier(athlete_column), time=sql.Identifier(time_column))
+            updated_rows = sql.SQL("""
+                (SELECT array_agg({athlete} ORDER BY {athlete}, {time}) FROM updated),
+                (SELECT array_agg({time} ORDER BY {athlete}, {time}) FROM updated)""").format(
+                athlete=sql.Identifier(athlete_column), time=sql.Identifier(time_column)
+            )
+
+        return sql.SQL("""
+            WITH batch AS (
+                SELECT {key} FROM {table}
+                {where}
+                ORDER BY {key}
+                LIMIT %(batch_size)s
+            ), updated AS (
+                UPDATE {table} SET {column} = {value}
+                WHERE ({key}) IN (SELECT {key} FROM batch)
+                -- Rows that already hold the value are not rewritten
+                AND {column} IS DISTINCT FROM {value}
+                RETURNING {returning}
+            ){dirty}
+            SELECT
+                (SELECT COUNT(*) FROM batch),
+                (SELECT COUNT(*) FROM updated),
+                (SELECT json_build_array({key}) FROM batch ORDER BY {key_desc} LIMIT 1),
+                {updated_rows}
+        """).format(
+            key=key_list,
+            key_desc=sql.SQL(", ").join(sql.SQL("{} DESC").format(sql.Identifier(col)) for col in key),
+            table=sql.Identifier(self.table),
+            where=where,
+            column=sql.Identifier(self.column),
+            value=value,
+            returning=returning,
+            dirty=dirty,
+            updated_rows=updated_rows,
+        )
+
+    def run(self, on_progress: Optional[Callable[[BackfillProgress], None]] = None) -> BackfillProgress:
+        """Run the backfill to completion, resuming an interrupted run of the same job.
+
+        Args:
+            on_progress: Optional callback invoked after every batch
+
+        Returns:
+            Final progress of this run (counts include batches from the interrupted run)
+        """
+        self.create_checkpoint_table()
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                key = self._resolve_key(cur)
+                last_key, rows_scanned, rows_updated = self._load_checkpoint(cur)
+            conn.commit()
+
+        if last_key is not None:
+            logger.info(f"Resuming backfill {self.job_name} after key {last_key}")
+        progress = BackfillProgress(rows_scanned=rows_scanned, rows_updated=rows_updated, resumed_from=rows_scanned)
+        started = time.monotonic()
+
+        while not progress.done:
+            params: Dict[str, Any] = {"batch_size": self.batch_size, "value": self.value}
+            if last_key is not None:
+                params.update({f"key{i}": value for i, value in enumerate(last_key)})
+
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(self._batch_sql(key, last_key is not None), params)
+                    scanned, updated, batch_last_key, updated_athletes, updated_times = cur.fetchone()
+                    if self.on_updated_rows is not None and updated:
+                        self.on_updated_rows(cur, list(zip(updated_athletes, updated_times)))
+                    if scanned:
+                        last_key = batch_last_key
+                    progress.rows_scanned += scanned
+                    progress.rows_updated += updated
+                    progress.batches += 1
+                    progress.done = scanned < self.batch_size
+                    cur.execute("""
+                        UPDATE column_backfill_checkpoints SET
+                            last_key = %s,
+                            rows_scanned = %s,
+                            rows_updated = %s,
+                            updated_at = CURRENT_TIMESTAMP,
+                            completed_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+                        WHERE job_name = %s
+                    """, (
+                        json.dumps(last_key) if last_key is not None else None,
+                        progress.rows_scanned,
+                        progress.rows_updated,
+                        progress.done,
+                        self.job_name,
+                    ))
+                conn.commit()
+
+            progress.elapsed_seconds = time.monotonic() - started
+            logger.info(
+                f"Backfill {self.job_name}: {progress.rows_updated} rows updated, "
+                f"{progress.rows_scanned} scanned ({progress.rows_per_second:.0f} rows/s)"
+            )
+            if on_progress:
+                on_progress(progress)
+            if self.pause and not progress.done:
+                time.sleep(self.pause)
+
+        return progress
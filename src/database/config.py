@@ -11,4 +11,37 @@ DB_PARAMS = {
     "password": os.getenv("DB_PASSWORD"),
     "host": os.getenv("DB_HOST", "localhost"),
     "port": os.getenv("DB_PORT", 5432)
-} 
\ No newline at end of file
+}
+
+# Connection pool settings (see connection_pool.py)
+POOL_PARAMS = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 5)),
+    # Seconds a connection may sit idle before it is pinged on checkout
+    "health_check_interval": float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30)),
+    # Seconds to wait for a free connection before giving up
+    "checkout_timeout": float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", 10)),
+}
+
+# Opt-in partitioned activities layout (see partitioning.py)
+PARTITION_PARAMS = {
+    # "range" (yearly start_time partitions), "hash" (user_id partitions) or unset for one table
+    "strategy": os.getenv("ACTIVITIES_PARTITIONING") or None,
+    "hash_partitions": int(os.getenv("ACTIVITIES_HASH_PARTITIONS", 8)),
+    # First year given its own range partition; older activities land in the default partition
+    "first_year": int(os.getenv("ACTIVITIES_FIRST_PARTITION_YEAR", 2015)),
+}
+
+# Read-through cache for weekly summary reads (see summary_cache.py)
+CACHE_PARAMS = {
+    "local_max_entries": int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 2048)),
+    # Seconds an in-process entry may serve reads without seeing other containers' writes
+    "local_ttl": float(os.getenv("SUMMARY_CACHE_LOCAL_TTL", 900)),
+    # Seconds entries for the in-progress week are kept in either tier
+    "current_week_ttl": float(os.getenv("SUMMARY_CACHE_CURRENT_WEEK_TTL", 60)),
+    # "local" for the in-memory stand-in, unset to use the in-process tier only
+    "shared_backend": os.getenv("SUMMARY_CACHE_SHARED") or None,
+    "shared_max_entries": int(os.getenv("SUMMARY_CACHE_SHARED_MAX_ENTRIES", 100_000)),
+    # Seconds the shared tier keeps entries for completed weeks, a backstop behind invalidation
+    "shared_ttl": float(os.getenv("SUMMARY_CACHE_SHARED_TTL", 86400)),
+}
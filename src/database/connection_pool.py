@@ -0,0 +1,321 @@
+"""Process-wide PostgreSQL connection pool.
+
+Pools live at module level, so a warm Lambda container keeps its open
+connections between invocations instead of paying a new TCP + auth handshake
+for every query.
+
+Usage:
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from .config import DB_PARAMS, POOL_PARAMS
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+@dataclass
+class PoolStats:
+    """Snapshot of pool usage counters."""
+    min_size: int
+    max_size: int
+    open_connections: int
+    idle_connections: int
+    in_use: int
+    checkouts: int
+    connections_created: int
+    connections_discarded: int
+    health_checks: int
+    health_check_failures: int
+    checkout_timeouts: int
+    total_wait_seconds: float
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections with health checks on checkout."""
+
+    def __init__(
+        self,
+        db_params: Dict[str, Any] = DB_PARAMS,
+        min_size: int = POOL_PARAMS["min_size"],
+        max_size: int = POOL_PARAMS["max_size"],
+        health_check_interval: float = POOL_PARAMS["health_check_interval"],
+        checkout_timeout: float = POOL_PARAMS["checkout_timeout"],
+    ):
+        """Initialize the pool. Connections are opened lazily on first checkout.
+
+        Args:
+            db_params: Keyword arguments passed to psycopg2.connect
+            min_size: Number of connections opened when the pool is first used
+            max_size: Maximum number of connections open at the same time
+            health_check_interval: Idle seconds after which a connection is pinged before reuse
+            checkout_timeout: Seconds to wait for a free connection before raising PoolTimeoutError
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.db_params = db_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._idle: Deque[Tuple[Any, float]] = deque()  # (connection, last used timestamp)
+        self._open = 0
+        self._warmed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_checks = 0
+        self._health_check_failures = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_params)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        """Close a connection and release its slot."""
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        """Check that a pooled connection is still usable."""
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        with self._cond:
+            self._health_checks += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            with self._cond:
+                self._health_check_failures += 1
+            return False
+
+    def _warm(self) -> None:
+        """Open min_size connections the first time the pool is used."""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            to_open = max(self.min_size - self._open, 0)
+            self._open += to_open
+
+        for i in range(to_open):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= to_open - i
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self):
+        """Check a connection out of the pool, opening a new one if allowed.
+
+        Raises:
+            PoolTimeoutError: If max_size connections are in use for longer than checkout_timeout
+        """
+        self._warm()
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No connection available after {self.checkout_timeout}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()  # LIFO keeps the hottest connections in use
+                else:
+                    conn, last_used = None, None
+                    self._open += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._checkouts += 1
+                self._wait_seconds += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """Return a connection to the pool, rolling back any open transaction."""
+        if close or self._closed or conn.closed:
+            self._discard(conn)
+            return
+
+        try:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(conn)
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Check out a connection for the duration of a with-block.
+
+        The block runs inside the connection's own context manager, so the
+        transaction is committed on success and rolled back on error, exactly
+        like `with psycopg2.connect(...) as conn:`. The connection is returned
+        to the pool afterwards instead of being left open.
+        """
+        conn = self.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.putconn(conn)
+
+    @contextmanager
+    def autocommit_connection(self) -> Iterator[Any]:
+        """Check out a connection in autocommit mode for the duration of a with-block.
+
+        For statements that cannot run inside a transaction block, such as
+        CREATE INDEX CONCURRENTLY. The connection is switched back to
+        transactional mode when it is returned to the pool.
+        """
+        conn = self.getconn()
+        try:
+            conn.autocommit = True
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> PoolStats:
+        """Return a snapshot of the pool's counters."""
+        with self._cond:
+            idle = len(self._idle)
+            return PoolStats(
+                min_size=self.min_size,
+                max_size=self.max_size,
+                open_connections=self._open,
+                idle_connections=idle,
+                in_use=self._open - idle,
+                checkouts=self._checkouts,
+                connections_created=self._created,
+                connections_discarded=self._discarded,
+                health_checks=self._health_checks,
+                health_check_failures=self._health_check_failures,
+                checkout_timeouts=self._timeouts,
+                total_wait_seconds=self._wait_seconds,
+            )
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(db_params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in db_params.items()))
+
+
+def get_pool(db_params: Optional[Dict[str, Any]] = None) -> ConnectionPool:
+    """Return the process-wide pool for the given connection parameters, creating it if needed."""
+    db_params = DB_PARAMS if db_params is None else db_params
+    key = _pool_key(db_params)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(db_params)
+            _pools[key] = pool
+        return pool
+
+
+def get_pool_stats() -> Dict[str, PoolStats]:
+    """Return stats for every pool in this process, keyed by database host/name."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        f"{pool.db_params.get('host')}/{pool.db_params.get('dbname')}": pool.stats()
+        for pool in pools
+    }
+
+
+def close_all_pools() -> None:
+    """Close every pool in this process (e.g. at the end of a batch job)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
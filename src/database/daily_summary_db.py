@@ -0,0 +1,200 @@
+"""Database operations for daily_summary table.
+
+One row per athlete per day with activities, holding session counts,
+durations, distances, training loads and zone seconds, overall and per
+sport, plus the day's best splits and VO2max readings. Ingest refreshes the
+days it touches in the same transaction (`refresh_daily_summaries`), so a
+late-arriving activity recomputes exactly one day. Weekly summaries, the
+monthly rollup and the training load series are composed from these rows
+instead of rescanning activities.
+
+Usage:
+    python -m src.database.daily_summary_db rebuild [--athlete-id ID]
+"""
+
+import argparse
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from activity.constants import ActivityCategory
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import fetch_records
+
+logger = logging.getLogger(__name__)
+
+ZONES = range(1, 6)
+SPORTS = {
+    "cycling": ActivityCategory.CYCLING,
+    "running": ActivityCategory.RUNNING,
+    "swimming": ActivityCategory.SWIMMING,
+}
+# Sports that carry power zone totals
+POWER_SPORTS = ("cycling", "running")
+
+
+def _sum(column: str, sport: Optional[str] = None) -> str:
+    # Summed in start_time order, so results don't depend on the plan
+    expr = f"COALESCE(SUM({column} ORDER BY start_time, activity_id)"
+    if sport is not None:
+        expr += f" FILTER (WHERE activity_category = '{SPORTS[sport].value}')"
+    return expr + ", 0)"
+
+
+def _zone_array(prefix: str, sport: Optional[str] = None) -> str:
+    return "ARRAY[" + ", ".join(_sum(f"{prefix}_time_z{zone}_seconds", sport) for zone in ZONES) + "]::float8[]"
+
+
+# (column, DDL type, aggregate over the day's activities)
+_COLUMNS: List[Tuple[str, str, str]] = [
+    ("num_sessions", "INTEGER", "COUNT(*)"),
+    ("total_duration_seconds", "FLOAT", _sum("duration")),
+    ("total_distance_meters", "FLOAT", _sum("distance")),
+    ("total_training_load", "FLOAT", _sum("activity_training_load")),
+    *[
+        column
+        for sport in SPORTS
+        for column in (
+            (f"num_sessions_{sport}", "INTEGER", f"COUNT(*) FILTER (WHERE activity_category = '{SPORTS[sport].value}')"),
+            (f"total_duration_{sport}_seconds", "FLOAT", _sum("duration", sport)),
+            (f"total_distance_{sport}_meters", "FLOAT", _sum("distance", sport)),
+            (f"total_training_load_{sport}", "FLOAT", _sum("activity_training_load", sport)),
+        )
+    ],
+    ("time_in_hr_zones", "FLOAT8[]", _zone_array("hr")),
+    ("time_in_power_zones", "FLOAT8[]", _zone_array("power")),
+    *[(f"time_in_hr_zones_{sport}", "FLOAT8[]", _zone_array("hr", sport)) for sport in SPORTS],
+    *[(f"time_in_power_zones_{sport}", "FLOAT8[]", _zone_array("power", sport)) for sport in POWER_SPORTS],
+    ("best_5k_time", "FLOAT", "MIN(fastest_split_5k)"),
+    ("best_10k_time", "FLOAT", "MIN(fastest_split_10k)"),
+    # VO2max readings of 0 are treated as missing
+    ("vo2max_first", "FLOAT", "(ARRAY_AGG(vo2_max ORDER BY start_time, activity_id) FILTER (WHERE vo2_max <> 0))[1]"),
+    ("vo2max_last", "FLOAT", "(ARRAY_AGG(vo2_max ORDER BY start_time DESC, activity_id DESC) FILTER (WHERE vo2_max <> 0))[1]"),
+    ("vo2max_max", "FLOAT", "MAX(vo2_max) FILTER (WHERE vo2_max <> 0)"),
+    ("vo2max_min", "FLOAT", "MIN(vo2_max) FILTER (WHERE vo2_max <> 0)"),
+]
+DAILY_SUMMARY_COLUMNS = [column for column, _, _ in _COLUMNS]
+
+
+def _aggregate_sql(source: str) -> str:
+    """INSERT ... SELECT recomputing daily_summary rows from the activities in `source` (aliased a)."""
+    select_list = ",\n        ".join(f"{aggregate} AS {column}" for column, _, aggregate in _COLUMNS)
+    return f"""
+    INSERT INTO daily_summary (athlete_id, day, {', '.join(DAILY_SUMMARY_COLUMNS)})
+    SELECT
+        a.user_id,
+        a.start_time::date,
+        {select_list}
+    FROM {source}
+    GROUP BY a.user_id, a.start_time::date
+    ON CONFLICT (athlete_id, day) DO UPDATE SET
+        {', '.join(f"{column} = EXCLUDED.{column}" for column in DAILY_SUMMARY_COLUMNS)},
+        updated_at = CURRENT_TIMESTAMP
+    """
+
+
+_COLUMNS_DDL = ",\n    ".join(f"{column} {column_type}" for column, column_type, _ in _COLUMNS)
+
+CREATE_DAILY_SUMMARY_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS daily_summary (
+    athlete_id INTEGER NOT NULL,
+    day DATE NOT NULL,  -- start_time::date of the activities
+    {_COLUMNS_DDL},
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (athlete_id, day)
+);
+"""
+
+# Days must be distinct, or their activities are counted more than once
+REFRESH_DAYS_SQL = _aggregate_sql("""unnest(%(athlete_ids)s::int[], %(days)s::date[]) AS d(athlete_id, day)
+    JOIN activities a
+        ON a.user_id = d.athlete_id
+        AND a.start_time >= d.day AND a.start_time < d.day + 1""")
+
+REBUILD_SQL = _aggregate_sql("activities a WHERE %(athlete_id)s::int IS NULL OR a.user_id = %(athlete_id)s")
+
+# Recomputes every day; run once by migration 4 to fill the table for existing activities
+REBUILD_ALL_SQL = _aggregate_sql("activities a")
+
+
+def refresh_daily_summaries(cur, days: Iterable[Tuple[int, Any]]) -> None:
+    """Recompute the (athlete_id, day) rows using an open cursor, dropping days left without activities.
+
+    Days may be given as dates or as timestamps on the day.
+    """
+    days = sorted({(athlete_id, day.date() if isinstance(day, datetime) else day) for athlete_id, day in days})
+    if not days:
+        return
+    params = {"athlete_ids": [athlete_id for athlete_id, _ in days], "days": [day for _, day in days]}
+    cur.execute("""
+        DELETE FROM daily_summary s
+        USING unnest(%(athlete_ids)s::int[], %(days)s::date[]) AS d(athlete_id, day)
+        WHERE s.athlete_id = d.athlete_id AND s.day = d.day
+    """, params)
+    cur.execute(REFRESH_DAYS_SQL, params)
+
+
+class DailySummaryDB:
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_daily_summary_table(self):
+        """Create daily_summary table if it doesn't exist."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CREATE_DAILY_SUMMARY_TABLE_SQL)
+            conn.commit()
+
+    def refresh(self, days: Iterable[Tuple[int, Any]]) -> None:
+        """Recompute the given (athlete_id, day) rows from activities."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                refresh_daily_summaries(cur, days)
+            conn.commit()
+
+    def rebuild(self, athlete_id: Optional[int] = None) -> None:
+        """Recompute every row of one athlete (default: all athletes) from activities."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM daily_summary WHERE %(athlete_id)s::int IS NULL OR athlete_id = %(athlete_id)s",
+                    {"athlete_id": athlete_id}
+                )
+                cur.execute(REBUILD_SQL, {"athlete_id": athlete_id})
+            conn.commit()
+
+    def get_days(self, athlete_id: int, start: date, end: date) -> List[Any]:
+        """Return the rows of days in [start, end] that have activities, oldest first."""
+        query = """
+        SELECT * FROM daily_summary
+        WHERE athlete_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day ASC
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (athlete_id, start, end))
+                return fetch_records(cur, "DailySummary")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the daily summary table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="Recompute daily summaries from activities")
+    rebuild.add_argument("--athlete-id", type=int, help="Only rebuild this athlete")
+    args = parser.parse_args(argv)
+
+    db = DailySummaryDB()
+    db.create_daily_summary_table()
+    db.rebuild(args.athlete_id)
+    logger.info(f"Rebuilt daily summaries for {'athlete ' + str(args.athlete_id) if args.athlete_id else 'all athletes'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
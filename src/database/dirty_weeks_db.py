@@ -0,0 +1,118 @@
+"""Database operations for weekly_summary_dirty table.
+
+Ingest records every (athlete, ISO week) bucket whose activities changed.
+The weekly summary refresh stage claims those buckets, recomputes only them
+and so keeps summaries fresh at a cost proportional to new data.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import execute_values
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+
+# Used by writers inside their own transaction, with execute_values
+MARK_DIRTY_SQL = """
+INSERT INTO weekly_summary_dirty (athlete_id, week_start)
+VALUES %s
+ON CONFLICT (athlete_id, week_start) DO UPDATE SET marked_at = CURRENT_TIMESTAMP;
+"""
+
+
+def mark_dirty_weeks(cur, weeks: Iterable[Tuple[int, datetime]]) -> None:
+    """Mark (athlete_id, week_start) buckets dirty using an open cursor."""
+    weeks = sorted(set(weeks))
+    if weeks:
+        execute_values(cur, MARK_DIRTY_SQL, weeks)
+
+
+class DirtyWeeksDB:
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_dirty_weeks_table(self):
+        """Create weekly_summary_dirty table if it doesn't exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS weekly_summary_dirty (
+            athlete_id INTEGER NOT NULL,
+            week_start TIMESTAMP NOT NULL,  -- Monday 00:00, as date_trunc('week', start_time)
+            marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (athlete_id, week_start)
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def mark(self, weeks: Iterable[Tuple[int, datetime]]) -> None:
+        """Mark (athlete_id, week_start) buckets as needing recomputation."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                mark_dirty_weeks(cur, weeks)
+            conn.commit()
+
+    def pending(self, athlete_id: Optional[int] = None) -> Dict[int, List[datetime]]:
+        """Return dirty week starts grouped by athlete without claiming them."""
+        query = "SELECT athlete_id, week_start FROM weekly_summary_dirty"
+        params: Tuple = ()
+        if athlete_id is not None:
+            query += " WHERE athlete_id = %s"
+            params = (athlete_id,)
+        query += " ORDER BY athlete_id, week_start"
+
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return self._group(cur.fetchall())
+
+    def claim(
+        self,
+        athlete_id: Optional[int] = None,
+        week_starts: Optional[Sequence[datetime]] = None
+    ) -> Dict[int, List[datetime]]:
+        """Remove dirty marks and return them grouped by athlete.
+
+        Callers recompute the claimed weeks and should `mark` them again if
+        that fails. Activities changed while the recompute runs mark their
+        week again and are picked up by the next refresh.
+
+        Args:
+            athlete_id: Only claim this athlete's weeks
+            week_starts: Only claim these weeks (requires athlete_id)
+        """
+        query = "DELETE FROM weekly_summary_dirty"
+        conditions, params = [], []
+        if athlete_id is not None:
+            conditions.append("athlete_id = %s")
+            params.append(athlete_id)
+        if week_starts is not None:
+            if athlete_id is None:
+                raise ValueError("week_starts requires athlete_id")
+            conditions.append("week_start = ANY(%s)")
+            params.append(list(week_starts))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " RETURNING athlete_id, week_start"
+
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                claimed = self._group(cur.fetchall())
+            conn.commit()
+        return claimed
+
+    @staticmethod
+    def _group(rows: List[Tuple[int, datetime]]) -> Dict[int, List[datetime]]:
+        grouped: Dict[int, List[datetime]] = {}
+        for athlete_id, week_start in rows:
+            grouped.setdefault(athlete_id, []).append(week_start)
+        for weeks in grouped.values():
+            weeks.sort()
+        return grouped
@@ -0,0 +1,36 @@
+"""Content fingerprints for change-detecting upserts."""
+
+import hashlib
+import json
+from typing import Any, Dict
+
+# Columns that do not describe the activity itself and must not affect its fingerprint.
+# fit_file_downloaded_at is stamped with the current time on every sync, and
+# activity_category is derived from activity_type.
+FINGERPRINT_EXCLUDED_COLUMNS = frozenset({
+    'content_hash',
+    'activity_category',
+    'created_at',
+    'updated_at',
+    'fit_file_downloaded_at',
+})
+
+
+def activity_fingerprint(activity: Dict[str, Any]) -> str:
+    """Return an MD5 hex digest of an activity's payload.
+
+    The digest is computed over a canonical JSON encoding (sorted keys), so two
+    dicts with the same values always produce the same fingerprint regardless
+    of key order.
+    """
+    payload = {
+        key: value for key, value in activity.items()
+        if key not in FINGERPRINT_EXCLUDED_COLUMNS
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.md5(encoded.encode('utf-8')).hexdigest()
+
+
+def with_fingerprint(activity: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the activity with its content_hash filled in."""
+    return {**activity, 'content_hash': activity_fingerprint(activity)}
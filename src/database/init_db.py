@@ -7,6 +7,13 @@ Usage:
 import logging
 from .activities_db import ActivityDB
 from .weekly_summary_db import WeeklySummaryDB
+from .dirty_weeks_db import DirtyWeeksDB
+from .rollup_db import RollupDB
+from .training_load_db import TrainingLoadDB
+from .personal_records_db import PersonalRecordsDB
+from .daily_summary_db import DailySummaryDB
+from .migrations import MigrationRunner
+from .config import PARTITION_PARAMS
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -14,7 +21,7 @@ def init_database():
     """Initialize database tables."""
     try:
         db = ActivityDB()
-        logger.info("Creating activities table...")
+        logger.info(f"Creating activities table ({PARTITION_PARAMS['strategy'] or 'unpartitioned'})...")
         db.create_activities_table()
         logger.info("Activities table created successfully")
 
@@ -23,6 +30,35 @@ def init_database():
         db.create_weekly_summary_table()
         logger.info("Weekly summary table created successfully")
 
+        db = DirtyWeeksDB()
+        logger.info("Creating weekly_summary_dirty table...")
+        db.create_dirty_weeks_table()
+        logger.info("Weekly summary dirty table created successfully")
+
+        db = RollupDB()
+        logger.info("Creating weekly_rollup and monthly_summary tables...")
+        db.create_rollup_tables()
+        logger.info("Rollup tables created successfully")
+
+        db = TrainingLoadDB()
+        logger.info("Creating training_load_daily table...")
+        db.create_training_load_table()
+        logger.info("Training load table created successfully")
+
+        db = PersonalRecordsDB()
+        logger.info("Creating personal_records table...")
+        db.create_personal_records_table()
+        logger.info("Personal records table created successfully")
+
+        db = DailySummaryDB()
+        logger.info("Creating daily_summary table...")
+        db.create_daily_summary_table()
+        logger.info("Daily summary table created successfully")
+
+        logger.info("Applying schema migrations...")
+        applied = MigrationRunner().apply()
+        logger.info(f"Applied {len(applied)} schema migration(s)")
+
         # TODO: Create performance_benchmarks table
         # TODO: Create training_metadata table
         
@@ -0,0 +1,476 @@
+"""Versioned schema migrations.
+
+The `create_*_table` methods define the baseline schema and only build
+indexes when they create a table. Every later schema change is a numbered
+`Migration` in MIGRATIONS, applied once, in order, and recorded in
+schema_migrations.
+
+Steps are written so live tables stay available while they run:
+
+- AddColumn only takes constant defaults, which PostgreSQL 11+ stores in the
+  catalog instead of rewriting the table. The brief ACCESS EXCLUSIVE lock it
+  needs is requested with a lock_timeout, so a long-running query makes the
+  migration fail fast rather than queue ingest behind it.
+- CreateIndex builds with CREATE INDEX CONCURRENTLY (partition by partition
+  on partitioned tables), which blocks neither reads nor writes.
+- BackfillColumn fills a new column in short, resumable batches (see
+  column_backfill.py), so row locks are only held one batch at a time.
+
+Concurrent index builds cannot run inside a transaction, so a migration is
+not atomic. Every step is idempotent and a failed migration is re-run from
+its first step.
+
+Usage:
+    python -m src.database.migrations status
+    python -m src.database.migrations apply --dry-run
+    python -m src.database.migrations apply [--target VERSION]
+"""
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from activity.constants import activity_category_sql
+
+from .column_backfill import BACKFILL_BATCH_SIZE, ColumnBackfill
+from .config import DB_PARAMS
+from .daily_summary_db import CREATE_DAILY_SUMMARY_TABLE_SQL, REBUILD_ALL_SQL as REBUILD_DAILY_SUMMARY_SQL
+from .connection_pool import get_pool
+from .partitioning import list_partitions, table_layout
+from .row_mapping import schema_registry
+
+logger = logging.getLogger(__name__)
+
+# How long DDL waits for a lock before giving up instead of blocking writers
+LOCK_TIMEOUT = "3s"
+
+# Key for the advisory lock that keeps two runners from applying at once
+MIGRATION_LOCK_KEY = 4_815_162_342
+
+
+def set_lock_timeout(cur, timeout: str = LOCK_TIMEOUT) -> None:
+    """Limit how long statements in the current transaction wait for locks."""
+    cur.execute("SELECT set_config('lock_timeout', %s, true)", (timeout,))
+
+
+def table_size(cur, table: str) -> Tuple[int, int]:
+    """Estimated row count and on-disk size in bytes of a table, including its partitions."""
+    cur.execute("""
+        SELECT
+            COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint,
+            COALESCE(SUM(pg_table_size(c.oid)), 0)::bigint
+        FROM pg_class c
+        WHERE c.oid = to_regclass(%s)
+        OR c.oid IN (SELECT relid FROM pg_partition_tree(to_regclass(%s)))
+    """, (table, table))
+    return cur.fetchone()
+
+
+def _format_size(cur, table: str) -> str:
+    rows, size = table_size(cur, table)
+    cur.execute("SELECT pg_size_pretty(%s::bigint)", (size,))
+    return f"~{rows:,} rows, {cur.fetchone()[0]}"
+
+
+class Step:
+    """One idempotent schema change within a migration."""
+    lock = ""
+    blocks = ""
+    transactional = True
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def estimate(self, cur) -> str:
+        """Describe the expected cost of the step against the current database."""
+        raise NotImplementedError
+
+    def apply(self, cur) -> None:
+        raise NotImplementedError
+
+
+@dataclass
+class AddColumn(Step):
+    """ALTER TABLE ... ADD COLUMN IF NOT EXISTS with an optional constant default."""
+    table: str
+    column: str
+    column_type: str
+    default: Any = None
+
+    lock = "ACCESS EXCLUSIVE, catalog change only"
+    blocks = "reads and writes, for milliseconds"
+
+    def describe(self) -> str:
+        default = f" DEFAULT {self.default!r}" if self.default is not None else ""
+        return f"ADD COLUMN {self.table}.{self.column} {self.column_type}{default}"
+
+    def estimate(self, cur) -> str:
+        return f"no table rewrite ({_format_size(cur, self.table)})"
+
+    def apply(self, cur) -> None:
+        set_lock_timeout(cur)
+        statement = sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}").format(
+            sql.Identifier(self.table), sql.Identifier(self.column), sql.SQL(self.column_type)
+        )
+        if self.default is not None:
+            # A bound constant is never volatile, so existing rows are not rewritten
+            statement += sql.SQL(" DEFAULT {}").format(sql.Literal(self.default))
+        cur.execute(statement)
+        schema_registry.invalidate(self.table)
+
+
+@dataclass
+class CreateIndex(Step):
+    """CREATE INDEX CONCURRENTLY, including on partitioned tables.
+
+    Args:
+        name: Index name
+        table: Table to index
+        definition: Everything after the table name, e.g. "(user_id, start_time DESC)"
+            or "(average_power) WHERE average_power IS NOT NULL"
+    """
+    name: str
+    table: str
+    definition: str
+
+    lock = "SHARE UPDATE EXCLUSIVE"
+    blocks = "other DDL and VACUUM only; reads and writes continue"
+    transactional = False
+
+    def describe(self) -> str:
+        return f"CREATE INDEX CONCURRENTLY {self.name} ON {self.table} {self.definition}"
+
+    def estimate(self, cur) -> str:
+        return f"two scans of {self.table} ({_format_size(cur, self.table)}) plus a sort"
+
+    def apply(self, cur) -> None:
+        if table_layout(cur, self.table) in ("range", "hash", "list"):
+            self._apply_partitioned(cur)
+        else:
+            self._create_concurrently(cur, self.name, self.table)
+
+    def _create_concurrently(self, cur, name: str, table: str) -> None:
+        # An interrupted concurrent build leaves an invalid index behind that
+        # IF NOT EXISTS would keep forever
+        cur.execute("""
+            SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)
+        """, (name,))
+        row = cur.fetchone()
+        if row and row[0]:
+            cur.execute(sql.SQL("DROP INDEX CONCURRENTLY {}").format(sql.Identifier(name)))
+        cur.execute(sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ").format(
+            sql.Identifier(name), sql.Identifier(table)
+        ) + sql.SQL(self.definition))
+
+    def _apply_partitioned(self, cur) -> None:
+        # PostgreSQL cannot build an index on a partitioned table concurrently.
+        # Create it on the parent only (invalid until every partition has a
+        # matching index), build each partition's index concurrently and attach it.
+        cur.execute("BEGIN")
+        set_lock_timeout(cur)
+        cur.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON ONLY {} ").format(
+            sql.Identifier(self.name), sql.Identifier(self.table)
+        ) + sql.SQL(self.definition))
+        cur.execute("COMMIT")
+        # Partitions that already have an index attached, including the
+        # automatically named ones of a parent index created with the table
+        cur.execute("""
+            SELECT t.relname
+            FROM pg_inherits i
+            JOIN pg_index x ON x.indexrelid = i.inhrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            WHERE i.inhparent = to_regclass(%s)
+        """, (self.name,))
+        attached = {row[0] for row in cur.fetchall()}
+
+        for partition in list_partitions(cur, self.table):
+            if partition in attached:
+                continue
+            partition_index = f"{partition}_{self.name}"
+            self._create_concurrently(cur, partition_index, partition)
+            cur.execute(sql.SQL("ALTER INDEX {} ATTACH PARTITION {}").format(
+                sql.Identifier(self.name), sql.Identifier(partition_index)
+            ))
+
+
+@dataclass
+class BackfillColumn(Step):
+    """Set a column from a SQL expression in resumable batches of committed updates.
+
+    Args:
+        table: Table to update
+        column: Column to set
+        value_sql: SQL expression over the row's columns
+        batch_size: Rows per transaction
+        db_params: Connection parameters for the batch transactions
+    """
+    table: str
+    column: str
+    value_sql: str
+    batch_size: int = BACKFILL_BATCH_SIZE
+    db_params: Dict[str, Any] = field(default_factory=lambda: DB_PARAMS, repr=False)
+
+    lock = "ROW EXCLUSIVE, one batch of rows at a time"
+    blocks = "writes to the rows of the current batch only"
+    transactional = False
+
+    def describe(self) -> str:
+        return f"BACKFILL {self.table}.{self.column} = {' '.join(self.value_sql.split())}"
+
+    def estimate(self, cur) -> str:
+        rows, _ = table_size(cur, self.table)
+        return f"~{-(-rows // self.batch_size):,} batches of {self.batch_size:,} rows ({_format_size(cur, self.table)})"
+
+    def apply(self, cur) -> None:
+        ColumnBackfill(
+            self.table,
+            self.column,
+            value_sql=self.value_sql,
+            batch_size=self.batch_size,
+            job_name=f"migration.{self.table}.{self.column}",
+            db_params=self.db_params
+        ).run()
+
+
+@dataclass
+class RunSQL(Step):
+    """Arbitrary SQL for changes the other steps don't cover; declare the lock it takes."""
+    statement: str
+    lock: str
+    blocks: str
+    cost: str = "unknown"
+    transactional: bool = True
+
+    def describe(self) -> str:
+        return " ".join(self.statement.split())
+
+    def estimate(self, cur) -> str:
+        return self.cost
+
+    def apply(self, cur) -> None:
+        if self.transactional:
+            set_lock_timeout(cur)
+        cur.execute(self.statement)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    steps: List[Step] = field(default_factory=list)
+
+
+_WEEKLY_SUMMARY_ZONE_COLUMNS = (
+    "time_in_hr_zones",
+    "time_in_power_zones",
+    "time_in_hr_zones_cycling",
+    "time_in_hr_zones_running",
+    "time_in_hr_zones_swimming",
+    "time_in_power_zones_cycling",
+    "time_in_power_zones_running",
+)
+
+
+def _zone_arrays_sql() -> str:
+    """Convert weekly_summary zone columns from {"1": seconds, ...} JSONB to float8[5], in one rewrite.
+
+    Skipped when the columns are already arrays (tables created after the change).
+    """
+    alters = ",\n            ".join(
+        f"ALTER COLUMN {column} TYPE float8[] USING CASE WHEN {column} IS NULL THEN NULL ELSE ARRAY["
+        + ", ".join(f"COALESCE(({column}->>'{zone}')::float8, 0)" for zone in range(1, 6))
+        + "] END"
+        for column in _WEEKLY_SUMMARY_ZONE_COLUMNS
+    )
+    return f"""
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'weekly_summary' AND column_name = 'time_in_hr_zones' AND data_type = 'jsonb'
+        ) THEN
+            ALTER TABLE weekly_summary
+            {alters};
+        END IF;
+    END $$;
+    """
+
+
+# Applied in order; never renumber or edit a migration once it has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, "activities_content_hash", [
+        # Tables created before upserts skipped unchanged rows
+        AddColumn("activities", "content_hash", "CHAR(32)"),
+    ]),
+    Migration(2, "activities_activity_category", [
+        # Sport category stored at ingest so per-sport metrics can GROUP BY it
+        AddColumn("activities", "activity_category", "VARCHAR(20)"),
+        BackfillColumn("activities", "activity_category", activity_category_sql()),
+        CreateIndex("idx_activities_user_category", "activities", "(user_id, activity_category, start_time)"),
+    ]),
+    Migration(3, "weekly_summary_zone_arrays", [
+        # Zone dicts become float8[5] arrays; formatted zone strings are derived on read
+        RunSQL(
+            _zone_arrays_sql(),
+            lock="ACCESS EXCLUSIVE",
+            blocks="reads and writes of weekly_summary while it is rewritten (one row per athlete-week)",
+            cost="one rewrite of weekly_summary",
+        ),
+        RunSQL(
+            "ALTER TABLE weekly_summary " + ", ".join(
+                f"DROP COLUMN IF EXISTS {column}_formatted" for column in _WEEKLY_SUMMARY_ZONE_COLUMNS
+            ),
+            lock="ACCESS EXCLUSIVE, catalog change only",
+            blocks="reads and writes, for milliseconds",
+            cost="no table rewrite",
+        ),
+    ]),
+    Migration(4, "daily_summary", [
+        # Per-day aggregates that weekly summaries and rollups are composed from
+        RunSQL(
+            CREATE_DAILY_SUMMARY_TABLE_SQL,
+            lock="none, new table",
+            blocks="nothing",
+            cost="no data",
+        ),
+        RunSQL(
+            REBUILD_DAILY_SUMMARY_SQL,
+            lock="ROW EXCLUSIVE on daily_summary, ACCESS SHARE on activities",
+            blocks="nothing; ingest refreshing the same days waits for the fill to commit",
+            cost="one scan of activities",
+        ),
+    ]),
+]
+
+
+class MigrationRunner:
+    """Applies pending migrations and records them in schema_migrations."""
+
+    def __init__(self, migrations: Optional[List[Migration]] = None, db_params: Dict[str, Any] = DB_PARAMS):
+        self.migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_migrations_table(self):
+        """Create schema_migrations table if it doesn't exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_seconds FLOAT
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def applied(self) -> Dict[int, Any]:
+        """Return applied migrations keyed by version."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                if table_layout(cur, "schema_migrations") is None:
+                    return {}
+                cur.execute("SELECT version, name, applied_at, duration_seconds FROM schema_migrations")
+                return {row[0]: row for row in cur.fetchall()}
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        applied = self.applied()
+        return [
+            migration for migration in self.migrations
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+
+    def plan(self, target: Optional[int] = None) -> List[str]:
+        """Describe each pending step with its lock level and estimated cost, without applying anything."""
+        lines = []
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                for migration in self.pending(target):
+                    lines.append(f"{migration.version:04d} {migration.name}")
+                    for step in migration.steps:
+                        lines.append(f"    {step.describe()}")
+                        lines.append(f"        lock: {step.lock} (blocks {step.blocks})")
+                        lines.append(f"        cost: {step.estimate(cur)}")
+        return lines
+
+    def apply(self, target: Optional[int] = None) -> List[Migration]:
+        """Apply pending migrations up to `target` (default: all) in version order.
+
+        Returns:
+            The migrations that were applied
+        """
+        self.create_migrations_table()
+        pool = get_pool(self.db_params)
+
+        # Each step runs in autocommit mode; transactional steps wrap themselves
+        with pool.autocommit_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+                if not cur.fetchone()[0]:
+                    raise RuntimeError("Another process is applying migrations")
+                try:
+                    applied = []
+                    for migration in self.pending(target):
+                        self._apply_migration(cur, migration)
+                        applied.append(migration)
+                    return applied
+                finally:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+
+    def _apply_migration(self, cur, migration: Migration) -> None:
+        logger.info(f"Applying migration {migration.version:04d} {migration.name}")
+        started = time.monotonic()
+        for step in migration.steps:
+            logger.info(f"  {step.describe()}")
+            if step.transactional:
+                cur.execute("BEGIN")
+                try:
+                    step.apply(cur)
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+                cur.execute("COMMIT")
+            else:
+                step.apply(cur)
+
+        cur.execute("""
+            INSERT INTO schema_migrations (version, name, duration_seconds)
+            VALUES (%s, %s, %s)
+        """, (migration.version, migration.name, time.monotonic() - started))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List applied and pending migrations")
+    apply = commands.add_parser("apply", help="Apply pending migrations")
+    apply.add_argument("--target", type=int, help="Stop after this version")
+    apply.add_argument("--dry-run", action="store_true", help="Report locks and cost without applying")
+    args = parser.parse_args(argv)
+
+    runner = MigrationRunner()
+    if args.command == "status":
+        applied = runner.applied()
+        for migration in runner.migrations:
+            row = applied.get(migration.version)
+            state = f"applied {row[2]:%Y-%m-%d %H:%M} ({row[3]:.1f}s)" if row else "pending"
+            print(f"{migration.version:04d} {migration.name}: {state}")
+    elif args.dry_run:
+        print("\n".join(runner.plan(args.target)) or "No pending migrations")
+    else:
+        applied = runner.apply(args.target)
+        print(f"Applied {len(applied)} migration(s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
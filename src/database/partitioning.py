@@ -0,0 +1,554 @@
+"""Partitioned layouts for the activities table.
+
+Two opt-in layouts are supported, selected with ACTIVITIES_PARTITIONING:
+
+- "range": yearly partitions on start_time (activities_y2024, ...) plus a
+  default partition. Per-athlete date range queries prune to the years they
+  cover, and old years can be detached cheaply.
+- "hash": partitions on user_id (activities_h0, ...), spreading athletes
+  evenly over a fixed number of smaller tables and indexes.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (activity_id, start_time) or (activity_id, user_id).
+Writers look it up with `schema_registry.primary_key` and use it as their
+ON CONFLICT target.
+
+An existing single-table install is converted online with
+
+    python -m src.database.partitioning migrate --strategy range
+
+which copies rows in short keyset batches, catches up writes made while it
+ran and swaps the tables in one brief transaction. The old table is kept as
+activities_unpartitioned. Processes that were running during the swap have
+cached the old primary key and must be restarted.
+"""
+
+import argparse
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2 import errors, sql
+
+from .config import DB_PARAMS, PARTITION_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import schema_registry
+
+logger = logging.getLogger(__name__)
+
+# strategy: (partition method, partition column, primary key)
+PARTITION_STRATEGIES = {
+    "range": ("RANGE", "start_time", ("activity_id", "start_time")),
+    "hash": ("HASH", "user_id", ("activity_id", "user_id")),
+}
+
+# Rows copied per transaction by the migration
+MIGRATION_BATCH_SIZE = 5_000
+
+# updated_at is set to the writing transaction's start time, so a row can
+# become visible well after its updated_at. Catch-up marks are therefore taken
+# no later than the start of the oldest open transaction.
+CATCH_UP_MARK_SQL = """
+SELECT LEAST(LOCALTIMESTAMP, MIN(xact_start)::timestamp)
+FROM pg_stat_activity
+WHERE datname = current_database()
+AND backend_type = 'client backend'
+AND pid <> pg_backend_pid()
+"""
+
+SWAP_LOCK_TIMEOUT = "5s"
+SWAP_ATTEMPTS = 10
+
+
+def _strategy(strategy: str) -> Tuple[str, str, Tuple[str, ...]]:
+    try:
+        return PARTITION_STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(
+            f"Unknown partitioning strategy {strategy!r}, expected one of: {', '.join(PARTITION_STRATEGIES)}"
+        ) from None
+
+
+def partition_key(strategy: Optional[str]) -> Tuple[str, ...]:
+    """Primary key columns of the activities table for a layout (None for a single table)."""
+    return _strategy(strategy)[2] if strategy else ("activity_id",)
+
+
+def partition_by_sql(strategy: str) -> str:
+    method, column, _ = _strategy(strategy)
+    return f"PARTITION BY {method} ({column})"
+
+
+def year_partition_name(prefix: str, year: int) -> str:
+    return f"{prefix}_y{year}"
+
+
+def table_layout(cur, table: str) -> Optional[str]:
+    """Return "plain", "range", "hash" or "list" for an existing table, None if it doesn't exist."""
+    cur.execute("""
+        SELECT c.relkind, p.partstrat
+        FROM pg_class c
+        LEFT JOIN pg_partitioned_table p ON p.partrelid = c.oid
+        WHERE c.oid = to_regclass(%s)
+    """, (table,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    relkind, partstrat = row
+    if relkind != "p":
+        return "plain"
+    return {"r": "range", "h": "hash", "l": "list"}[partstrat]
+
+
+def list_partitions(cur, parent: str) -> Dict[str, str]:
+    """Map each partition of `parent` to its bound expression."""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (parent,))
+    return dict(cur.fetchall())
+
+
+def create_partitions(
+    cur,
+    strategy: str,
+    parent: str = "activities",
+    prefix: Optional[str] = None,
+    years: Iterable[int] = (),
+    hash_partitions: int = PARTITION_PARAMS["hash_partitions"]
+) -> None:
+    """Create the partitions of a freshly created partitioned parent.
+
+    Args:
+        strategy: "range" or "hash"
+        parent: Partitioned table
+        prefix: Partition name prefix (default: parent)
+        years: Years given their own range partition
+        hash_partitions: Number of hash partitions
+    """
+    prefix = prefix or parent
+    if strategy == "range":
+        ensure_year_partitions(cur, years, parent, prefix)
+        cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+            sql.Identifier(f"{prefix}_default"), sql.Identifier(parent)
+        ))
+    else:
+        _strategy(strategy)
+        for remainder in range(hash_partitions):
+            cur.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES WITH (MODULUS %s, REMAINDER %s)"
+            ).format(sql.Identifier(f"{prefix}_h{remainder}"), sql.Identifier(parent)),
+                (hash_partitions, remainder))
+
+
+def ensure_year_partitions(
+    cur,
+    years: Iterable[int],
+    parent: str = "activities",
+    prefix: Optional[str] = None
+) -> List[str]:
+    """Create missing yearly partitions of a start_time range partitioned table.
+
+    Rows for a new year that already landed in the default partition are
+    moved into the new partition in the same transaction, since PostgreSQL
+    refuses to add a partition that would overlap rows in the default one.
+
+    Returns:
+        Names of the partitions created
+    """
+    prefix = prefix or parent
+    existing = list_partitions(cur, parent)
+    default = f"{prefix}_default"
+    created = []
+    for year in sorted(set(years)):
+        name = year_partition_name(prefix, year)
+        if name in existing:
+            continue
+        params = {"lower": date(year, 1, 1), "upper": date(year + 1, 1, 1)}
+        identifiers = {
+            "name": sql.Identifier(name),
+            "parent": sql.Identifier(parent),
+            "default": sql.Identifier(default),
+        }
+        if default in existing:
+            cur.execute(sql.SQL("""
+                CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS);
+                WITH moved AS (
+                    DELETE FROM {default}
+                    WHERE start_time >= %(lower)s AND start_time < %(upper)s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+                ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%(lower)s) TO (%(upper)s);
+            """).format(**identifiers), params)
+        else:
+            cur.execute(sql.SQL(
+                "CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM (%(lower)s) TO (%(upper)s)"
+            ).format(**identifiers), params)
+        created.append(name)
+    return created
+
+
+def detach_partition(
+    name: str,
+    parent: str = "activities",
+    concurrently: Optional[bool] = None,
+    db_params: Dict[str, Any] = DB_PARAMS
+) -> None:
+    """Detach a partition, leaving it as a standalone table to archive or drop.
+
+    Args:
+        name: Partition to detach, e.g. activities_y2016
+        parent: Partitioned table
+        concurrently: Detach without blocking queries on the parent. PostgreSQL
+            only allows this when there is no default partition; by default it
+            is used whenever possible, otherwise a plain DETACH takes a brief
+            exclusive lock.
+        db_params: Connection parameters
+    """
+    with get_pool(db_params).connection() as conn:
+        with conn.cursor() as cur:
+            partitions = list_partitions(cur, parent)
+    if name not in partitions:
+        raise ValueError(f"{name} is not a partition of {parent}")
+    if concurrently is None:
+        concurrently = "DEFAULT" not in partitions.values()
+
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    with get_pool(db_params).autocommit_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}{}").format(
+                sql.Identifier(parent),
+                sql.Identifier(name),
+                sql.SQL(" CONCURRENTLY" if concurrently else "")
+            ))
+    print(f"Detached {name} from {parent}")
+
+
+class PartitionMigration:
+    """Moves a plain activities table into a partitioned one without long locks.
+
+    1. Create `<table>_partitioned` with the same columns, partitions and indexes,
+       plus a temporary index on the old table's updated_at.
+    2. Copy rows in activity_id order, one short transaction per batch. A
+       rerun resumes after the highest activity_id already copied.
+    3. Re-apply rows updated since the copy started until a pass is small.
+    4. In one transaction with a lock_timeout, lock the old table, apply the
+       last changes (about one batch at most) and swap the table names.
+
+    Rows deleted from the old table while the migration runs are not tracked,
+    and neither are updates that bypass updated_at (update_column_values);
+    avoid both until the swap is done.
+    """
+
+    def __init__(
+        self,
+        strategy: str,
+        table: str = "activities",
+        batch_size: int = MIGRATION_BATCH_SIZE,
+        pause: float = 0.0,
+        hash_partitions: int = PARTITION_PARAMS["hash_partitions"],
+        db_params: Dict[str, Any] = DB_PARAMS
+    ):
+        _, self.partition_column, self.key = _strategy(strategy)
+        self.strategy = strategy
+        self.table = table
+        self.target = f"{table}_partitioned"
+        self.backup = f"{table}_unpartitioned"
+        self.updated_at_index = f"{table}_migration_updated_at"
+        self.batch_size = batch_size
+        self.pause = pause
+        self.hash_partitions = hash_partitions
+        self.db_params = db_params
+
+    def _get_connection(self):
+        return get_pool(self.db_params).connection()
+
+    def run(self) -> None:
+        """Run (or resume) the whole migration."""
+        copy_started_at = self.prepare()
+        self.copy()
+        since = self.catch_up(copy_started_at)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                # Before the swap, so queries planned right after it see real statistics
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(self.target)))
+            conn.commit()
+        self.swap(since)
+
+    def prepare(self) -> datetime:
+        """Create the partitioned table if needed and return when copying started."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                layout = table_layout(cur, self.table)
+                if layout != "plain":
+                    raise ValueError(f"{self.table} is {layout or 'missing'}, expected a plain table")
+
+                target_layout = table_layout(cur, self.target)
+                if target_layout is not None:
+                    if target_layout != self.strategy:
+                        raise ValueError(f"{self.target} exists with {target_layout} layout, not {self.strategy}")
+                    cur.execute("SELECT obj_description(to_regclass(%s), 'pg_class')", (self.target,))
+                    copy_started_at = datetime.fromisoformat(cur.fetchone()[0])
+                    logger.info(f"Resuming migration into {self.target} (copy started {copy_started_at})")
+                    return copy_started_at
+
+                cur.execute(CATCH_UP_MARK_SQL)
+                copy_started_at = cur.fetchone()[0]
+                self._create_target(cur, copy_started_at)
+            conn.commit()
+
+        # Lets catch-up passes find recently updated rows without scanning the table
+        with get_pool(self.db_params).autocommit_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} (updated_at)").format(
+                    sql.Identifier(self.updated_at_index), sql.Identifier(self.table)
+                ))
+
+        logger.info(f"Created {self.target} ({self.strategy} partitioned)")
+        return copy_started_at
+
+    def _create_target(self, cur, copy_started_at: datetime) -> None:
+        method, column, key = _strategy(self.strategy)
+        cur.execute(sql.SQL("""
+            CREATE TABLE {target} (
+                LIKE {table} INCLUDING DEFAULTS,
+                PRIMARY KEY ({key})
+            ) PARTITION BY {method} ({column})
+        """).format(
+            target=sql.Identifier(self.target),
+            table=sql.Identifier(self.table),
+            key=sql.SQL(", ").join(map(sql.Identifier, key)),
+            method=sql.SQL(method),
+            column=sql.Identifier(column),
+        ))
+        # The resume point for catch-up is kept with the table it belongs to
+        cur.execute(sql.SQL("COMMENT ON TABLE {} IS %s").format(sql.Identifier(self.target)),
+                    (copy_started_at.isoformat(),))
+
+        years: Iterable[int] = ()
+        if self.strategy == "range":
+            cur.execute(sql.SQL("SELECT EXTRACT(YEAR FROM MIN(start_time))::int FROM {}").format(
+                sql.Identifier(self.table)
+            ))
+            first_year = cur.fetchone()[0] or copy_started_at.year
+            years = range(max(first_year, PARTITION_PARAMS["first_year"]), copy_started_at.year + 2)
+        create_partitions(cur, self.strategy, self.target, self.table, years, self.hash_partitions)
+
+        for name, using in self._secondary_indexes(cur):
+            cur.execute(sql.SQL("CREATE INDEX {} ON {} USING ").format(
+                sql.Identifier(f"{name}_partitioned"), sql.Identifier(self.target)
+            ) + sql.SQL(using))
+
+    def _secondary_indexes(self, cur) -> List[Tuple[str, str]]:
+        """(name, "USING ..." tail of the definition) for each non-primary-key index of the old table."""
+        cur.execute("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s)
+            AND NOT x.indisprimary
+            AND i.relname <> %s
+            ORDER BY i.relname
+        """, (self.table, self.updated_at_index))
+        return [(name, definition.split(" USING ", 1)[1]) for name, definition in cur.fetchall()]
+
+    def _columns(self, cur) -> List[str]:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s ORDER BY ordinal_position
+        """, (self.table,))
+        return [row[0] for row in cur.fetchall()]
+
+    def copy(self) -> int:
+        """Copy rows not yet in the partitioned table, one batch per transaction."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                columns = sql.SQL(", ").join(map(sql.Identifier, self._columns(cur)))
+                cur.execute(sql.SQL("SELECT MAX(activity_id) FROM {}").format(sql.Identifier(self.target)))
+                last_id = cur.fetchone()[0]
+            conn.commit()
+
+        batch_sql = sql.SQL("""
+            WITH batch AS (
+                SELECT {columns} FROM {table}
+                WHERE %(last_id)s IS NULL OR activity_id > %(last_id)s
+                ORDER BY activity_id
+                LIMIT %(batch_size)s
+            ), copied AS (
+                INSERT INTO {target} ({columns})
+                SELECT {columns} FROM batch
+                ON CONFLICT DO NOTHING
+            )
+            SELECT COUNT(*), MAX(activity_id) FROM batch
+        """).format(columns=columns, table=sql.Identifier(self.table), target=sql.Identifier(self.target))
+
+        copied = 0
+        started = time.monotonic()
+        while True:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(batch_sql, {"last_id": last_id, "batch_size": self.batch_size})
+                    count, batch_last_id = cur.fetchone()
+                conn.commit()
+            if count == 0:
+                break
+            copied += count
+            last_id = batch_last_id
+            elapsed = time.monotonic() - started
+            logger.info(f"Copied {copied} rows up to activity_id {last_id} ({copied / max(elapsed, 1e-9):.0f} rows/s)")
+            if count < self.batch_size:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+        return copied
+
+    def _apply_changes_sql(self, cur) -> sql.Composed:
+        """Upsert rows updated since %(since)s into the partitioned table.
+
+        Rows already copied with the same updated_at are left alone, so the
+        row count reflects real changes.
+        """
+        column_names = self._columns(cur)
+        columns = sql.SQL(", ").join(map(sql.Identifier, column_names))
+        return sql.SQL("""
+            WITH changed AS (
+                SELECT {columns} FROM {table} WHERE updated_at >= %(since)s
+            ), moved AS (
+                -- A changed partition key means the row is inserted under its new key
+                DELETE FROM {target} t
+                USING changed c
+                WHERE t.activity_id = c.activity_id
+                AND t.{partition_column} IS DISTINCT FROM c.{partition_column}
+            )
+            INSERT INTO {target} ({columns})
+            SELECT {columns} FROM changed
+            ON CONFLICT ({key}) DO UPDATE SET {assignments}
+            WHERE {target}.updated_at IS DISTINCT FROM EXCLUDED.updated_at
+        """).format(
+            columns=columns,
+            table=sql.Identifier(self.table),
+            target=sql.Identifier(self.target),
+            partition_column=sql.Identifier(self.partition_column),
+            key=sql.SQL(", ").join(map(sql.Identifier, self.key)),
+            assignments=sql.SQL(", ").join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+                for column in column_names if column not in self.key
+            ),
+        )
+
+    def catch_up(self, since: datetime) -> datetime:
+        """Apply rows updated since the last mark until a pass changes at most one batch.
+
+        Returns:
+            Mark to catch up from during the swap
+        """
+        while True:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(CATCH_UP_MARK_SQL)
+                    mark = cur.fetchone()[0]
+                    cur.execute(self._apply_changes_sql(cur), {"since": since})
+                    applied = cur.rowcount
+                conn.commit()
+            logger.info(f"Caught up {applied} rows updated since {since}")
+            since = mark
+            if applied <= self.batch_size:
+                return since
+
+    def swap(self, since: datetime) -> None:
+        """Apply the last changes and swap the tables while the old table is locked."""
+        for attempt in range(1, SWAP_ATTEMPTS + 1):
+            try:
+                with self._get_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT set_config('lock_timeout', %s, true)", (SWAP_LOCK_TIMEOUT,))
+                        # Taken up front: upgrading a weaker lock for the renames
+                        # deadlocks with writers that already read the table
+                        cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(
+                            sql.Identifier(self.table)
+                        ))
+                        cur.execute(self._apply_changes_sql(cur), {"since": since})
+                        logger.info(f"Applied {cur.rowcount} final changes")
+                        self._rename(cur)
+                    conn.commit()
+                break
+            except errors.LockNotAvailable:
+                logger.warning(f"Could not lock {self.table} within {SWAP_LOCK_TIMEOUT} (attempt {attempt}/{SWAP_ATTEMPTS})")
+                if attempt == SWAP_ATTEMPTS:
+                    raise
+                time.sleep(attempt)
+
+        schema_registry.invalidate(self.table)
+        logger.info(f"{self.table} is now {self.strategy} partitioned; the old table is {self.backup}")
+
+    def _rename(self, cur) -> None:
+        """Give the partitioned table the old table's name, primary key name and index names."""
+        cur.execute("""
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'p'
+        """, (self.table,))
+        pkey = cur.fetchone()[0]
+        indexes = [name for name, _ in self._secondary_indexes(cur)]
+
+        def rename(kind: str, old: str, new: str) -> None:
+            cur.execute(sql.SQL("ALTER {} {} RENAME TO {}").format(
+                sql.SQL(kind), sql.Identifier(old), sql.Identifier(new)
+            ))
+
+        cur.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(self.updated_at_index)))
+        rename("TABLE", self.table, self.backup)
+        rename("INDEX", pkey, f"{self.backup}_pkey")
+        for name in indexes:
+            rename("INDEX", name, f"{name}_unpartitioned")
+
+        rename("TABLE", self.target, self.table)
+        rename("INDEX", f"{self.target}_pkey", pkey)
+        for name in indexes:
+            rename("INDEX", f"{name}_partitioned", name)
+        cur.execute(sql.SQL("COMMENT ON TABLE {} IS NULL").format(sql.Identifier(self.table)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the partitioned activities layout.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Move a plain activities table into a partitioned one online")
+    migrate.add_argument("--strategy", choices=sorted(PARTITION_STRATEGIES), required=True)
+    migrate.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="Rows copied per transaction")
+    migrate.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    migrate.add_argument("--hash-partitions", type=int, default=PARTITION_PARAMS["hash_partitions"])
+
+    years = commands.add_parser("ensure-years", help="Create yearly partitions up to a year")
+    years.add_argument("through_year", type=int)
+
+    detach = commands.add_parser("detach", help="Detach a partition, e.g. activities_y2016")
+    detach.add_argument("partition")
+
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        PartitionMigration(
+            args.strategy,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            hash_partitions=args.hash_partitions
+        ).run()
+    elif args.command == "ensure-years":
+        with get_pool(DB_PARAMS).connection() as conn:
+            with conn.cursor() as cur:
+                created = ensure_year_partitions(
+                    cur, range(PARTITION_PARAMS["first_year"], args.through_year + 1)
+                )
+            conn.commit()
+        print(f"Created partitions: {', '.join(created) or 'none'}")
+    else:
+        detach_partition(args.partition)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
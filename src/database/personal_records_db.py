@@ -0,0 +1,227 @@
+"""Database operations for personal_records table.
+
+For each athlete and metric the table holds the record frontier: every
+activity that no later activity equals or beats. The frontier of a
+10-year history is typically a few dozen rows, and it answers "best since
+X" exactly for any X. Frontier values get worse as time moves forward,
+so the best since X is the earliest frontier entry at or after X. That is
+a single read on the primary key index.
+
+Ingest merges changed activities into the stored frontier in the same
+transaction (`update_personal_records`). Adding activities never brings
+back an activity that was already dominated. When a frontier activity's
+own value changes, that athlete's metric is rebuilt from `activities`
+with a window function instead.
+
+Usage:
+    python -m src.database.personal_records_db rebuild [--athlete-id ID]
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import fetch_records
+
+logger = logging.getLogger(__name__)
+
+# metric -> (SQL expression over an activities row, True if lower values are better)
+PERSONAL_RECORD_METRICS: Dict[str, Tuple[str, bool]] = {
+    "fastest_1k": ("fastest_split_1k", True),
+    "fastest_mile": ("fastest_split_1_mile", True),
+    "fastest_5k": ("fastest_split_5k", True),
+    "fastest_10k": ("fastest_split_10k", True),
+    "longest_run": ("CASE WHEN activity_category = 'RUNNING' THEN distance END", False),
+    # A VO2max of 0 means the device did not estimate one
+    "highest_vo2max": ("NULLIF(vo2_max, 0)", False),
+}
+
+
+def _rebuild_sql(metric: str, athlete_filter: bool) -> str:
+    """Window-function query inserting the frontier of one metric from activities."""
+    expression, lower_is_better = PERSONAL_RECORD_METRICS[metric]
+    best = "MIN" if lower_is_better else "MAX"
+    beats = "<" if lower_is_better else ">"
+    return f"""
+    INSERT INTO personal_records (athlete_id, metric, start_time, activity_id, value)
+    SELECT user_id, '{metric}', start_time, activity_id, value
+    FROM (
+        SELECT
+            user_id, activity_id, start_time, value,
+            -- Best value of any later activity
+            {best}(value) OVER (
+                PARTITION BY user_id
+                ORDER BY start_time DESC, activity_id DESC
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ) AS best_later
+        FROM (
+            SELECT user_id, activity_id, start_time, ({expression})::float8 AS value
+            FROM activities
+            {"WHERE user_id = %(athlete_id)s" if athlete_filter else ""}
+        ) a
+        WHERE value IS NOT NULL
+    ) s
+    WHERE best_later IS NULL OR value {beats} best_later
+    """
+
+
+def _frontier(entries: Iterable[Tuple[datetime, int, float]], lower_is_better: bool) -> List[Tuple[datetime, int, float]]:
+    """Entries (start_time, activity_id, value) that no later entry equals or beats."""
+    frontier = []
+    best = None
+    for entry in sorted(entries, reverse=True):
+        value = entry[2]
+        if best is None or (value < best if lower_is_better else value > best):
+            frontier.append(entry)
+            best = value
+    return frontier
+
+
+def _rebuild(cur, metric: str, athlete_id: Optional[int] = None) -> None:
+    if athlete_id is None:
+        cur.execute("DELETE FROM personal_records WHERE metric = %s", (metric,))
+    else:
+        cur.execute("DELETE FROM personal_records WHERE athlete_id = %s AND metric = %s", (athlete_id, metric))
+    cur.execute(_rebuild_sql(metric, athlete_id is not None), {"athlete_id": athlete_id})
+
+
+def update_personal_records(cur, activity_ids: Iterable[int]) -> None:
+    """Merge inserted or changed activities into the record frontiers using an open cursor."""
+    activity_ids = list(activity_ids)
+    if not activity_ids:
+        return
+
+    metrics = list(PERSONAL_RECORD_METRICS)
+    cur.execute(f"""
+        SELECT user_id, activity_id, start_time, {', '.join(f"({PERSONAL_RECORD_METRICS[m][0]})::float8" for m in metrics)}
+        FROM activities
+        WHERE activity_id = ANY(%s)
+    """, (activity_ids,))
+    candidates: Dict[Tuple[int, str], Dict[int, Tuple[datetime, int, float]]] = {}
+    changed = {}
+    for user_id, activity_id, start_time, *values in cur.fetchall():
+        changed[activity_id] = user_id
+        for metric, value in zip(metrics, values):
+            if value is not None:
+                candidates.setdefault((user_id, metric), {})[activity_id] = (start_time, activity_id, value)
+
+    athlete_ids = sorted(set(changed.values()))
+    # Serialize merges per athlete (in id order, so concurrent loads can't deadlock)
+    for athlete_id in athlete_ids:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('personal_records'), %s)", (athlete_id,))
+    cur.execute("""
+        SELECT athlete_id, metric, start_time, activity_id, value
+        FROM personal_records
+        WHERE athlete_id = ANY(%s)
+    """, (athlete_ids,))
+    stored: Dict[Tuple[int, str], Dict[int, Tuple[datetime, int, float]]] = {}
+    for athlete_id, metric, start_time, activity_id, value in cur.fetchall():
+        stored.setdefault((athlete_id, metric), {})[activity_id] = (start_time, activity_id, value)
+
+    deletes, inserts = [], []
+    for athlete_id in athlete_ids:
+        for metric in metrics:
+            key = (athlete_id, metric)
+            current = stored.get(key, {})
+            new = candidates.get(key, {})
+            if any(new.get(activity_id) != entry for activity_id, entry in current.items() if activity_id in changed):
+                # A record activity got worse (or moved): a dominated activity may be a record again
+                _rebuild(cur, metric, athlete_id)
+                continue
+            if not new:
+                continue
+            frontier = _frontier({**current, **new}.values(), PERSONAL_RECORD_METRICS[metric][1])
+            kept = {entry[1] for entry in frontier}
+            deletes += [(athlete_id, metric, activity_id) for activity_id in current if activity_id not in kept]
+            inserts += [(athlete_id, metric, *entry) for entry in frontier if entry[1] not in current]
+
+    if deletes:
+        execute_values(cur, """
+            DELETE FROM personal_records p
+            USING (VALUES %s) AS d (athlete_id, metric, activity_id)
+            WHERE p.athlete_id = d.athlete_id AND p.metric = d.metric AND p.activity_id = d.activity_id
+        """, deletes)
+    if inserts:
+        execute_values(cur, """
+            INSERT INTO personal_records (athlete_id, metric, start_time, activity_id, value)
+            VALUES %s
+        """, inserts)
+
+
+class PersonalRecordsDB:
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_personal_records_table(self):
+        """Create personal_records table if it doesn't exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS personal_records (
+            athlete_id INTEGER NOT NULL,
+            metric VARCHAR(30) NOT NULL,
+            start_time TIMESTAMP NOT NULL,
+            activity_id BIGINT NOT NULL,
+            value FLOAT NOT NULL,  -- seconds for fastest_*, meters for longest_run
+            PRIMARY KEY (athlete_id, metric, start_time, activity_id)
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def rebuild(self, athlete_id: Optional[int] = None) -> None:
+        """Recompute the frontiers of one athlete (default: all athletes) from activities."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                for metric in PERSONAL_RECORD_METRICS:
+                    _rebuild(cur, metric, athlete_id)
+            conn.commit()
+
+    def get_best(self, athlete_id: int, metric: str, since: Optional[datetime] = None) -> Optional[Any]:
+        """Return the best record of a metric set at or after `since` (default: all time), or None."""
+        if metric not in PERSONAL_RECORD_METRICS:
+            raise ValueError(f"Unknown personal record metric: {metric}")
+        return next(iter(self._query(athlete_id, [metric], since)), None)
+
+    def get_bests(self, athlete_id: int, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Return the best record of every metric set at or after `since` (default: all time)."""
+        return {record.metric: record for record in self._query(athlete_id, list(PERSONAL_RECORD_METRICS), since)}
+
+    def _query(self, athlete_id: int, metrics: List[str], since: Optional[datetime]) -> List[Any]:
+        query = """
+        SELECT DISTINCT ON (metric) metric, value, activity_id, start_time
+        FROM personal_records
+        WHERE athlete_id = %s AND metric = ANY(%s) AND start_time >= %s
+        ORDER BY metric, start_time ASC
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (athlete_id, metrics, since or datetime.min))
+                return fetch_records(cur, "PersonalRecord")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the personal records table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="Recompute personal records from activities")
+    rebuild.add_argument("--athlete-id", type=int, help="Only rebuild this athlete")
+    args = parser.parse_args(argv)
+
+    db = PersonalRecordsDB()
+    db.create_personal_records_table()
+    db.rebuild(args.athlete_id)
+    logger.info(f"Rebuilt personal records for {'athlete ' + str(args.athlete_id) if args.athlete_id else 'all athletes'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
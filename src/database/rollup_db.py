@@ -0,0 +1,284 @@
+"""Database operations for weekly_rollup and monthly_summary tables.
+
+`weekly_rollup` holds trailing multi-week aggregates (4-week volume, 12-week
+zone distribution, ...) computed from `weekly_summary`. `monthly_summary`
+holds calendar-month totals computed from `daily_summary`. Both are refreshed
+for the affected rows only whenever a week's summary is rewritten, so the
+training context endpoints can be served with one indexed lookup.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import fetch_records
+from .summary_cache import SummaryCache, athlete_namespace, get_summary_cache, training_context_key
+
+# Trailing windows, in weeks, maintained in weekly_rollup
+ROLLUP_WINDOWS = (4, 12)
+
+SPORTS = ("cycling", "running", "swimming")
+ZONES = range(1, 6)
+
+
+def _sport_columns_ddl() -> str:
+    return "\n".join(
+        f"""            num_sessions_{sport} INTEGER,
+            total_duration_{sport}_seconds FLOAT,
+            total_training_load_{sport} FLOAT,"""
+        for sport in SPORTS
+    )
+
+
+def _zone_array_sum(alias: str, column: str) -> str:
+    """Sum a float8[5] zone column element-wise."""
+    return "ARRAY[" + ", ".join(
+        f"COALESCE(SUM({alias}.{column}[{zone}]), 0)" for zone in ZONES
+    ) + "]::float8[]"
+
+
+def _update_set(columns: Sequence[str]) -> str:
+    return ",\n            ".join(f"{col} = EXCLUDED.{col}" for col in columns) + ",\n            updated_at = CURRENT_TIMESTAMP"
+
+
+_ROLLUP_VALUE_COLUMNS = [
+    "num_sessions",
+    "total_duration_seconds",
+    "total_distance_meters",
+    "total_training_load",
+    *[
+        column
+        for sport in SPORTS
+        for column in (f"num_sessions_{sport}", f"total_duration_{sport}_seconds", f"total_training_load_{sport}")
+    ],
+    "time_in_hr_zones",
+    "time_in_power_zones",
+]
+
+REFRESH_WEEKLY_ROLLUP_SQL = f"""
+INSERT INTO weekly_rollup (athlete_id, window_weeks, week_start, weeks_with_data, {', '.join(_ROLLUP_VALUE_COLUMNS)})
+SELECT
+    %(athlete_id)s,
+    %(window_weeks)s,
+    t.week_start,
+    COUNT(ws.start_date),
+    COALESCE(SUM(ws.num_sessions), 0),
+    COALESCE(SUM(ws.total_duration_seconds), 0),
+    COALESCE(SUM(ws.total_distance_meters), 0),
+    COALESCE(SUM(ws.total_training_load), 0),
+    {', '.join(
+        f"COALESCE(SUM(ws.num_sessions_{sport}), 0), "
+        f"COALESCE(SUM(ws.total_duration_{sport}_seconds), 0), "
+        f"COALESCE(SUM(ws.total_training_load_{sport}), 0)"
+        for sport in SPORTS
+    )},
+    {_zone_array_sum('ws', 'time_in_hr_zones')},
+    {_zone_array_sum('ws', 'time_in_power_zones')}
+FROM unnest(%(week_starts)s::timestamp[]) AS t(week_start)
+LEFT JOIN weekly_summary ws
+    ON ws.athlete_id = %(athlete_id)s
+    AND ws.start_date > t.week_start - make_interval(weeks => %(window_weeks)s)
+    AND ws.start_date <= t.week_start
+GROUP BY t.week_start
+ON CONFLICT (athlete_id, window_weeks, week_start) DO UPDATE SET
+            weeks_with_data = EXCLUDED.weeks_with_data,
+            {_update_set(_ROLLUP_VALUE_COLUMNS)};
+"""
+
+REFRESH_MONTHLY_SUMMARY_SQL = f"""
+INSERT INTO monthly_summary (athlete_id, month_start, {', '.join(_ROLLUP_VALUE_COLUMNS)})
+SELECT
+    %(athlete_id)s,
+    m.month_start,
+    COALESCE(SUM(ds.num_sessions), 0),
+    COALESCE(SUM(ds.total_duration_seconds), 0),
+    COALESCE(SUM(ds.total_distance_meters), 0),
+    COALESCE(SUM(ds.total_training_load), 0),
+    {', '.join(
+        f"COALESCE(SUM(ds.num_sessions_{sport}), 0), "
+        f"COALESCE(SUM(ds.total_duration_{sport}_seconds), 0), "
+        f"COALESCE(SUM(ds.total_training_load_{sport}), 0)"
+        for sport in SPORTS
+    )},
+    {_zone_array_sum('ds', 'time_in_hr_zones')},
+    {_zone_array_sum('ds', 'time_in_power_zones')}
+FROM unnest(%(month_starts)s::timestamp[]) AS m(month_start)
+LEFT JOIN daily_summary ds
+    ON ds.athlete_id = %(athlete_id)s
+    AND ds.day >= m.month_start::date
+    AND ds.day < (m.month_start + interval '1 month')::date
+GROUP BY m.month_start
+ON CONFLICT (athlete_id, month_start) DO UPDATE SET
+            {_update_set(_ROLLUP_VALUE_COLUMNS)};
+"""
+
+TRAINING_CONTEXT_SQL = """
+SELECT
+    (SELECT row_to_json(r) FROM weekly_rollup r
+     WHERE r.athlete_id = %(athlete_id)s AND r.window_weeks = 4 AND r.week_start = %(week_start)s) AS rolling_4_weeks,
+    (SELECT row_to_json(r) FROM weekly_rollup r
+     WHERE r.athlete_id = %(athlete_id)s AND r.window_weeks = 12 AND r.week_start = %(week_start)s) AS rolling_12_weeks,
+    (SELECT json_agg(m ORDER BY m.month_start DESC) FROM (
+        SELECT * FROM monthly_summary
+        WHERE athlete_id = %(athlete_id)s AND month_start <= %(week_start)s
+        ORDER BY month_start DESC
+        LIMIT %(num_months)s
+    ) m) AS recent_months,
+    (SELECT row_to_json(t) FROM (
+        SELECT day, training_load, atl, ctl, tsb FROM training_load_daily
+        WHERE athlete_id = %(athlete_id)s AND day < %(week_start)s::date + 7
+        ORDER BY day DESC
+        LIMIT 1
+    ) t) AS training_load
+"""
+
+
+def _month_start(day: datetime) -> datetime:
+    return day.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class RollupDB:
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS, cache: Optional[SummaryCache] = None):
+        self.db_params = db_params
+        self.cache = cache or get_summary_cache()
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_rollup_tables(self):
+        """Create weekly_rollup and monthly_summary tables if they don't exist."""
+        value_columns_ddl = f"""
+            num_sessions INTEGER,
+            total_duration_seconds FLOAT,
+            total_distance_meters FLOAT,
+            total_training_load FLOAT,
+{_sport_columns_ddl()}
+            time_in_hr_zones FLOAT8[],  -- seconds in zones 1-5
+            time_in_power_zones FLOAT8[],  -- seconds in zones 1-5
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"""
+
+        create_table_sql = f"""
+        CREATE TABLE IF NOT EXISTS weekly_rollup (
+            athlete_id INTEGER NOT NULL,
+            window_weeks SMALLINT NOT NULL,  -- trailing window ending with week_start's week
+            week_start TIMESTAMP NOT NULL,
+            weeks_with_data INTEGER,
+            {value_columns_ddl},
+            PRIMARY KEY (athlete_id, window_weeks, week_start)
+        );
+
+        CREATE TABLE IF NOT EXISTS monthly_summary (
+            athlete_id INTEGER NOT NULL,
+            month_start TIMESTAMP NOT NULL,
+            {value_columns_ddl},
+            PRIMARY KEY (athlete_id, month_start)
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def refresh_for_weeks(
+        self,
+        athlete_id: int,
+        week_starts: Sequence[datetime],
+        current_date: Optional[datetime] = None
+    ) -> None:
+        """Refresh every rollup row whose window contains one of the changed weeks.
+
+        Args:
+            athlete_id: Athlete whose weekly summaries changed
+            week_starts: Start (Monday) of each week whose summary was rewritten
+            current_date: Rollup rows are not created for weeks after this date (default: now)
+        """
+        if not week_starts:
+            return
+        current_date = current_date or datetime.now()
+
+        month_starts = set()
+        for week_start in week_starts:
+            month_starts.add(_month_start(week_start))
+            month_starts.add(_month_start(week_start + timedelta(days=6)))
+        month_starts = sorted(month_starts)
+
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                for window_weeks in ROLLUP_WINDOWS:
+                    # A changed week affects the windows ending in it and the next window_weeks - 1 weeks
+                    targets = sorted({
+                        week_start + timedelta(weeks=offset)
+                        for week_start in week_starts
+                        for offset in range(window_weeks)
+                        if week_start + timedelta(weeks=offset) <= current_date
+                    })
+                    cur.execute(REFRESH_WEEKLY_ROLLUP_SQL, {
+                        "athlete_id": athlete_id,
+                        "window_weeks": window_weeks,
+                        "week_starts": targets,
+                    })
+
+                cur.execute(REFRESH_MONTHLY_SUMMARY_SQL, {
+                    "athlete_id": athlete_id,
+                    "month_starts": month_starts,
+                })
+            conn.commit()
+        # Cached contexts of any week may include the refreshed rows
+        self.cache.bump_generation(athlete_namespace(athlete_id))
+
+    def get_weekly_rollups(
+        self,
+        athlete_id: int,
+        window_weeks: int,
+        start: datetime,
+        end: datetime
+    ) -> List[Any]:
+        """Return rollup rows for weeks starting in [start, end], oldest first."""
+        query = """
+        SELECT * FROM weekly_rollup
+        WHERE athlete_id = %s AND window_weeks = %s
+        AND week_start BETWEEN %s AND %s
+        ORDER BY week_start ASC
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (athlete_id, window_weeks, start, end))
+                return fetch_records(cur, "WeeklyRollup")
+
+    def get_training_context(
+        self,
+        athlete_id: int,
+        week_start: datetime,
+        num_months: int = 3
+    ) -> Dict[str, Any]:
+        """Return the 4- and 12-week rollups ending at week_start, recent months and fitness, in one query.
+
+        Results are cached until the athlete's rollups are next refreshed.
+
+        Returns:
+            Dictionary with 'rolling_4_weeks', 'rolling_12_weeks' (row dicts or None),
+            'recent_months' (list of row dicts, newest first) and 'training_load'
+            (the last ATL/CTL/TSB row up to the end of the week, or None)
+        """
+        generation = self.cache.generation(athlete_namespace(athlete_id))
+        key = training_context_key(athlete_id, week_start, num_months, generation)
+
+        def load(keys: List[str]) -> Dict[str, Dict[str, Any]]:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(TRAINING_CONTEXT_SQL, {
+                        "athlete_id": athlete_id,
+                        "week_start": week_start,
+                        "num_months": num_months,
+                    })
+                    rolling_4_weeks, rolling_12_weeks, recent_months, training_load = cur.fetchone()
+            return {key: {
+                "rolling_4_weeks": rolling_4_weeks,
+                "rolling_12_weeks": rolling_12_weeks,
+                "recent_months": recent_months or [],
+                "training_load": training_load,
+            }}
+
+        return self.cache.get_many({key: self.cache.ttl_for_week(week_start)}, load)[key]
@@ -0,0 +1,148 @@
+"""Typed row mapping for query results.
+
+Rows come back as lightweight tuple records whose field names are taken from
+`cursor.description`, so no catalog lookup or per-row dict is needed. Records
+support attribute access (`row.duration`) as well as the dict-style access
+(`row['duration']`, `row.get('vo2_max')`) used by existing callers.
+
+Table column lists and primary keys, when needed without running a query
+first, are served by `schema_registry`, which caches catalog lookups until
+invalidated.
+"""
+
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+
+class RowRecord(tuple):
+    """Base class for generated record types. Do not instantiate directly."""
+    __slots__ = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return tuple.__getitem__(self, self._index[key])
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value of a column, or `default` if the record has no such column."""
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+@lru_cache(maxsize=64)
+def record_type(columns: Tuple[str, ...], name: str = "Record") -> type:
+    """Return the record class for a column list, creating it once per distinct list."""
+    base = namedtuple(name, columns, rename=True)
+    index = {column: i for i, column in enumerate(columns)}
+    return type(name, (RowRecord, base), {"__slots__": (), "_index": index})
+
+
+def cursor_columns(cur) -> Tuple[str, ...]:
+    """Column names of the last executed query."""
+    return tuple(col[0] for col in cur.description)
+
+
+def fetch_records(cur, name: str = "Record") -> List[RowRecord]:
+    """Fetch all remaining rows from an executed cursor as records."""
+    rows = cur.fetchall()
+    make = record_type(cursor_columns(cur), name)._make
+    return [make(row) for row in rows]
+
+
+def iter_records(cur, name: str = "Record") -> Iterator[RowRecord]:
+    """Yield rows from a cursor as records without materializing them all.
+
+    Works with named (server-side) cursors, whose description is only
+    available once the first batch has been fetched.
+    """
+    make = None
+    for row in cur:
+        if make is None:
+            make = record_type(cursor_columns(cur), name)._make
+        yield make(row)
+
+
+class SchemaRegistry:
+    """Caches table column lists so catalog queries run once per table per process."""
+
+    def __init__(self):
+        self._columns: Dict[str, Tuple[str, ...]] = {}
+        self._primary_keys: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def columns(self, cur, table: str) -> Tuple[str, ...]:
+        """Return the ordered column names of `table`, querying the catalog on a cache miss."""
+        with self._lock:
+            cached = self._columns.get(table)
+        if cached is not None:
+            return cached
+
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = %s
+            ORDER BY ordinal_position
+        """, (table,))
+        columns = tuple(row[0] for row in cur.fetchall())
+        with self._lock:
+            self._columns[table] = columns
+        return columns
+
+    def primary_key(self, cur, table: str) -> Tuple[str, ...]:
+        """Return the primary key columns of `table`, querying the catalog on a cache miss.
+
+        Partitioned tables include their partition key, so writers use this as
+        their ON CONFLICT target rather than assuming a single id column.
+        """
+        with self._lock:
+            cached = self._primary_keys.get(table)
+        if cached is not None:
+            return cached
+
+        cur.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = to_regclass(%s) AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+        """, (table,))
+        key = tuple(row[0] for row in cur.fetchall())
+        with self._lock:
+            self._primary_keys[table] = key
+        return key
+
+    def validate(self, cur, table: str, columns: Sequence[str]) -> List[str]:
+        """Return `columns` unchanged, raising ValueError if any is not a column of `table`."""
+        known = set(self.columns(cur, table))
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+        return list(columns)
+
+    def invalidate(self, table: str = None) -> None:
+        """Forget cached columns and keys for one table, or for all tables if none is given."""
+        with self._lock:
+            if table is None:
+                self._columns.clear()
+                self._primary_keys.clear()
+            else:
+                self._columns.pop(table, None)
+                self._primary_keys.pop(table, None)
+
+
+schema_registry = SchemaRegistry()
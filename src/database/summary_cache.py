@@ -0,0 +1,447 @@
+"""Read-through cache for weekly summary and training context reads.
+
+Two tiers sit in front of Postgres:
+
+- an in-process LRU with per-entry TTLs, which lives as long as a warm
+  Lambda container, and
+- an optional shared tier (any `SharedCache`, e.g. backed by Redis or
+  Memcached), so containers reuse each other's fills. `LocalSharedCache` is
+  an in-memory stand-in with the same interface for local runs and tests.
+
+Completed weeks only change when their activities are re-synced, and the
+writer then invalidates both tiers, so they are cached until invalidated
+(in the shared tier at most CACHE_PARAMS["shared_ttl"], as a backstop).
+The in-progress week expires after CACHE_PARAMS["current_week_ttl"]. Other
+containers' in-process tiers do not see invalidations, which bounds their
+staleness by CACHE_PARAMS["local_ttl"].
+
+A reader that loads a key while a writer invalidates it must not put the
+old value back. Invalidation bumps a per-key version in the shared tier,
+and readers only fill a key if its version is still the one they read
+before loading (compare-and-set). The in-process tier does the same with a
+counter of local invalidations.
+
+Training contexts span many weeks and months, so rather than deleting
+individual keys, writers bump a per-athlete generation that is part of the
+context key.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import CACHE_PARAMS
+
+# Stored for keys whose row does not exist, so repeated misses stay cheap
+_MISSING = None
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of a SummaryCache."""
+    local_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.local_hits + self.shared_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries can also expire after a TTL.
+
+    Args:
+        max_entries: Least recently used entries are evicted beyond this size
+        clock: Time source in seconds, injectable for tests
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); expired entries count as not found."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, expiring after `ttl` seconds (None: only evicted by size)."""
+        expires_at = self.clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedCache:
+    """Interface of the shared tier. Values are strings, as in a network cache."""
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Return the stored values of the keys that are present."""
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def set_many_if_unchanged(
+        self,
+        items: Dict[str, str],
+        guards: Dict[str, Tuple[str, Optional[str]]],
+        ttl: Optional[float] = None
+    ) -> List[str]:
+        """Store each item only if its guard key still holds the expected value (None: absent).
+
+        Each check and its write must be atomic (e.g. a Lua script in Redis).
+
+        Args:
+            items: Values to store
+            guards: Item key -> (guard key, value the guard key held before the item was loaded)
+            ttl: Expiry of the stored items
+
+        Returns:
+            Keys that were stored
+        """
+        raise NotImplementedError
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Atomically add 1 to an integer value (missing counts as 0) and return the result, like INCR.
+
+        Args:
+            key: Counter key
+            ttl: Expiry of the counter, refreshed on every increment (None: never)
+        """
+        raise NotImplementedError
+
+    def delete_many(self, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalSharedCache(SharedCache):
+    """In-memory stand-in for a shared cache service."""
+
+    def __init__(self, max_entries: int = CACHE_PARAMS["shared_max_entries"]):
+        self._cache = LRUCache(max_entries, clock=time.time)
+        # Makes compare-and-set and increments atomic, as the service would
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        for key in keys:
+            hit, value = self._cache.get(key)
+            if hit:
+                found[key] = value
+        return found
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self._cache.set(key, value, ttl)
+
+    def set_many_if_unchanged(
+        self,
+        items: Dict[str, str],
+        guards: Dict[str, Tuple[str, Optional[str]]],
+        ttl: Optional[float] = None
+    ) -> List[str]:
+        stored = []
+        with self._lock:
+            for key, value in items.items():
+                guard_key, expected = guards[key]
+                hit, current = self._cache.get(guard_key)
+                if (current if hit else None) == expected:
+                    self._cache.set(key, value, ttl)
+                    stored.append(key)
+        return stored
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            hit, value = self._cache.get(key)
+            value = int(value) + 1 if hit else 1
+            self._cache.set(key, str(value), ttl)
+            return value
+
+    def delete_many(self, keys: List[str]) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def _encode(value: Any) -> str:
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"$datetime": obj.isoformat()}
+        raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+    return json.dumps(value, default=default)
+
+
+def _decode(data: str) -> Any:
+    def object_hook(obj):
+        if len(obj) == 1 and "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        return obj
+    return json.loads(data, object_hook=object_hook)
+
+
+def week_starts_between(start: datetime, end: datetime) -> List[datetime]:
+    """Mondays (midnight) of every week overlapping [start, end]."""
+    week_start = (start - timedelta(days=start.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    week_starts = []
+    while week_start <= end:
+        week_starts.append(week_start)
+        week_start += timedelta(days=7)
+    return week_starts
+
+
+def version_key(key: str) -> str:
+    """Shared-tier key counting invalidations of `key`."""
+    return f"version:{key}"
+
+
+def summary_key(athlete_id: int, week_start: datetime) -> str:
+    return f"weekly_summary:{athlete_id}:{week_start:%Y-%m-%d}"
+
+
+def athlete_namespace(athlete_id: int) -> str:
+    """Generation namespace of an athlete's training contexts."""
+    return f"training_context:{athlete_id}"
+
+
+def training_context_key(athlete_id: int, week_start: datetime, num_months: int, generation: int) -> str:
+    return f"training_context:{athlete_id}:{generation}:{week_start:%Y-%m-%d}:{num_months}"
+
+
+class SummaryCache:
+    """Two-tier read-through cache with hit/miss counters.
+
+    Args:
+        local: In-process tier (default: a new LRUCache)
+        shared: Optional shared tier
+        local_ttl: Upper bound on how long the in-process tier keeps any entry
+        current_week_ttl: TTL for entries of the in-progress week, in both tiers
+        shared_ttl: Upper bound on how long the shared tier keeps any entry
+        clock: Wall clock used to decide whether a week is complete
+    """
+
+    def __init__(
+        self,
+        local: Optional[LRUCache] = None,
+        shared: Optional[SharedCache] = None,
+        local_ttl: float = CACHE_PARAMS["local_ttl"],
+        current_week_ttl: float = CACHE_PARAMS["current_week_ttl"],
+        shared_ttl: float = CACHE_PARAMS["shared_ttl"],
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        self.local = local if local is not None else LRUCache(CACHE_PARAMS["local_max_entries"])
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.current_week_ttl = current_week_ttl
+        self.shared_ttl = shared_ttl
+        self.clock = clock
+        self._stats = CacheStats()
+        self._stats_lock = threading.Lock()
+        # Generations live outside the LRU so eviction can't reset them
+        self._generations: Dict[str, int] = {}
+        # Local invalidations so far; a read only fills the local tier if none happened meanwhile
+        self._local_invalidations = 0
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, amount in increments.items():
+                setattr(self._stats, name, getattr(self._stats, name) + amount)
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the counters."""
+        with self._stats_lock:
+            return CacheStats(
+                local_hits=self._stats.local_hits,
+                shared_hits=self._stats.shared_hits,
+                misses=self._stats.misses,
+                evictions=self.local.evictions,
+                invalidations=self._stats.invalidations,
+            )
+
+    def ttl_for_week(self, week_start: datetime) -> Optional[float]:
+        """None (until invalidated) for completed weeks, a short TTL for the current one."""
+        if week_start + timedelta(days=7) <= self.clock():
+            return None
+        return self.current_week_ttl
+
+    def get_many(
+        self,
+        keys: Dict[str, Optional[float]],
+        loader: Callable[[List[str]], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Look keys up in the local tier, then the shared tier, then load the rest.
+
+        Args:
+            keys: Cache keys mapped to their TTL (None: until invalidated, within each tier's bound)
+            loader: Called once with the keys neither tier had; returns their values.
+                Keys it leaves out are cached as missing and returned as None.
+
+        Returns:
+            Value (or None) for every requested key
+        """
+        with self._stats_lock:
+            local_invalidations = self._local_invalidations
+        values: Dict[str, Any] = {}
+        remaining = []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                values[key] = value
+            else:
+                remaining.append(key)
+        cached_locally = set(values)
+        self._count(local_hits=len(values))
+
+        versions: Dict[str, Optional[str]] = {}
+        if remaining and self.shared is not None:
+            # Versions are read with the values, before anything is loaded
+            found = self.shared.get_many(remaining + [version_key(key) for key in remaining])
+            hits = [key for key in remaining if key in found]
+            for key in hits:
+                values[key] = _decode(found[key])
+            versions = {key: found.get(version_key(key)) for key in remaining if key not in found}
+            self._count(shared_hits=len(hits))
+            remaining = [key for key in remaining if key not in found]
+
+        fillable = set(values) - cached_locally
+        if remaining:
+            self._count(misses=len(remaining))
+            loaded = loader(remaining)
+            for key in remaining:
+                values[key] = loaded.get(key, _MISSING)
+            if self.shared is None:
+                fillable.update(remaining)
+            else:
+                # Group by TTL so each group is one round trip
+                by_ttl: Dict[float, Dict[str, str]] = {}
+                for key in remaining:
+                    by_ttl.setdefault(self._shared_ttl(keys[key]), {})[key] = _encode(values[key])
+                for ttl, items in by_ttl.items():
+                    # Skips keys invalidated while they were being loaded
+                    guards = {key: (version_key(key), versions[key]) for key in items}
+                    # Only what the shared tier accepted is current enough to keep locally
+                    fillable.update(self.shared.set_many_if_unchanged(items, guards, ttl))
+
+        with self._stats_lock:
+            if self._local_invalidations != local_invalidations:
+                # Something was invalidated meanwhile; the values may predate it
+                return values
+        for key in fillable:
+            self._set_local(key, values[key], keys[key])
+        return values
+
+    def _shared_ttl(self, ttl: Optional[float]) -> float:
+        return self.shared_ttl if ttl is None else min(ttl, self.shared_ttl)
+
+    def _set_local(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self.local.set(key, value, self.local_ttl if ttl is None else min(ttl, self.local_ttl))
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Drop keys from both tiers, and stop reads already loading them from filling them."""
+        keys = list(keys)
+        with self._stats_lock:
+            self._local_invalidations += 1
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None and keys:
+            # The version must change before the value goes, or a reader could fill in between
+            for key in keys:
+                self.shared.incr(version_key(key), self.shared_ttl)
+            self.shared.delete_many(keys)
+        self._count(invalidations=len(keys))
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._stats_lock:
+            self._generations.clear()
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def generation(self, namespace: str) -> int:
+        """Current generation of a namespace, used to version keys that can't be listed."""
+        if self.shared is None:
+            with self._stats_lock:
+                return self._generations.get(namespace, 0)
+        key = f"generation:{namespace}"
+        hit, value = self.local.get(key)
+        if hit:
+            return value
+        value = int(self.shared.get_many([key]).get(key, 0))
+        # Kept briefly so a bump from another container is seen soon
+        self.local.set(key, value, self.current_week_ttl)
+        return value
+
+    def bump_generation(self, namespace: str) -> None:
+        """Invalidate every key built with the namespace's current generation."""
+        if self.shared is None:
+            with self._stats_lock:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        else:
+            # Atomic, so concurrent bumps from several containers each produce a new generation
+            key = f"generation:{namespace}"
+            self.local.set(key, self.shared.incr(key), self.current_week_ttl)
+        self._count(invalidations=1)
+
+
+_default_cache: Optional[SummaryCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """Return the process-wide cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            shared = LocalSharedCache() if CACHE_PARAMS["shared_backend"] == "local" else None
+            _default_cache = SummaryCache(shared=shared)
+        return _default_cache
+
+
+def configure_summary_cache(cache: SummaryCache) -> None:
+    """Replace the process-wide cache, e.g. with one using a real shared tier."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
@@ -0,0 +1,174 @@
+"""Database operations for training_load_daily table.
+
+One row per athlete per day, from the athlete's first activity through
+today, holding the day's total training load and the ATL/CTL/TSB computed
+from it (see analysis/training_load.py). `refresh` recomputes only the
+days from the earliest changed one onward, starting from the stored state
+of the day before, so appending a new day costs O(1). `rebuild` recomputes
+an athlete's whole series with one vectorized pass. Daily loads are read
+from daily_summary, which ingest keeps current.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from analysis.training_load import TrainingLoadState, advance, compute_series
+
+from .config import DB_PARAMS
+from .connection_pool import get_pool
+from .row_mapping import fetch_records
+
+# Every day in the range, including days without activities
+DAILY_LOADS_SQL = """
+SELECT d::date, COALESCE(t.total_training_load, 0)
+FROM generate_series(%(first_day)s::date, %(last_day)s::date, interval '1 day') AS d
+LEFT JOIN daily_summary t
+    ON t.athlete_id = %(athlete_id)s
+    AND t.day = d::date
+ORDER BY d
+"""
+
+UPSERT_SQL = """
+INSERT INTO training_load_daily (athlete_id, day, training_load, atl, ctl, tsb)
+VALUES %s
+ON CONFLICT (athlete_id, day) DO UPDATE SET
+    training_load = EXCLUDED.training_load,
+    atl = EXCLUDED.atl,
+    ctl = EXCLUDED.ctl,
+    tsb = EXCLUDED.tsb,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+class TrainingLoadDB:
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
+        self.db_params = db_params
+
+    def _get_connection(self):
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
+
+    def create_training_load_table(self):
+        """Create training_load_daily table if it doesn't exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS training_load_daily (
+            athlete_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            training_load FLOAT NOT NULL,  -- sum of activity_training_load on the day
+            atl FLOAT NOT NULL,  -- acute training load (fatigue), 7-day time constant
+            ctl FLOAT NOT NULL,  -- chronic training load (fitness), 42-day time constant
+            tsb FLOAT NOT NULL,  -- training stress balance (form): previous day's CTL - ATL
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (athlete_id, day)
+        );
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_table_sql)
+            conn.commit()
+
+    def refresh(self, athlete_id: int, from_day: Optional[date] = None, through: Optional[date] = None) -> int:
+        """Recompute days from from_day (or the day after the last stored day) through `through`.
+
+        Args:
+            athlete_id: Athlete whose series to update
+            from_day: Earliest day whose activities changed (default: only append new days)
+            through: Last day to compute (default: today)
+
+        Returns:
+            Number of days written
+        """
+        through = through or datetime.now().date()
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                # Serialize refreshes of one athlete so two runs can't interleave their states
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('training_load_daily'), %s)", (athlete_id,))
+                cur.execute("""
+                    SELECT day, training_load, atl, ctl, tsb FROM training_load_daily
+                    WHERE athlete_id = %s AND (%s::date IS NULL OR day < %s)
+                    ORDER BY day DESC LIMIT 1
+                """, (athlete_id, from_day, from_day))
+                row = cur.fetchone()
+                previous = TrainingLoadState(*row) if row else None
+
+                if previous is not None:
+                    first_day = previous.day + timedelta(days=1)
+                else:
+                    # No earlier state: start at the athlete's first activity
+                    cur.execute("SELECT MIN(start_time)::date FROM activities WHERE user_id = %s", (athlete_id,))
+                    first_day = cur.fetchone()[0]
+                if first_day is None or first_day > through:
+                    return 0
+
+                written = self._write_series(cur, athlete_id, first_day, through, previous)
+            conn.commit()
+        return written
+
+    def rebuild(self, athlete_id: int, through: Optional[date] = None) -> int:
+        """Recompute an athlete's whole series from their first activity.
+
+        Returns:
+            Number of days written
+        """
+        through = through or datetime.now().date()
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('training_load_daily'), %s)", (athlete_id,))
+                cur.execute("DELETE FROM training_load_daily WHERE athlete_id = %s", (athlete_id,))
+                cur.execute("SELECT MIN(start_time)::date FROM activities WHERE user_id = %s", (athlete_id,))
+                first_day = cur.fetchone()[0]
+                written = 0
+                if first_day is not None and first_day <= through:
+                    written = self._write_series(cur, athlete_id, first_day, through, None)
+            conn.commit()
+        return written
+
+    def _write_series(
+        self,
+        cur,
+        athlete_id: int,
+        first_day: date,
+        last_day: date,
+        previous: Optional[TrainingLoadState]
+    ) -> int:
+        cur.execute(DAILY_LOADS_SQL, {"athlete_id": athlete_id, "first_day": first_day, "last_day": last_day})
+        loads = np.array([row[1] for row in cur.fetchall()], dtype=np.float64)
+        days, atl, ctl, tsb = compute_series(first_day, loads, previous)
+        rows = list(zip([athlete_id] * len(days), days, loads.tolist(), atl.tolist(), ctl.tolist(), tsb.tolist()))
+        execute_values(cur, UPSERT_SQL, rows, page_size=1000)
+        return len(rows)
+
+    def get_series(self, athlete_id: int, start: date, end: date) -> List[Any]:
+        """Return daily rows for days in [start, end], oldest first."""
+        query = """
+        SELECT day, training_load, atl, ctl, tsb FROM training_load_daily
+        WHERE athlete_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day ASC
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (athlete_id, start, end))
+                return fetch_records(cur, "TrainingLoadDay")
+
+    def get_state(self, athlete_id: int, day: Optional[date] = None) -> Optional[TrainingLoadState]:
+        """Return the state at the end of `day` (default: today), or None before the first activity.
+
+        If the stored series ends earlier, the remaining days are rest days.
+        """
+        query = """
+        SELECT day, training_load, atl, ctl, tsb FROM training_load_daily
+        WHERE athlete_id = %s AND day <= %s
+        ORDER BY day DESC LIMIT 1
+        """
+        day = day or datetime.now().date()
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (athlete_id, day))
+                row = cur.fetchone()
+        if row is None:
+            return None
+        state = TrainingLoadState(*row)
+        return advance(state, day, 0.0) if state.day < day else state
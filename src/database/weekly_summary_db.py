@@ -1,19 +1,62 @@
-"""Database operations for weekly_summary table."""
+"""Database operations for weekly_summary table.
+
+Time-in-zone columns are FLOAT8[5] arrays of seconds in zones 1-5. Reads
+return them as {"1": seconds, ...} dicts, together with their HH:MM:SS
+`*_formatted` counterparts derived on the fly, so the stored rows stay
+compact while the read shape is unchanged.
+"""
 
-import psycopg2
 from psycopg2.extras import execute_values
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from .column_backfill import BACKFILL_BATCH_SIZE, BackfillProgress, ColumnBackfill
 from .config import DB_PARAMS
-from dataclasses import asdict
-import json
+from .connection_pool import get_pool
+from .migrations import set_lock_timeout
+from .row_mapping import fetch_records, schema_registry
+from .summary_cache import SummaryCache, get_summary_cache, summary_key, week_starts_between
+from analysis.zone_vector import ZoneVector
+from dataclasses import fields
+from datetime import datetime
+
+# Zone vector columns stored as FLOAT8[], and the session count that decides
+# whether their formatted values are times or 0.0 placeholders
+ZONE_COLUMNS = {
+    'time_in_hr_zones': 'num_sessions',
+    'time_in_power_zones': 'num_sessions',
+    'time_in_hr_zones_cycling': 'num_sessions_cycling',
+    'time_in_hr_zones_running': 'num_sessions_running',
+    'time_in_hr_zones_swimming': 'num_sessions_swimming',
+    'time_in_power_zones_cycling': 'num_sessions_cycling',
+    'time_in_power_zones_running': 'num_sessions_running',
+}
+
+
+def expand_zone_columns(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace FLOAT8[] zone values with zone dicts and add their *_formatted values."""
+    row = dict(row)
+    for column, sessions_column in ZONE_COLUMNS.items():
+        if column not in row:
+            continue
+        if row[column] is None:
+            row[f"{column}_formatted"] = None
+            continue
+        value = row[column]
+        # Shared cache entries written before migration 3 still hold zone dicts
+        zones = ZoneVector.from_dict(value) if isinstance(value, dict) else ZoneVector(value)
+        row[column] = zones.to_dict()
+        row[f"{column}_formatted"] = zones.formatted((row.get(sessions_column) or 0) > 0)
+    return row
 
 
 class WeeklySummaryDB:
-    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS):
+    def __init__(self, db_params: Dict[str, Any] = DB_PARAMS, cache: Optional[SummaryCache] = None):
         self.db_params = db_params
+        # Reads go through the cache; writes invalidate the weeks they touch
+        self.cache = cache or get_summary_cache()
     
     def _get_connection(self):
-        return psycopg2.connect(**self.db_params)
+        """Check a connection out of the shared pool for use in a with-block."""
+        return get_pool(self.db_params).connection()
 
     def create_weekly_summary_table(self):
         """Create weekly_summary table and indexes if they don't exist."""
@@ -45,27 +88,20 @@ class WeeklySummaryDB:
             
             -- Training Load
             total_training_load FLOAT,
-            time_in_hr_zones JSONB,  -- Store zone times as JSON object
-            time_in_hr_zones_formatted JSONB,  -- Store zone times as JSON object
-            time_in_power_zones JSONB,  -- Store zone times as JSON object
-            time_in_power_zones_formatted JSONB,  -- Store zone times as JSON object
+            time_in_hr_zones FLOAT8[],  -- seconds in zones 1-5
+            time_in_power_zones FLOAT8[],  -- seconds in zones 1-5
 
             -- Sport specific training load metrics
             total_training_load_cycling FLOAT,
             total_training_load_running FLOAT,
             total_training_load_swimming FLOAT,
 
-            time_in_hr_zones_cycling JSONB,
-            time_in_hr_zones_running JSONB,
-            time_in_hr_zones_swimming JSONB,
-            time_in_hr_zones_cycling_formatted JSONB,
-            time_in_hr_zones_running_formatted JSONB,
-            time_in_hr_zones_swimming_formatted JSONB,
+            time_in_hr_zones_cycling FLOAT8[],
+            time_in_hr_zones_running FLOAT8[],
+            time_in_hr_zones_swimming FLOAT8[],
             
-            time_in_power_zones_cycling JSONB,
-            time_in_power_zones_running JSONB,
-            time_in_power_zones_cycling_formatted JSONB,
-            time_in_power_zones_running_formatted JSONB,
+            time_in_power_zones_cycling FLOAT8[],
+            time_in_power_zones_running FLOAT8[],
             
             -- Performance Metrics
             best_5k_time FLOAT,
@@ -89,17 +125,23 @@ class WeeklySummaryDB:
             -- Ensure we only have one summary per athlete per week
             UNIQUE(athlete_id, start_date)
         );
+        """
 
-        -- Create indexes for common queries
-        CREATE INDEX IF NOT EXISTS idx_weekly_summary_athlete 
+        # Create indexes for common queries. Indexes added later go in
+        # migrations.py, which builds them without blocking writes.
+        create_indexes_sql = """
+        CREATE INDEX idx_weekly_summary_athlete 
         ON weekly_summary (athlete_id, start_date DESC);
 
-        CREATE INDEX IF NOT EXISTS idx_weekly_summary_date 
+        CREATE INDEX idx_weekly_summary_date 
         ON weekly_summary (start_date);
         """
         with self._get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(create_table_sql)
+                cur.execute("SELECT to_regclass('weekly_summary') IS NULL")
+                if cur.fetchone()[0]:
+                    cur.execute(create_table_sql)
+                    cur.execute(create_indexes_sql)
             conn.commit()
 
     def upsert_weekly_summary(self, summary: Dict[str, Any]) -> None:
@@ -108,30 +150,20 @@ class WeeklySummaryDB:
         Args:
             summary: Dictionary containing the weekly summary data to upsert
         """
-        # Convert dictionary fields to JSON strings for JSONB columns
-        summary_dict = asdict(summary).copy()  # Make a copy to avoid modifying the original
-        jsonb_columns = [
-            'time_in_hr_zones',
-            'time_in_power_zones',
-            'time_in_hr_zones_formatted',
-            'time_in_power_zones_formatted',
-            'time_in_hr_zones_cycling',
-            'time_in_hr_zones_running',
-            'time_in_hr_zones_swimming',
-            'time_in_hr_zones_cycling_formatted',
-            'time_in_hr_zones_running_formatted',
-            'time_in_hr_zones_swimming_formatted',
-            'time_in_power_zones_cycling',
-            'time_in_power_zones_running',
-            'time_in_power_zones_cycling_formatted',
-            'time_in_power_zones_running_formatted'
-        ]
-        for column in jsonb_columns:
-            if column in summary_dict:
-                summary_dict[column] = json.dumps(summary_dict[column])
-
-        columns = summary_dict.keys()
-        values = [summary_dict[column] for column in columns]
+        self.upsert_weekly_summaries([summary])
+
+    def upsert_weekly_summaries(self, summaries: List[Any]) -> None:
+        """Insert or update many weekly summaries with a single multi-row upsert.
+
+        Args:
+            summaries: WeeklySummary objects to upsert
+        """
+        if not summaries:
+            return
+
+        rows = [self._summary_to_row(summary) for summary in summaries]
+        columns = rows[0].keys()
+        values = [[row[column] for column in columns] for row in rows]
         
         upsert_sql = f"""
         INSERT INTO weekly_summary ({', '.join(columns)})
@@ -144,11 +176,62 @@ class WeeklySummaryDB:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    execute_values(cur, upsert_sql, [values])
-            conn.commit()
+                    execute_values(cur, upsert_sql, values, page_size=len(values))
+                conn.commit()
         except Exception as e:
-            print(f"Error upserting weekly summary: {e}")
+            print(f"Error upserting weekly summaries: {e}")
             raise
+        self.cache.invalidate(summary_key(row['athlete_id'], row['start_date']) for row in rows)
+
+    def get_weekly_summary(self, athlete_id: int, week_start: datetime) -> Optional[Dict[str, Any]]:
+        """Return the summary of the week starting at week_start, or None if there is none.
+
+        Args:
+            athlete_id: Athlete ID
+            week_start: Start (Monday) of the week
+        """
+        key = summary_key(athlete_id, week_start)
+        summary = self._get_cached(athlete_id, {key: week_start})[key]
+        return expand_zone_columns(summary) if summary is not None else None
+
+    def get_weekly_summaries(self, athlete_id: int, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Return the summaries of the weeks overlapping [start_date, end_date], oldest first.
+
+        Only weeks missing from the cache are read from the database.
+
+        Args:
+            athlete_id: Athlete ID
+            start_date: First day of the range
+            end_date: Last day of the range
+        """
+        week_starts = {summary_key(athlete_id, week_start): week_start for week_start in week_starts_between(start_date, end_date)}
+        summaries = self._get_cached(athlete_id, week_starts)
+        return [expand_zone_columns(summaries[key]) for key in week_starts if summaries[key] is not None]
+
+    def _get_cached(self, athlete_id: int, week_starts: Dict[str, datetime]) -> Dict[str, Optional[Dict[str, Any]]]:
+        # The cache holds stored rows, zone columns as plain lists
+        def load(keys: List[str]) -> Dict[str, Dict[str, Any]]:
+            query = """
+            SELECT * FROM weekly_summary
+            WHERE athlete_id = %s AND start_date = ANY(%s)
+            """
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (athlete_id, [week_starts[key] for key in keys]))
+                    records = fetch_records(cur, "WeeklySummaryRow")
+            return {summary_key(athlete_id, record.start_date): record.to_dict() for record in records}
+
+        ttls = {key: self.cache.ttl_for_week(week_start) for key, week_start in week_starts.items()}
+        return self.cache.get_many(ttls, load)
+
+    @staticmethod
+    def _summary_to_row(summary: Any) -> Dict[str, Any]:
+        """Convert a WeeklySummary into column values, zone vectors as FLOAT8[] lists."""
+        row = {field.name: getattr(summary, field.name) for field in fields(summary)}
+        for column in ZONE_COLUMNS:
+            if isinstance(row.get(column), ZoneVector):
+                row[column] = row[column].tolist()
+        return row
 
     def add_column(self, column_name: str, column_type: str, default_value: Any = None) -> None:
         """Add a new column to the weekly_summary table if it doesn't exist.
@@ -169,7 +252,9 @@ class WeeklySummaryDB:
                 """, (column_name,))
                 
                 if not cur.fetchone():
-                    # Column doesn't exist, so add it
+                    # Column doesn't exist, so add it. Fail fast rather than queue
+                    # writers behind the exclusive lock if the table is busy.
+                    set_lock_timeout(cur)
                     sql = f"ALTER TABLE weekly_summary ADD COLUMN {column_name} {column_type}"
                     if default_value is not None:
                         sql += f" DEFAULT {default_value}"
@@ -177,23 +262,48 @@ class WeeklySummaryDB:
                     print(f"Added column {column_name} to weekly_summary table")
                 else:
                     print(f"Column {column_name} already exists in weekly_summary table")
-            conn.commit() 
+            conn.commit()
+        # Cached column lists for this table are now stale
+        schema_registry.invalidate('weekly_summary')
 
-    def update_column_values(self, column_name: str, value: Any, where_clause: str = None) -> None:
+    def update_column_values(
+        self,
+        column_name: str,
+        value: Any = None,
+        where_clause: str = None,
+        value_sql: str = None,
+        batch_size: int = BACKFILL_BATCH_SIZE,
+        pause: float = 0.0
+    ) -> BackfillProgress:
         """Update values in a specific column for existing rows.
-        
+
+        Rows are updated in key-ordered batches with a checkpoint after each
+        one, so the update never holds locks on the whole table and resumes
+        after an interruption (see column_backfill.py).
+
         Args:
             column_name: Name of the column to update
             value: Value to set
             where_clause: Optional WHERE clause to filter which rows to update
+            value_sql: Optional SQL expression to set instead of a constant value
+            batch_size: Rows per transaction
+            pause: Seconds to sleep between batches
+
+        Returns:
+            BackfillProgress with row counts and throughput
         """
-        with self._get_connection() as conn:
-            with conn.cursor() as cur:
-                sql = f"UPDATE weekly_summary SET {column_name} = %s"
-                if where_clause:
-                    sql += f" WHERE {where_clause}"
-                
-                cur.execute(sql, (value,))
-                rows_updated = cur.rowcount
-                print(f"Updated {rows_updated} rows in column {column_name}")
-            conn.commit() 
\ No newline at end of file
+        progress = ColumnBackfill(
+            'weekly_summary',
+            column_name,
+            value=value,
+            value_sql=value_sql,
+            where_clause=where_clause,
+            key=("athlete_id", "start_date"),
+            batch_size=batch_size,
+            pause=pause,
+            db_params=self.db_params
+        ).run()
+        # Any cached week may hold the old value
+        self.cache.clear()
+        print(f"Updated {progress.rows_updated} rows in column {column_name}")
+        return progress 
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Content-addressed cache of encoded FIT workout files.
+
+A plan is regenerated in full whenever any part of it changes, and every
+workout is encoded through fit_tool message objects. `FitCache` stores each
+encoded file under a key derived from the workout itself
+(`workout_cache_key`), so regenerating a plan re-encodes only the workouts
+that actually changed.
+
+Layout inside the workout directory:
+
+- fit_cache/<key>.fit: one encoded file per distinct workout
+- fit_cache.json: the manifest, with each entry's size and last use, and the
+  key every named workout file was last written from
+
+When the cached files outgrow `max_bytes`, the least recently used are
+evicted. The manifest is written atomically. Each workout directory should
+have a single writer at a time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = "fit_cache"
+MANIFEST_NAME = "fit_cache.json"
+
+# Encoded workouts are a few hundred bytes, so this holds thousands of them
+FIT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def workout_cache_key(workout: BaseModel, generator_version: str) -> str:
+    """SHA-256 of the workout's canonical JSON and the version of the encoder that produced it."""
+    canonical = json.dumps(workout.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{generator_version}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write to a temporary file in the same directory and swap it in, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class FitCache:
+    """Encoded FIT files keyed by workout content, with size-based LRU eviction.
+
+    Args:
+        directory: Workout directory holding the cache and its manifest
+        max_bytes: Total size of cached files kept before evicting
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = FIT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / CACHE_DIR_NAME
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, Dict[str, Any]] = {}  # key -> {"size", "last_used"}
+        self._outputs: Dict[str, str] = {}  # workout file name -> key it was written from
+        self._dirty = False
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self._entries = manifest.get("entries", {})
+            self._outputs = manifest.get("outputs", {})
+        except (OSError, ValueError) as e:
+            # The cache only saves work; start empty rather than fail generation
+            logger.warning(f"Ignoring unreadable FIT cache manifest {self.manifest_path}: {e}")
+
+    def _blob_path(self, key: str) -> Path:
+        return self.blob_dir / f"{key}.fit"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the encoded file stored under `key`, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            data = self._blob_path(key).read_bytes()
+        except FileNotFoundError:
+            del self._entries[key]
+            self._dirty = True
+            return None
+        entry["last_used"] = time.time()
+        self._dirty = True
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store an encoded file under `key`, evicting old entries if over max_bytes."""
+        atomic_write_bytes(self._blob_path(key), data)
+        self._entries[key] = {"size": len(data), "last_used": time.time()}
+        self._dirty = True
+        self._evict()
+
+    def is_current(self, path: Path, key: str) -> bool:
+        """True if `path` exists and was last written from the entry `key`."""
+        if self._outputs.get(path.name) != key or not path.exists():
+            return False
+        if key in self._entries:
+            self._entries[key]["last_used"] = time.time()
+            self._dirty = True
+        return True
+
+    def record_output(self, path: Path, key: str) -> None:
+        """Remember that `path` was written from the entry `key`."""
+        self._outputs[path.name] = key
+        self._dirty = True
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def _evict(self) -> None:
+        total = self.size_bytes
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            self._blob_path(key).unlink(missing_ok=True)
+            del self._entries[key]
+            total -= entry["size"]
+            logger.debug(f"Evicted FIT cache entry {key}")
+
+    def save(self) -> None:
+        """Write the manifest if it changed since it was loaded or last saved."""
+        if not self._dirty:
+            return
+        manifest = {"entries": self._entries, "outputs": self._outputs}
+        atomic_write_bytes(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+        self._dirty = False
@@ -1,8 +1,9 @@
-from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Protocol, Dict, List, Optional, Union
+from typing import Protocol, Dict, List, Optional, Tuple, Union
 from fit_tool.fit_file_builder import FitFileBuilder
 from fit_tool.profile.messages.file_id_message import FileIdMessage
 from fit_tool.profile.messages.workout_message import WorkoutMessage
@@ -19,13 +20,25 @@ from fit_tool.profile.messages.workout_step_message import WorkoutStepCustomTarg
 from schemas.workout_phases import (
     Phase, SinglePhase, IntervalSet, Interval
 )
+from utils.fit_cache import FIT_CACHE_MAX_BYTES, FitCache, atomic_write_bytes, workout_cache_key
+from utils import fit_workout_encoder
+
+# Part of every FIT cache key; bump whenever the encoded output changes
+FIT_GENERATOR_VERSION = "1"
 
 @dataclass
 class WorkoutArtifacts:
     """Container for workout-related files and metadata."""
-    fit_file_path: Path
+    fit_file_path: Optional[Path]  # None when the generator keeps files in memory
     notes: str
     workout_id: str  # Format: week{n}_date_{type}
+    fit_bytes: Optional[bytes] = None  # encoded file, set when the generator keeps files in memory
+
+@dataclass
+class PlanArtifacts:
+    """Artifacts of every workout of a plan that was generated, and the errors of the rest."""
+    artifacts: Dict[str, WorkoutArtifacts] = field(default_factory=dict)  # workout_id -> artifacts, in plan order
+    errors: Dict[str, str] = field(default_factory=dict)  # workout_id -> error
 
 class UnitConverter:
     """Centralized unit conversion logic for FIT file format requirements."""
@@ -146,40 +159,162 @@ class WorkoutStepBuilder:
 class FitFileGenerator:
     """Generates FIT files and associated metadata for training plan workouts."""
     
-    def __init__(self, output_dir: str):
-        """Initialize the generator with output directory."""
-        self.output_dir = Path(output_dir)
+    def __init__(self, output_dir: Optional[str], cache_max_bytes: int = FIT_CACHE_MAX_BYTES):
+        """Initialize the generator with output directory.
+
+        Args:
+            output_dir: Directory the FIT files (and the FIT cache) are written to. None keeps
+                encoded files in memory only (WorkoutArtifacts.fit_bytes), e.g. in Lambda
+                where /tmp is small.
+            cache_max_bytes: Size limit of the FIT cache; 0 disables caching
+        """
+        self.output_dir = Path(output_dir) if output_dir is not None else None
         self.converter = UnitConverter()
         self.step_builder = WorkoutStepBuilder(self.converter)
         
-        try:
-            self.output_dir.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            raise RuntimeError(f"Failed to create output directory: {e}")
+        if self.output_dir is not None:
+            try:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise RuntimeError(f"Failed to create output directory: {e}")
 
-    def generate_workout_artifacts(self, training_plan: TrainingPlan) -> Dict[str, WorkoutArtifacts]:
-        """Generate FIT files and metadata for all workouts in the training plan."""
+        self.cache = None
+        if self.output_dir is not None and cache_max_bytes > 0:
+            self.cache = FitCache(self.output_dir, max_bytes=cache_max_bytes)
+
+    def generate_workout_artifacts(self, training_plan: TrainingPlan, max_workers: int = 1) -> Dict[str, WorkoutArtifacts]:
+        """Generate FIT files and metadata for all workouts in the training plan.
+
+        Args:
+            training_plan: Plan to generate
+            max_workers: Processes encoding workouts in parallel (1 encodes in this process)
+
+        Raises:
+            RuntimeError: If the plan is invalid or any workout fails
+        """
         try:
             self._validate_training_plan(training_plan)
-            artifacts = {}
-            
-            for week in training_plan.weeks:
-                for workout in week.workouts:
-                    workout_id = f"week{week.week_number}_{workout.scheduled_date}_{workout.workout_subtype[0]}"
-                    
-                    fit_file_path = self._generate_workout_file(workout, week.week_number)
-                    notes = self._collect_workout_notes(workout)
-                    
-                    artifacts[workout_id] = WorkoutArtifacts(
-                        fit_file_path=fit_file_path,
-                        notes=notes,
-                        workout_id=workout_id
-                    )
-            
-            return artifacts
-            
+            result = self.generate_plan_artifacts(training_plan, max_workers=max_workers)
         except Exception as e:
             raise RuntimeError(f"Failed to generate workout artifacts: {e}")
+        if result.errors:
+            workout_id, error = next(iter(result.errors.items()))
+            raise RuntimeError(f"Failed to generate workout artifacts: {workout_id}: {error}")
+        return result.artifacts
+
+    def generate_plan_artifacts(
+        self,
+        training_plan: TrainingPlan,
+        max_workers: int = 1,
+        executor: Optional[Executor] = None
+    ) -> PlanArtifacts:
+        """Generate FIT files and metadata for all workouts, collecting per-workout errors.
+
+        Workouts missing from the FIT cache are encoded in parallel on a
+        process pool, since encoding is CPU bound. Files are written from
+        this process only, each to a temporary file that is renamed into
+        place, so a crash never leaves a truncated .fit file behind. Without
+        an output directory nothing is written and the artifacts carry the
+        encoded bytes instead.
+
+        Args:
+            training_plan: Plan to generate
+            max_workers: Processes encoding workouts in parallel (1 encodes in this process)
+            executor: Process pool to encode on instead, e.g. one shared by several athletes
+
+        Returns:
+            PlanArtifacts with the artifacts of the generated workouts and the errors of the others
+        """
+        result = PlanArtifacts()
+        files: Dict[str, Tuple[Workout, Optional[Path], Optional[str]]] = {}  # workout_id -> (workout, path, cache key)
+        to_encode: Dict[str, Workout] = {}
+
+        for week in training_plan.weeks:
+            for workout in week.workouts:
+                workout_id = self._workout_id(workout, week.week_number)
+                try:
+                    file_path = self.output_dir / f"{workout_id}.fit" if self.output_dir is not None else None
+                    key = workout_cache_key(workout, FIT_GENERATOR_VERSION) if self.cache is not None else None
+                    files[workout_id] = (workout, file_path, key)
+                    if key is not None and self.cache.is_current(file_path, key):
+                        continue
+                    data = self.cache.get(key) if key is not None else None
+                    if data is None:
+                        to_encode[workout_id] = workout
+                    else:
+                        self._write_workout_file(file_path, data, key, cached=True)
+                except Exception as e:
+                    result.errors[workout_id] = str(e)
+
+        encoded, errors = self._encode_workouts(to_encode, max_workers, executor)
+        result.errors.update(errors)
+        if self.output_dir is not None:
+            for workout_id, data in encoded.items():
+                _, file_path, key = files[workout_id]
+                try:
+                    self._write_workout_file(file_path, data, key)
+                except Exception as e:
+                    result.errors[workout_id] = str(e)
+
+        for workout_id, (workout, file_path, _) in files.items():
+            if workout_id not in result.errors:
+                result.artifacts[workout_id] = WorkoutArtifacts(
+                    fit_file_path=file_path,
+                    notes=self._collect_workout_notes(workout),
+                    workout_id=workout_id,
+                    fit_bytes=encoded[workout_id] if file_path is None else None
+                )
+        if self.cache is not None:
+            self.cache.save()
+        return result
+
+    def _encode_workouts(
+        self,
+        workouts: Dict[str, Workout],
+        max_workers: int,
+        executor: Optional[Executor]
+    ) -> Tuple[Dict[str, bytes], Dict[str, str]]:
+        """Encode workouts, on a process pool unless there is at most one worker or workout.
+
+        Returns:
+            (workout_id -> encoded bytes, workout_id -> error)
+        """
+        encoded: Dict[str, bytes] = {}
+        errors: Dict[str, str] = {}
+        if executor is None and (max_workers <= 1 or len(workouts) <= 1):
+            for workout_id, workout in workouts.items():
+                try:
+                    encoded[workout_id] = self._encode_workout(workout)
+                except Exception as e:
+                    errors[workout_id] = str(e)
+            return encoded, errors
+
+        pool = executor or ProcessPoolExecutor(max_workers=min(max_workers, len(workouts)))
+        try:
+            futures = {
+                pool.submit(_encode_in_worker, type(self), self.output_dir, workout): workout_id
+                for workout_id, workout in workouts.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    encoded[futures[future]] = future.result()
+                except Exception as e:
+                    errors[futures[future]] = str(e)
+        finally:
+            if executor is None:
+                pool.shutdown()
+        return encoded, errors
+
+    def _write_workout_file(self, file_path: Path, data: bytes, key: Optional[str], cached: bool = False) -> None:
+        """Atomically write an encoded workout and record it in the FIT cache (if enabled)."""
+        atomic_write_bytes(file_path, data)
+        if key is not None:
+            if not cached:
+                self.cache.put(key, data)
+            self.cache.record_output(file_path, key)
+
+    def _workout_id(self, workout: Workout, week_number: int) -> str:
+        return f"week{week_number}_{workout.scheduled_date}_{workout.workout_subtype[0]}"
 
     def _validate_training_plan(self, plan: TrainingPlan) -> None:
         """Validate training plan structure and content."""
@@ -192,35 +327,80 @@ class FitFileGenerator:
                 if not workout.phases:
                     raise ValueError(f"Workout on {workout.scheduled_date} has no phases")
 
+    def encode_workout(self, workout: Workout) -> bytes:
+        """Return a workout's encoded FIT file without writing it to the output directory.
+
+        The result comes from the FIT cache when it holds this exact workout.
+        The bytes can be passed straight to upload_workout.
+        """
+        if self.cache is None:
+            return self._encode_workout(workout)
+        key = workout_cache_key(workout, FIT_GENERATOR_VERSION)
+        data = self.cache.get(key)
+        if data is None:
+            data = self._encode_workout(workout)
+            self.cache.put(key, data)
+            self.cache.save()
+        return data
+
     def _generate_workout_file(self, workout: Workout, week_number: int) -> Path:
-        """Generate a FIT file for a single workout."""
+        """Generate a FIT file for a single workout.
+
+        The file is only encoded if the FIT cache has no entry for this exact
+        workout, and only written if it doesn't already hold that entry.
+        """
+        if self.output_dir is None:
+            raise RuntimeError("Failed to generate workout file: generator has no output directory")
         try:
-            builder = FitFileBuilder(auto_define=True)
-            
-            # Add messages
-            self._add_file_id(builder)
-            self._add_workout_message(builder, workout)
-            self._add_workout_steps(builder, workout)
-            
-            # Save file
-            filename = f"week{week_number}_{workout.scheduled_date}_{workout.workout_subtype[0]}.fit"
-            file_path = self.output_dir / filename
-            
-            fit_file = builder.build()
-            fit_file.to_file(str(file_path)) # Write the workout to a .fit file
+            file_path = self.output_dir / f"{self._workout_id(workout, week_number)}.fit"
+
+            if self.cache is None:
+                self._write_workout_file(file_path, self._encode_workout(workout), None)
+                return file_path
+
+            key = workout_cache_key(workout, FIT_GENERATOR_VERSION)
+            if self.cache.is_current(file_path, key):
+                return file_path
+
+            data = self.cache.get(key)
+            if data is None:
+                self._write_workout_file(file_path, self._encode_workout(workout), key)
+            else:
+                self._write_workout_file(file_path, data, key, cached=True)
+            self.cache.save()
             
             return file_path
             
         except Exception as e:
             raise RuntimeError(f"Failed to generate workout file: {e}")
 
-    def _add_file_id(self, builder: FitFileBuilder) -> None:
+    def _encode_workout(self, workout: Workout) -> bytes:
+        """Encode a workout as the bytes of a FIT file."""
+        return fit_workout_encoder.encode_workout(workout)
+
+    def _encode_workout_with_builder(self, workout: Workout, time_created_ms: Optional[int] = None) -> bytes:
+        """Encode a workout through fit_tool's FitFileBuilder.
+
+        This is the reference `_encode_workout` must stay byte-compatible with.
+        """
+        builder = FitFileBuilder(auto_define=True)
+        
+        # Add messages
+        self._add_file_id(builder, time_created_ms)
+        self._add_workout_message(builder, workout)
+        self._add_workout_steps(builder, workout)
+        
+        return builder.build().to_bytes()
+
+    def _add_file_id(self, builder: FitFileBuilder, time_created_ms: Optional[int] = None) -> None:
         """Add file ID message to the builder."""
+        if time_created_ms is None:
+            time_created_ms = round(datetime.now().timestamp() * 1000)
         file_id = FileIdMessage()
         file_id.type = FileType.WORKOUT
         file_id.manufacturer = Manufacturer.DEVELOPMENT.value
         file_id.product = 0
-        file_id.time_created = round(datetime.now().timestamp() * 1000)
+        file_id.time_created = time_created_ms
         file_id.serial_number = 0x12345678
         builder.add(file_id)
 
@@ -270,4 +450,16 @@ class FitFileGenerator:
                     if interval.notes:
                         notes.append(f"- {interval.type.title()}: {interval.notes}")
         
-        return "\n".join(notes)
\ No newline at end of file
+        return "\n".join(notes)
+
+
+# Generators used by process pool workers, one per generator class and output directory
+_worker_generators: Dict[Tuple[type, Optional[Path]], FitFileGenerator] = {}
+
+
+def _encode_in_worker(generator_cls: type, output_dir: Optional[Path], workout: Workout) -> bytes:
+    """Process pool entry point: encode a workout without touching the cache or the output directory."""
+    generator = _worker_generators.get((generator_cls, output_dir))
+    if generator is None:
+        generator = _worker_generators[(generator_cls, output_dir)] = generator_cls(output_dir, cache_max_bytes=0)
+    return generator._encode_workout(workout)
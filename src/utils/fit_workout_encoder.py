@@ -0,0 +1,215 @@
+"""Direct struct-based encoder for FIT workout files.
+
+A workout file always holds the same three message types: one file_id, one
+workout and one workout_step per step. `encode_workout` packs them with
+precomputed definition messages and `struct`, instead of building fit_tool
+message objects and resolving their fields and sub-fields one by one.
+
+The output is byte for byte what FitFileGenerator produced through
+fit_tool's FitFileBuilder for the same workout and creation time:
+
+- a 12-byte header (protocol 2.3, profile 21.212) without a header CRC
+- each message type defined once, all on local message 0, with the fields
+  fit_tool defines, in field number order
+- step durations scaled the way fit_tool scales them through the
+  duration_time/duration_distance sub-fields (milliseconds x 1000,
+  centimeters x 100)
+- a trailing CRC-16 of the header and records
+
+The same steps are rejected too, e.g. time steps longer than 4294.967 s,
+whose scaled duration does not fit in a uint32.
+
+Usage:
+    python -m src.utils.fit_workout_encoder [--iterations N]  # benchmark against FitFileBuilder
+"""
+
+import argparse
+import struct
+import time
+from datetime import datetime
+from typing import Optional, Union
+
+from fit_tool.profile.profile_type import (
+    FileType, Intensity, Manufacturer, Sport, WorkoutStepDuration, WorkoutStepTarget
+)
+
+from schemas.training_plan import Workout
+from schemas.workout_phases import Interval, IntervalSet, SinglePhase
+from utils.fit_crc import crc16
+
+PROTOCOL_VERSION = 0x23  # 2.3
+PROFILE_VERSION = 21212  # FIT SDK 21.212
+HEADER = struct.Struct("<BBHI4s")
+CRC = struct.Struct("<H")
+
+# Milliseconds between the Unix epoch and the FIT epoch (1989-12-31T00:00:00Z)
+FIT_EPOCH_OFFSET_MS = 631065600000.0
+SERIAL_NUMBER = 0x12345678
+
+UINT16_MAX = 0xFFFF
+UINT32_MAX = 0xFFFFFFFF
+
+
+def _definition(global_number: int, fields) -> bytes:
+    """Definition message for local message 0 with (field number, size, base type) fields."""
+    message = struct.pack("<BBBHB", 0x40, 0, 0, global_number, len(fields))
+    return message + bytes(value for field in fields for value in field)
+
+
+# Base types
+ENUM, UINT16, UINT32, UINT32Z = 0x00, 0x84, 0x86, 0x8C
+
+FILE_ID_DEFINITION = _definition(0, [(0, 1, ENUM), (1, 2, UINT16), (2, 2, UINT16), (3, 4, UINT32Z), (4, 4, UINT32)])
+FILE_ID = struct.Struct("<BBHHII")  # record header, type, manufacturer, product, serial_number, time_created
+
+WORKOUT_DEFINITION = _definition(26, [(4, 1, ENUM), (6, 2, UINT16)])
+WORKOUT = struct.Struct("<BBH")  # record header, sport, num_valid_steps
+
+STEP_DEFINITION = _definition(27, [
+    (1, 1, ENUM), (2, 4, UINT32), (3, 1, ENUM), (5, 4, UINT32), (6, 4, UINT32), (7, 1, ENUM)
+])
+# record header, duration_type, duration_value, target_type, custom_target_value_low/high, intensity
+STEP = struct.Struct("<BBIBIIB")
+
+PHASE_INTENSITIES = {
+    "warmup": Intensity.WARMUP.value,
+    "cooldown": Intensity.COOLDOWN.value,
+    "steady_state": Intensity.ACTIVE.value,
+    "interval": Intensity.INTERVAL.value,
+    "recovery": Intensity.RECOVERY.value,
+}
+
+
+def _uint32(name: str, value: int) -> int:
+    if not 0 <= value <= UINT32_MAX:
+        raise ValueError(f"{name} encoded value {value} is not in valid range [0, {UINT32_MAX}]")
+    return value
+
+
+def _pack_step(phase: Union[SinglePhase, Interval], intensity: int) -> bytes:
+    try:
+        if phase.duration_value < 0:
+            raise ValueError("Duration must be positive" if phase.duration_type == "time" else "Distance must be positive")
+        if phase.duration_type == "time":
+            duration_type = WorkoutStepDuration.TIME.value
+            duration = int(phase.duration_value * 1000) * 1000
+        elif phase.duration_type == "distance":
+            duration_type = WorkoutStepDuration.DISTANCE.value
+            duration = int(phase.duration_value * 100) * 100
+        else:
+            raise ValueError(f"Unsupported duration type: {phase.duration_type}")
+        _uint32("duration_value", duration)
+    except Exception as e:
+        raise ValueError(f"Failed to set duration: {e}")
+
+    try:
+        speed_low = _uint32("custom_target_value_low", int(phase.intensity.pace_min * 1000))
+        speed_high = _uint32("custom_target_value_high", int(phase.intensity.pace_max * 1000))
+    except Exception as e:
+        raise ValueError(f"Failed to set pace targets: {e}")
+
+    return STEP.pack(0, duration_type, duration, WorkoutStepTarget.SPEED.value, speed_low, speed_high, intensity)
+
+
+def encode_workout(workout: Workout, time_created_ms: Optional[int] = None) -> bytes:
+    """Encode a workout as the bytes of a FIT workout file.
+
+    Args:
+        workout: Workout to encode
+        time_created_ms: file_id creation time in Unix milliseconds (default: now)
+    """
+    if time_created_ms is None:
+        time_created_ms = round(datetime.now().timestamp() * 1000)
+
+    steps = bytearray()
+    num_steps = 0
+    for phase in workout.phases:
+        if isinstance(phase, SinglePhase):
+            steps += _pack_step(phase, PHASE_INTENSITIES.get(phase.type, Intensity.ACTIVE.value))
+            num_steps += 1
+        elif isinstance(phase, IntervalSet) and phase.repetitions > 0:
+            # Every repetition encodes to the same bytes
+            repetition = b"".join(
+                _pack_step(interval, Intensity.ACTIVE.value if interval.type == "work" else Intensity.RECOVERY.value)
+                for interval in phase.intervals
+            )
+            steps += repetition * phase.repetitions
+            num_steps += phase.repetitions * len(phase.intervals)
+    if num_steps > UINT16_MAX:
+        raise ValueError(f"num_valid_steps encoded value {num_steps} is not in valid range [0, {UINT16_MAX}]")
+
+    records = bytearray(FILE_ID_DEFINITION)
+    records += FILE_ID.pack(
+        0,
+        FileType.WORKOUT.value,
+        Manufacturer.DEVELOPMENT.value,
+        0,
+        SERIAL_NUMBER,
+        round((time_created_ms - FIT_EPOCH_OFFSET_MS) * 0.001)
+    )
+    records += WORKOUT_DEFINITION
+    records += WORKOUT.pack(0, Sport.RUNNING.value, num_steps)
+    if num_steps:
+        records += STEP_DEFINITION
+        records += steps
+
+    data = bytearray(HEADER.pack(12, PROTOCOL_VERSION, PROFILE_VERSION, len(records), b".FIT"))
+    data += records
+    data += CRC.pack(crc16(data))
+    return bytes(data)
+
+
+def _benchmark_workout() -> Workout:
+    """A typical interval session: warmup, 6 x (800 m + 2 min), cooldown."""
+    def phase(**fields):
+        intensity = {"effort": "moderate", "pace_min": 3.0, "pace_max": 3.4,
+                     "perceived_exertion_min": 4, "perceived_exertion_max": 6}
+        return {"duration_unit": "seconds", "intensity": intensity, "notes": "", **fields}
+
+    return Workout.model_validate({
+        "workout_type": "run",
+        "workout_subtype": ["vo2max_intervals"],
+        "scheduled_date": "2026-01-06",
+        "total_distance": {"value": 10000, "unit": "meters"},
+        "estimated_duration": {"value": 3600, "unit": "seconds"},
+        "terrain": "track",
+        "phases": [
+            phase(type="warmup", duration_type="time", duration_value=900),
+            {"type": "interval_set", "repetitions": 6, "intervals": [
+                phase(type="work", duration_type="distance", duration_value=800, duration_unit="meters"),
+                phase(type="recovery", duration_type="time", duration_value=120),
+            ]},
+            phase(type="cooldown", duration_type="time", duration_value=600),
+        ],
+        "additional_instructions": "",
+    })
+
+
+def main(argv=None) -> None:
+    from utils.fit_file_generator import FitFileGenerator
+
+    parser = argparse.ArgumentParser(description="Benchmark FIT workout encoding against FitFileBuilder.")
+    parser.add_argument("--iterations", type=int, default=2000, help="Workouts encoded per encoder")
+    args = parser.parse_args(argv)
+
+    workout = _benchmark_workout()
+    generator = FitFileGenerator(None)
+    time_created_ms = round(datetime.now().timestamp() * 1000)
+    if encode_workout(workout, time_created_ms) != generator._encode_workout_with_builder(workout, time_created_ms):
+        raise SystemExit("Encoders disagree")
+
+    results = {}
+    for name, encode in (
+        ("FitFileBuilder", lambda: generator._encode_workout_with_builder(workout, time_created_ms)),
+        ("struct", lambda: encode_workout(workout, time_created_ms)),
+    ):
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            encode()
+        results[name] = (time.perf_counter() - start) / args.iterations
+        print(f"{name:>14}: {results[name] * 1e6:8.1f} us/workout")
+    print(f"{'speedup':>14}: {results['FitFileBuilder'] / results['struct']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import base64
 import requests
 from dotenv import load_dotenv
 import logging
+from typing import Optional, Union
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,15 +13,25 @@ API_KEY = os.getenv("INTERVALS_ICU_API_KEY")
 if not API_KEY:
     raise ValueError("API key not found. Make sure to set INTERVALS_API_KEY in your .env file.")
 
-def upload_workout(file_path: str, athlete_id: str, start_date: str, external_id: str) -> requests.Response:
+def upload_workout(
+    file_path: Optional[str],
+    athlete_id: str,
+    start_date: str,
+    external_id: str,
+    fit_bytes: Optional[Union[bytes, memoryview]] = None,
+    filename: Optional[str] = None
+) -> requests.Response:
     """
     Uploads a .fit workout file to the Intervals.icu API.
 
     Args:
-        file_path (str): Path to the .fit file.
+        file_path (str): Path to the .fit file. Not read when fit_bytes is given.
         athlete_id (str): Athlete ID for the API. This is the athlete's ID on intervals.icu.
         start_date (str): Start date and time of the workout in ISO 8601 format (e.g., "2025-01-10T09:00:00").
         external_id (str): Unique external ID for the workout.
+        fit_bytes (bytes): Encoded .fit file (e.g. from FitFileGenerator.encode_workout), uploaded
+            without touching the filesystem.
+        filename (str): Name reported to the API (default: file_path's name, or "<external_id>.fit").
 
     Returns:
         Response object: The response from the API call.
@@ -28,16 +39,18 @@ def upload_workout(file_path: str, athlete_id: str, start_date: str, external_id
     url = f"https://intervals.icu/api/v1/athlete/{athlete_id}/events/bulk?upsert=true"
     
     try:
-        # Read and encode the .fit file in Base64
-        with open(file_path, "rb") as file:
-            file_contents = file.read()
-            file_contents_base64 = base64.b64encode(file_contents).decode("utf-8")
+        if fit_bytes is None:
+            # Read the .fit file
+            with open(file_path, "rb") as file:
+                fit_bytes = file.read()
+        file_contents_base64 = base64.b64encode(fit_bytes).decode("utf-8")
+        filename = filename or (os.path.basename(file_path) if file_path else f"{external_id}.fit")
         
         # Prepare the payload
         payload = [{
             "category": "WORKOUT",
             "start_date_local": start_date,
-            "filename": os.path.basename(file_path),
+            "filename": filename,
             "file_contents_base64": file_contents_base64,
             "external_id": external_id
         }]
@@ -0,0 +1,40 @@
+import sqlite3
+import unittest
+from src.activity.constants import ACTIVITY_TYPE_MAPPINGS, ActivityCategory, activity_category_sql, get_activity_category
+
+# PYTHONPATH=$(pwd)/src pytest tests/activity/test_constants.py -v
+class TestActivityCategorySql(unittest.TestCase):
+
+    def setUp(self):
+        # The CASE only uses lower(), replace() and IN, which SQLite evaluates the same way as PostgreSQL
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE activities (activity_type TEXT)")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def categories(self, activity_types):
+        self.connection.execute("DELETE FROM activities")
+        self.connection.executemany("INSERT INTO activities VALUES (?)", [(t,) for t in activity_types])
+        rows = self.connection.execute(f"SELECT activity_type, {activity_category_sql()} FROM activities").fetchall()
+        return dict(rows)
+
+    def test_matches_get_activity_category(self):
+        activity_types = []
+        for types in ACTIVITY_TYPE_MAPPINGS.values():
+            for activity_type in types:
+                spaced = activity_type.replace("_", " ")
+                activity_types += [activity_type, activity_type.upper(), spaced, spaced.title()]
+        activity_types += ["yoga", "Strength Training", "road-biking", "running_", ""]
+
+        categories = self.categories(activity_types)
+        self.assertEqual(len(categories), len(set(activity_types)))
+        for activity_type, category in categories.items():
+            self.assertEqual(category, get_activity_category(activity_type).value, activity_type)
+
+        self.assertEqual(categories["Trail Running"], ActivityCategory.RUNNING.value)
+        self.assertEqual(categories["OPEN_WATER_SWIMMING"], ActivityCategory.SWIMMING.value)
+        self.assertEqual(categories["yoga"], ActivityCategory.OTHER.value)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import unittest
+
+import numpy as np
+
+from src.activity.fit_reader import iter_record_batches, iter_records
+from tests.activity.test_fit_streams import START_MS, activity_fit
+
+# PYTHONPATH=$(pwd)/src pytest tests/activity/test_fit_reader.py -v
+
+
+class CountingStream(io.BytesIO):
+    """Tracks how far into the file a consumer has read."""
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestFitReader(unittest.TestCase):
+
+    def test_batches_match_whole_file_for_any_chunk_size(self):
+        data = activity_fit(250, without_power={3, 100})
+        expected = next(iter_record_batches(data, batch_size=1000))
+        for chunk_size in (1, 7, 64, 1 << 20):
+            batches = list(iter_record_batches(data, batch_size=100, chunk_size=chunk_size))
+            self.assertEqual([len(batch["timestamp"]) for batch in batches], [100, 100, 50])
+            for column, values in expected.items():
+                np.testing.assert_array_equal(np.concatenate([batch[column] for batch in batches]), values)
+
+    def test_yields_records_before_reading_the_whole_file(self):
+        data = activity_fit(2000)
+        stream = CountingStream(data)
+        records = iter_records(stream, chunk_size=1024)
+        first = next(records)
+        self.assertLess(stream.bytes_read, 2048)
+        self.assertEqual(first["timestamp"], START_MS // 1000)
+        self.assertEqual(first["heart_rate"], 120)
+        self.assertIsNone(next(iter_records(activity_fit(1, without_power={0})))["power"])
+        self.assertEqual(sum(1 for _ in records), 1999)
+        self.assertEqual(stream.bytes_read, len(data))
+
+    def test_validates_header_before_yielding(self):
+        data = bytearray(activity_fit(10))
+        data[8:12] = b".FOO"
+        with self.assertRaisesRegex(ValueError, "Not a FIT file"):
+            next(iter_records(bytes(data)))
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            list(iter_records(activity_fit(10)[:-20]))
+
+
+if __name__ == '__main__':
+    unittest.main()
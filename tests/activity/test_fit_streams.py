@@ -0,0 +1,119 @@
+import io
+import math
+import struct
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.file_id_message import FileIdMessage
+from fit_tool.profile.messages.record_message import RecordMessage
+from fit_tool.profile.profile_type import FileType, Manufacturer
+
+from src.activity.fit_streams import decode_activity_streams, decode_records, load_streams, streams_path_for
+from src.utils.fit_crc import crc16
+
+# PYTHONPATH=$(pwd)/src pytest tests/activity/test_fit_streams.py -v
+START_MS = 1767225600000
+
+
+def activity_fit(num_samples, without_power=()):
+    """An activity recorded every second, as written by fit_tool."""
+    builder = FitFileBuilder(auto_define=True)
+    file_id = FileIdMessage()
+    file_id.type = FileType.ACTIVITY
+    file_id.manufacturer = Manufacturer.DEVELOPMENT.value
+    file_id.time_created = START_MS
+    builder.add(file_id)
+    for i in range(num_samples):
+        record = RecordMessage()
+        record.timestamp = START_MS + i * 1000
+        record.position_lat = 47.0 + i * 1e-5
+        record.position_long = 8.0
+        record.distance = i * 3.2
+        record.speed = 3.2
+        record.heart_rate = 120 + i % 40
+        record.cadence = 85
+        record.altitude = 400 + math.sin(i / 50) * 10
+        # fit_tool defines a new record layout whenever the set of fields changes
+        if i not in without_power:
+            record.power = 200 + i % 50
+        builder.add(record)
+    return builder.build().to_bytes()
+
+
+def hand_built_fit():
+    """Big-endian records with developer data, followed by compressed timestamp records."""
+    records = bytearray()
+    # Local 0: timestamp, heart_rate, enhanced_altitude, altitude, plus one 2-byte developer field
+    records += struct.pack(">BBBHB", 0x60, 0, 1, 20, 4) + bytes([253, 4, 0x86, 3, 1, 0x02, 78, 4, 0x86, 2, 2, 0x84])
+    records += bytes([1, 0, 2, 0])
+    records += struct.pack(">BIBIH", 0x00, 1000, 150, (300 + 500) * 5, 0xFFFF) + b"\x01\x02"
+    # Local 1: heart_rate only, for compressed timestamp headers
+    records += struct.pack("<BBBHB", 0x41, 0, 0, 20, 1) + bytes([3, 1, 0x02])
+    records += bytes([0x80 | 1 << 5 | 10, 151])  # 1000 -> 1002
+    records += bytes([0x80 | 1 << 5 | 3, 0xFF])  # offset below 1002's low bits rolls over: 1027, no heart rate
+    header = struct.pack("<BBHI4s", 14, 0x20, 2100, len(records), b".FIT")
+    header += struct.pack("<H", crc16(header))
+    data = header + records
+    return data + struct.pack("<H", crc16(data))
+
+
+class TestFitStreams(unittest.TestCase):
+
+    def test_decodes_records_into_columns(self):
+        streams = decode_records(activity_fit(300, without_power={5}))
+        self.assertEqual(len(streams["timestamp"]), 300)
+        self.assertEqual(streams["timestamp"][299], START_MS // 1000 + 299)
+        self.assertAlmostEqual(streams["distance"][100], 320.0)
+        self.assertAlmostEqual(float(streams["speed"][0]), 3.2, places=5)
+        self.assertEqual(streams["heart_rate"][41], 121)
+        self.assertTrue(np.isnan(streams["power"][5]))
+        self.assertEqual(streams["power"][6], 206)
+        self.assertAlmostEqual(float(streams["altitude"][0]), 400.0)
+        self.assertAlmostEqual(streams["latitude"][100], 47.001, places=6)
+
+    def test_decodes_big_endian_developer_and_compressed_records(self):
+        streams = decode_records(hand_built_fit())
+        self.assertEqual((streams["timestamp"] - 631065600).tolist(), [1000, 1002, 1027])
+        np.testing.assert_array_equal(streams["heart_rate"], [150, 151, np.nan])
+        # enhanced_altitude wins over altitude
+        self.assertEqual(streams["altitude"][0], 300)
+
+    def test_rejects_corrupt_file(self):
+        data = bytearray(activity_fit(10))
+        data[-3] ^= 0xFF  # last record's last value
+        with self.assertRaisesRegex(ValueError, "CRC"):
+            decode_records(bytes(data))
+        with tempfile.TemporaryDirectory() as directory:
+            fit_path = Path(directory) / "123.fit"
+            fit_path.write_bytes(bytes(data))
+            with self.assertRaisesRegex(ValueError, "CRC"):
+                decode_activity_streams(fit_path)
+            # Nothing is kept from a file that fails its CRC
+            self.assertEqual(list(Path(directory).iterdir()), [fit_path])
+
+    def test_streams_file_maps_back_without_decoding(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Garmin's original-format downloads are zip archives
+            fit_path = Path(directory) / "123.fit"
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as zf:
+                zf.writestr("123_ACTIVITY.fit", activity_fit(120, without_power={7}))
+            fit_path.write_bytes(archive.getvalue())
+
+            path = decode_activity_streams(fit_path, batch_size=50)
+            self.assertEqual(path, streams_path_for(fit_path))
+            streams = load_streams(path)
+            expected = decode_records(activity_fit(120, without_power={7}))
+            self.assertEqual(set(streams), set(expected))
+            for column, values in expected.items():
+                self.assertIsInstance(streams[column], np.memmap)
+                self.assertEqual(streams[column].dtype, values.dtype)
+                np.testing.assert_array_equal(streams[column], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from datetime import date, timedelta
+import numpy as np
+from src.analysis.training_load import TrainingLoadState, advance, compute_series, ewma
+
+# PYTHONPATH=$(pwd)/src pytest tests/analysis/test_training_load.py -v
+class TestTrainingLoad(unittest.TestCase):
+
+    def test_vectorized_series_matches_daily_updates(self):
+        loads = np.random.default_rng(1).uniform(0, 150, 1000)
+        loads[::3] = 0.0  # rest days
+        first_day = date(2023, 1, 1)
+        days, atl, ctl, tsb = compute_series(first_day, loads)
+
+        state = TrainingLoadState.initial(first_day - timedelta(days=1))
+        for i, load in enumerate(loads):
+            state = advance(state, first_day + timedelta(days=i), load)
+            self.assertEqual(days[i], state.day)
+            self.assertAlmostEqual(atl[i], state.atl, places=9)
+            self.assertAlmostEqual(ctl[i], state.ctl, places=9)
+            self.assertAlmostEqual(tsb[i], state.tsb, places=9)
+
+    def test_rest_days_decay_in_one_step(self):
+        state = advance(TrainingLoadState.initial(date(2024, 1, 1)), date(2024, 1, 2), 100.0)
+        daily = state
+        for day in range(3, 13):
+            daily = advance(daily, date(2024, 1, day), 0.0)
+        skipped = advance(state, date(2024, 1, 12), 0.0)
+
+        self.assertAlmostEqual(skipped.atl, daily.atl)
+        self.assertAlmostEqual(skipped.ctl, daily.ctl)
+        self.assertAlmostEqual(skipped.tsb, daily.tsb)
+
+    def test_resuming_from_a_stored_state(self):
+        loads = np.random.default_rng(2).uniform(0, 100, 60)
+        first_day = date(2024, 3, 1)
+        _, atl, ctl, tsb = compute_series(first_day, loads)
+        previous = TrainingLoadState(first_day + timedelta(days=39), loads[39], atl[39], ctl[39], tsb[39])
+
+        _, atl_tail, ctl_tail, tsb_tail = compute_series(first_day + timedelta(days=40), loads[40:], previous)
+        np.testing.assert_allclose(atl_tail, atl[40:])
+        np.testing.assert_allclose(ctl_tail, ctl[40:])
+        np.testing.assert_allclose(tsb_tail, tsb[40:])
+
+    def test_ewma_converges_to_constant_load(self):
+        self.assertAlmostEqual(ewma(np.full(2000, 80.0), 42)[-1], 80.0)
+
+    def test_advance_rejects_earlier_day(self):
+        with self.assertRaises(ValueError):
+            advance(TrainingLoadState.initial(date(2024, 1, 2)), date(2024, 1, 2), 10.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from src.activity.constants import ActivityCategory, get_activity_category
+from src.analysis.weekly_summary_engine import compose_weekly_metrics
+
+# PYTHONPATH=$(pwd)/src pytest tests/analysis/test_weekly_summary_engine.py -v
+SPORTS = {"cycling": ActivityCategory.CYCLING, "running": ActivityCategory.RUNNING, "swimming": ActivityCategory.SWIMMING}
+
+
+def activity(activity_type, duration, hr_z2=None, power_z3=None, **extra):
+    record = {
+        "activity_type": activity_type,
+        "duration": duration,
+        "distance": 1000.0,
+        "activity_training_load": 10.0,
+        "hr_time_z2_seconds": hr_z2,
+        "power_time_z3_seconds": power_z3,
+    }
+    record.update(extra)
+    return record
+
+
+def aggregate(activities):
+    """Row-by-row reference of the daily_summary aggregates over activities in start_time order."""
+    def total(column, sport=None):
+        return sum(
+            a.get(column) or 0.0 for a in activities
+            if sport is None or get_activity_category(a["activity_type"]) == SPORTS[sport]
+        )
+
+    def zones(prefix, sport=None):
+        return [total(f"{prefix}_time_z{zone}_seconds", sport) for zone in range(1, 6)]
+
+    vo2 = [a["vo2_max"] for a in activities if a.get("vo2_max")]
+    row = {
+        "num_sessions": len(activities),
+        "total_duration_seconds": total("duration"),
+        "total_distance_meters": total("distance"),
+        "total_training_load": total("activity_training_load"),
+        "time_in_hr_zones": zones("hr"),
+        "time_in_power_zones": zones("power"),
+        "best_5k_time": min((a["fastest_split_5k"] for a in activities if a.get("fastest_split_5k")), default=None),
+        "best_10k_time": min((a["fastest_split_10k"] for a in activities if a.get("fastest_split_10k")), default=None),
+        "vo2max_first": vo2[0] if vo2 else None,
+        "vo2max_last": vo2[-1] if vo2 else None,
+        "vo2max_max": max(vo2, default=None),
+        "vo2max_min": min(vo2, default=None),
+    }
+    for sport in SPORTS:
+        row[f"num_sessions_{sport}"] = sum(
+            1 for a in activities if get_activity_category(a["activity_type"]) == SPORTS[sport]
+        )
+        row[f"total_duration_{sport}_seconds"] = total("duration", sport)
+        row[f"total_training_load_{sport}"] = total("activity_training_load", sport)
+        row[f"time_in_hr_zones_{sport}"] = zones("hr", sport)
+        row[f"time_in_power_zones_{sport}"] = zones("power", sport)
+    return row
+
+
+class TestWeeklySummaryEngine(unittest.TestCase):
+
+    def test_single_day(self):
+        activities = [
+            activity("Road Biking", 3600.0, hr_z2=1800.0, power_z3=600.0, vo2_max=50.0),
+            activity("running", 1800.0, hr_z2=900.0, fastest_split_5k=1500.0, vo2_max=0),
+            activity("yoga", None, vo2_max=52.5),
+        ]
+        metrics = compose_weekly_metrics([aggregate(activities)])
+
+        self.assertEqual(metrics["num_sessions"], 3)
+        self.assertEqual(metrics["total_duration_seconds"], 5400.0)
+        self.assertEqual(metrics["total_duration_formatted"], "01:30:00")
+        self.assertEqual(metrics["total_distance_formatted"], "3.00 km")
+        self.assertEqual(metrics["num_sessions_cycling"], 1)
+        self.assertEqual(metrics["total_duration_running_seconds"], 1800.0)
+        self.assertEqual(metrics["time_in_hr_zones"].tolist(), [0.0, 2700.0, 0.0, 0.0, 0.0])
+        self.assertEqual(metrics["time_in_hr_zones"].formatted()["2"], "00:45:00")
+        self.assertEqual(metrics["time_in_power_zones_cycling"][3], 600.0)
+        self.assertEqual(metrics["time_in_hr_zones_swimming"].total, 0.0)
+        self.assertNotIn("time_in_power_zones_swimming", metrics)
+
+        self.assertEqual(metrics["best_5k_time"], 1500.0)
+        self.assertIsNone(metrics["best_10k_time"])
+        # VO2max readings of 0 are ignored
+        self.assertEqual((metrics["vo2max_start"], metrics["vo2max_end"]), (50.0, 52.5))
+        self.assertEqual(metrics["vo2max_change"], 2.5)
+
+    def test_compose_from_days_matches_week(self):
+        activities = [
+            activity("running", 1800.0, hr_z2=900.0, fastest_split_5k=1500.0, vo2_max=49.0),
+            activity("Road Biking", 3600.0, hr_z2=1800.0, power_z3=600.0, vo2_max=0),
+            activity("running", 2400.0, hr_z2=1200.0, fastest_split_5k=1450.0, fastest_split_10k=3000.0, vo2_max=51.0),
+            activity("lap_swimming", 1200.0, hr_z2=600.0, vo2_max=50.0),
+        ]
+        days = [0, 0, 3, 6]
+        daily = [aggregate([a for a, day in zip(activities, days) if day == d]) for d in sorted(set(days))]
+        composed = compose_weekly_metrics(daily)
+        week = aggregate(activities)
+
+        for key, value in week.items():
+            key = {"vo2max_first": "vo2max_start", "vo2max_last": "vo2max_end"}.get(key, key)
+            if key == "time_in_power_zones_swimming":
+                continue
+            composed_value = composed[key].tolist() if hasattr(composed[key], "tolist") else composed[key]
+            self.assertEqual(composed_value, value, key)
+        self.assertEqual(composed["vo2max_change"], 1.0)
+        self.assertEqual(composed["best_10k_formatted"], "00:50:00")
+
+        # A week without activities has no daily rows
+        empty = compose_weekly_metrics([])
+        self.assertEqual(empty["num_sessions"], 0)
+        self.assertEqual(empty["total_duration_formatted"], "00:00:00")
+        self.assertEqual(empty["time_in_hr_zones"].total, 0.0)
+        self.assertIsNone(empty["best_5k_formatted"])
+
+if __name__ == "__main__":
+    unittest.main()
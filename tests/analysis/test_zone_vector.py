@@ -0,0 +1,35 @@
+import copy
+import pickle
+import unittest
+from src.analysis.zone_vector import ZoneVector
+
+# PYTHONPATH=$(pwd)/src pytest tests/analysis/test_zone_vector.py -v
+class TestZoneVector(unittest.TestCase):
+
+    def test_dict_round_trip(self):
+        zones = ZoneVector.from_dict({"2": 1800.0, "5": 90.5})
+        self.assertEqual(zones.tolist(), [0.0, 1800.0, 0.0, 0.0, 90.5])
+        self.assertEqual(zones[2], 1800.0)
+        self.assertEqual(ZoneVector.from_dict(zones.to_dict()), zones)
+        self.assertEqual(zones.total, 1890.5)
+
+    def test_formatted(self):
+        zones = ZoneVector([0.0, 2700.0, 0.0, 0.0, 3661.0])
+        self.assertEqual(zones.formatted()["2"], "00:45:00")
+        self.assertEqual(zones.formatted()["5"], "01:01:01")
+        # Sports without activities that week report 0.0 placeholders
+        self.assertEqual(zones.formatted(has_activities=False), {str(zone): 0.0 for zone in range(1, 6)})
+
+    def test_fixed_length_and_copyable(self):
+        with self.assertRaises(ValueError):
+            ZoneVector([1.0, 2.0])
+        with self.assertRaises(IndexError):
+            ZoneVector()[0]
+        zones = ZoneVector([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(copy.deepcopy(zones), zones)
+        self.assertEqual(pickle.loads(pickle.dumps(zones)), zones)
+        self.assertFalse(hasattr(zones, "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from src.athlete.backfill_scheduler import BackfillScheduler
+
+# PYTHONPATH=$(pwd)/src pytest tests/athlete/test_backfill_scheduler.py -v
+class FakeAthlete:
+    """Records stage calls and how many fetches ran at the same time."""
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, user_id, fail_summaries=False):
+        self.user_id = user_id
+        self.fail_summaries = fail_summaries
+        self.calls = []
+
+    def fetch_historical_activities(self, days, refresh_summaries):
+        with FakeAthlete.lock:
+            FakeAthlete.active += 1
+            FakeAthlete.max_active = max(FakeAthlete.max_active, FakeAthlete.active)
+        time.sleep(0.01)
+        with FakeAthlete.lock:
+            FakeAthlete.active -= 1
+        self.calls.append(("fetch", days))
+
+    def backfill_weekly_summaries(self, days):
+        if self.fail_summaries:
+            raise RuntimeError("database unavailable")
+        self.calls.append(("summaries", days))
+
+
+class TestBackfillScheduler(unittest.TestCase):
+
+    def test_bounds_service_concurrency_and_isolates_failures(self):
+        FakeAthlete.max_active = 0
+        athletes = [FakeAthlete(i, fail_summaries=(i == 3)) for i in range(12)]
+        progress = []
+        scheduler = BackfillScheduler(max_workers=8, service_limits={"garmin": 2}, on_progress=progress.append)
+        status = scheduler.run(athletes, days=30)
+
+        self.assertLessEqual(FakeAthlete.max_active, 2)
+        self.assertEqual((status.completed, status.failed), (11, 1))
+        self.assertIn("database unavailable", status.failures[3])
+        self.assertEqual(len(progress), 12)
+        self.assertEqual(athletes[0].calls, [("fetch", 30), ("summaries", 30)])
+
+    def test_resumes_from_state_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state_path = Path(tmp) / "state.json"
+            athletes = [FakeAthlete(1), FakeAthlete(2, fail_summaries=True)]
+            BackfillScheduler(max_workers=2, state_path=state_path).run(athletes)
+
+            # Athlete 1 is done; athlete 2 resumes at the stage that failed
+            athletes = [FakeAthlete(1), FakeAthlete(2)]
+            scheduler = BackfillScheduler(max_workers=2, state_path=state_path)
+            self.assertEqual(scheduler.state.failed(), [2])
+            status = scheduler.run(athletes)
+
+            self.assertEqual((status.completed, status.skipped, status.failed), (2, 1, 0))
+            self.assertEqual(athletes[0].calls, [])
+            self.assertEqual(athletes[1].calls, [("summaries", 365)])
+            self.assertEqual(scheduler.state.failed(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Scripted stand-ins for psycopg2 connections, cursors and pools.
+
+Tests use them to check the SQL a class sends without a database. `render`
+turns psycopg2.sql composables into text with simplified quoting
+(identifiers in double quotes, placeholders as %(name)s) and collapses
+whitespace, so assertions can match on single-line fragments.
+"""
+
+from contextlib import contextmanager
+
+from psycopg2 import sql
+
+
+def render(query) -> str:
+    """Render a query string or psycopg2.sql composable without a connection."""
+    def parts(composable):
+        if isinstance(composable, sql.Composed):
+            return "".join(parts(part) for part in composable.seq)
+        if isinstance(composable, sql.Identifier):
+            return ".".join(f'"{name}"' for name in composable.strings)
+        if isinstance(composable, sql.Placeholder):
+            return f"%({composable.name})s" if composable.name else "%s"
+        if isinstance(composable, sql.Literal):
+            return repr(composable.wrapped)
+        if isinstance(composable, sql.SQL):
+            return composable.string
+        return composable
+
+    return " ".join(parts(query).split())
+
+
+class FakeCursor:
+    """Records executed statements and answers them from scripted results.
+
+    `respond(fragment, *results)` makes every statement containing `fragment`
+    return the next of `results`, repeating the last one. A result is a list
+    of rows, or an int for statements that only report a rowcount.
+    """
+
+    def __init__(self):
+        self.executed = []  # (rendered statement, params)
+        self._responses = []
+        self._rows = []
+        self.rowcount = -1
+
+    def respond(self, fragment, *results):
+        self._responses.append((fragment, list(results)))
+        return self
+
+    def statements(self, fragment):
+        """(statement, params) of every executed statement containing `fragment`."""
+        return [(text, params) for text, params in self.executed if fragment in text]
+
+    def execute(self, query, params=None):
+        text = render(query)
+        self.executed.append((text, params))
+        self._rows, self.rowcount = [], -1
+        for fragment, results in self._responses:
+            if fragment in text:
+                result = results.pop(0) if len(results) > 1 else results[0]
+                if isinstance(result, int):
+                    self.rowcount = result
+                else:
+                    self._rows = list(result)
+                    self.rowcount = len(self._rows)
+                break
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.autocommit = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """Hands out connections that all share one FakeCursor."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.connections = []
+
+    @contextmanager
+    def connection(self):
+        conn = FakeConnection(self.cursor)
+        self.connections.append(conn)
+        yield conn
+
+    @contextmanager
+    def autocommit_connection(self):
+        conn = FakeConnection(self.cursor)
+        conn.autocommit = True
+        self.connections.append(conn)
+        yield conn
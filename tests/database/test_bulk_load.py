@@ -0,0 +1,91 @@
+import unittest
+from datetime import date, datetime
+from src.database.bulk_load import CopyRowStream, format_copy_value
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_bulk_load.py -v
+COLUMNS = ("activity_id", "activity_name", "is_manual", "start_time", "splits")
+
+
+def rows(count):
+    return [
+        {
+            "activity_id": i,
+            "activity_name": f"Run\t{i}\nwith \\ and \\N",
+            "is_manual": i % 2 == 0,
+            "start_time": datetime(2026, 3, 3, 7, i % 60),
+            "splits": {"km": [i, i + 1]},
+        }
+        for i in range(count)
+    ]
+
+
+class TestFormatCopyValue(unittest.TestCase):
+
+    def test_escapes(self):
+        self.assertEqual(format_copy_value("a\tb"), "a\\tb")
+        self.assertEqual(format_copy_value("a\nb"), "a\\nb")
+        self.assertEqual(format_copy_value("a\r\nb"), "a\\r\\nb")
+        self.assertEqual(format_copy_value("C:\\fit"), "C:\\\\fit")
+        # A literal \N string must not read back as NULL
+        self.assertEqual(format_copy_value("\\N"), "\\\\N")
+
+    def test_types(self):
+        self.assertEqual(format_copy_value(None), "\\N")
+        self.assertEqual(format_copy_value(True), "t")
+        self.assertEqual(format_copy_value(False), "f")
+        self.assertEqual(format_copy_value(0), "0")
+        self.assertEqual(format_copy_value(3.5), "3.5")
+        self.assertEqual(format_copy_value(datetime(2026, 3, 3, 7, 30, 15)), "2026-03-03T07:30:15")
+        self.assertEqual(format_copy_value(date(2026, 3, 3)), "2026-03-03")
+        # JSONB values are JSON-encoded, then escaped like any other text
+        self.assertEqual(format_copy_value({"name": "a\tb", "laps": [1, None]}), '{"name": "a\\\\tb", "laps": [1, null]}')
+        self.assertEqual(format_copy_value([]), "[]")
+
+
+class TestCopyRowStream(unittest.TestCase):
+
+    def test_read_all(self):
+        stream = CopyRowStream(rows(2), COLUMNS)
+        text = stream.read()
+        lines = text.split("\n")
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[-1], "")
+        self.assertEqual(lines[0].split("\t"), [
+            "0", "Run\\t0\\nwith \\\\ and \\\\N", "t", "2026-03-03T07:00:00", '{"km": [0, 1]}'
+        ])
+        self.assertEqual(stream.rows_written, 2)
+        self.assertEqual(stream.read(), "")
+
+    def test_sized_reads_reassemble_full_read(self):
+        expected = CopyRowStream(rows(25), COLUMNS).read()
+        for size in (1, 2, 7, 64, len(expected), len(expected) + 1):
+            stream = CopyRowStream(rows(25), COLUMNS)
+            chunks = []
+            while True:
+                chunk = stream.read(size)
+                if not chunk:
+                    break
+                self.assertLessEqual(len(chunk), size)
+                chunks.append(chunk)
+            self.assertEqual("".join(chunks), expected, size)
+            self.assertEqual(stream.rows_written, 25, size)
+
+    def test_rows_written(self):
+        stream = CopyRowStream(rows(3), COLUMNS)
+        self.assertEqual(stream.rows_written, 0)
+        # Rows are encoded only as far as a read needs
+        stream.read(1)
+        self.assertEqual(stream.rows_written, 1)
+        stream.read(0)
+        self.assertEqual(stream.rows_written, 1)
+        stream.read()
+        self.assertEqual(stream.rows_written, 3)
+
+        # An empty chunk encodes nothing
+        empty = CopyRowStream([], COLUMNS)
+        self.assertEqual(empty.read(8192), "")
+        self.assertEqual(empty.read(), "")
+        self.assertEqual(empty.rows_written, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import unittest
+from src.database.column_backfill import BackfillProgress, ColumnBackfill
+from tests.database.fake_db import FakeCursor, FakePool, render
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_column_backfill.py -v
+KEY = ("user_id", "activity_id")
+
+
+class FakeBackfill(ColumnBackfill):
+    def __init__(self, cursor, **kwargs):
+        super().__init__("backfill_activities", "activity_category", key=KEY, job_name="job", **kwargs)
+        self.pool = FakePool(cursor)
+
+    def _get_connection(self):
+        return self.pool.connection()
+
+
+def backfill_cursor(checkpoint, *batches):
+    return (
+        FakeCursor()
+        .respond("information_schema.columns", [("user_id",), ("activity_id",), ("activity_category",)])
+        .respond("FROM column_backfill_checkpoints", [checkpoint] if checkpoint else [])
+        .respond("WITH batch AS", *batches)
+    )
+
+
+class TestColumnBackfill(unittest.TestCase):
+
+    def test_batch_sql(self):
+        backfill = ColumnBackfill("activities", "activity_category", value_sql="upper(activity_type)")
+        first = render(backfill._batch_sql(KEY, resume=False))
+        self.assertIn(
+            'SELECT "user_id", "activity_id" FROM "activities" ORDER BY "user_id", "activity_id" LIMIT %(batch_size)s',
+            first
+        )
+        self.assertIn('UPDATE "activities" SET "activity_category" = upper(activity_type)', first)
+        # Rows that already hold the value are not rewritten
+        self.assertIn('AND "activity_category" IS DISTINCT FROM upper(activity_type)', first)
+        # The batch's last key is the resume point
+        self.assertIn('FROM batch ORDER BY "user_id" DESC, "activity_id" DESC LIMIT 1', first)
+        self.assertNotIn("%(key0)s", first)
+
+        # Composite keys resume with a row comparison, combined with the filter
+        backfill = ColumnBackfill("activities", "activity_category", value="RUNNING", where_clause="user_id = 7")
+        resumed = render(backfill._batch_sql(KEY, resume=True))
+        self.assertIn(
+            'FROM "activities" WHERE ("user_id", "activity_id") > (%(key0)s, %(key1)s) AND (user_id = 7) ORDER BY',
+            resumed
+        )
+        self.assertIn('SET "activity_category" = %(value)s', resumed)
+        self.assertIn('IS DISTINCT FROM %(value)s', resumed)
+
+    def test_resumes_from_checkpoint(self):
+        cursor = backfill_cursor(
+            ([7, 100], 10, 4, None),
+            [(2, 1, [7, 102], None, None)],
+            [(1, 0, [7, 103], None, None)],
+        )
+        progress = FakeBackfill(cursor, value="RUNNING", batch_size=2).run()
+
+        # The interrupted run's checkpoint is kept
+        self.assertEqual(cursor.statements("INSERT INTO column_backfill_checkpoints"), [])
+        batches = cursor.statements("WITH batch AS")
+        self.assertIn('("user_id", "activity_id") > (%(key0)s, %(key1)s)', batches[0][0])
+        self.assertEqual(batches[0][1], {"batch_size": 2, "value": "RUNNING", "key0": 7, "key1": 100})
+        self.assertEqual(batches[1][1]["key1"], 102)
+
+        checkpoints = [params for _, params in cursor.statements("UPDATE column_backfill_checkpoints")]
+        self.assertEqual(checkpoints, [
+            (json.dumps([7, 102]), 12, 5, False, "job"),
+            (json.dumps([7, 103]), 13, 5, True, "job"),
+        ])
+        self.assertEqual((progress.rows_scanned, progress.rows_updated, progress.batches), (13, 5, 2))
+        self.assertEqual(progress.resumed_from, 10)
+        self.assertTrue(progress.done)
+
+    def test_finished_checkpoint_starts_over(self):
+        cursor = backfill_cursor(([7, 103], 13, 5, "2026-10-17"), [(0, 0, None, None, None)])
+        progress = FakeBackfill(cursor, value_sql="upper(activity_type)").run()
+
+        self.assertEqual(len(cursor.statements("INSERT INTO column_backfill_checkpoints")), 1)
+        (batch, params), = cursor.statements("WITH batch AS")
+        self.assertNotIn("%(key0)s", batch)
+        self.assertNotIn("key0", params)
+        # An empty table finishes without a last key
+        (_, checkpoint), = cursor.statements("UPDATE column_backfill_checkpoints")
+        self.assertEqual(checkpoint, (None, 0, 0, True, "job"))
+        self.assertEqual((progress.rows_scanned, progress.resumed_from), (0, 0))
+
+    def test_rows_per_second_excludes_resumed_rows(self):
+        progress = BackfillProgress(rows_scanned=1500, resumed_from=1000, elapsed_seconds=10.0)
+        self.assertEqual(progress.rows_per_second, 50.0)
+        self.assertEqual(BackfillProgress(rows_scanned=1500, resumed_from=1000).rows_per_second, 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from src.database.connection_pool import ConnectionPool, PoolTimeoutError, close_all_pools, get_pool
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_connection_pool.py -v
+class StubConnection:
+    """Just enough of a psycopg2 connection for the pool."""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.broken = False
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+        self.commits = 0
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, query):
+                if conn.broken:
+                    raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+        return Cursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+        def connect(**params):
+            self.connections.append(StubConnection())
+            return self.connections[-1]
+
+        patcher = mock.patch("psycopg2.connect", side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_all_pools)
+
+    def pool(self, **kwargs):
+        params = {"min_size": 0, "max_size": 2, "health_check_interval": 60.0, "checkout_timeout": 1.0}
+        params.update(kwargs)
+        return ConnectionPool({"host": "stub"}, **params)
+
+    def test_reuses_connections(self):
+        pool = self.pool(min_size=1)
+        with pool.connection() as conn:
+            pass
+        # The block's transaction is committed and the connection goes back to the pool
+        self.assertEqual(conn.commits, 1)
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+
+        stats = pool.stats()
+        self.assertEqual((stats.connections_created, stats.checkouts, stats.idle_connections), (1, 2, 1))
+
+    def test_blocks_at_max_size(self):
+        pool = self.pool(max_size=1, checkout_timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn()
+        self.assertEqual(pool.stats().checkout_timeouts, 1)
+
+        # A waiting checkout gets the connection as soon as it is returned
+        pool.checkout_timeout = 2.0
+        releaser = threading.Timer(0.05, pool.putconn, (conn,))
+        releaser.start()
+        started = time.monotonic()
+        self.assertIs(pool.getconn(), conn)
+        self.assertLess(time.monotonic() - started, 1.0)
+        releaser.join()
+        self.assertEqual(len(self.connections), 1)
+
+    def test_discards_broken_connections(self):
+        pool = self.pool(health_check_interval=0.0)
+        closed = pool.getconn()
+        broken = pool.getconn()
+        pool.putconn(closed)
+        pool.putconn(broken)
+        closed.closed = 1
+        broken.broken = True
+
+        # Idle connections are checked on checkout, most recently returned first
+        conn = pool.getconn()
+        self.assertNotIn(conn, (closed, broken))
+        stats = pool.stats()
+        self.assertEqual((stats.connections_discarded, stats.health_check_failures), (2, 1))
+        self.assertEqual(stats.open_connections, 1)
+
+        # A connection returned in an unknown transaction state is not pooled
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_UNKNOWN
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats().open_connections, 0)
+
+    def test_autocommit_connection(self):
+        pool = self.pool()
+        with pool.autocommit_connection() as conn:
+            self.assertTrue(conn.autocommit)
+        self.assertFalse(conn.autocommit)
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+
+    def test_get_pool_is_keyed_by_params(self):
+        pool = get_pool({"host": "a", "dbname": "garmin"})
+        self.assertIs(get_pool({"dbname": "garmin", "host": "a"}), pool)
+        self.assertIsNot(get_pool({"host": "b", "dbname": "garmin"}), pool)
+
+        with pool.connection() as conn:
+            pass
+        close_all_pools()
+        self.assertTrue(conn.closed)
+        with self.assertRaises(PoolError):
+            pool.getconn()
+        # A closed pool is replaced on the next lookup
+        self.assertIsNot(get_pool({"host": "a", "dbname": "garmin"}), pool)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime
+from src.database.fingerprint import FINGERPRINT_EXCLUDED_COLUMNS, activity_fingerprint, with_fingerprint
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_fingerprint.py -v
+ACTIVITY = {
+    "activity_id": 123,
+    "activity_type": "running",
+    "start_time": datetime(2026, 3, 3, 7, 30),
+    "duration": 3600.0,
+    "distance": 10000.0,
+    "average_hr": 145,
+    "hr_time_z2_seconds": None,
+}
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_independent_of_key_order(self):
+        reversed_activity = dict(reversed(list(ACTIVITY.items())))
+        self.assertEqual(activity_fingerprint(reversed_activity), activity_fingerprint(ACTIVITY))
+
+    def test_ignores_excluded_columns(self):
+        fingerprint = activity_fingerprint(ACTIVITY)
+        for column, value in [
+            ("fit_file_downloaded_at", datetime(2026, 10, 17, 12, 0)),
+            ("updated_at", datetime(2026, 10, 17, 12, 0)),
+            ("activity_category", "running"),
+        ]:
+            self.assertIn(column, FINGERPRINT_EXCLUDED_COLUMNS)
+            self.assertEqual(activity_fingerprint({**ACTIVITY, column: value}), fingerprint, column)
+            self.assertEqual(
+                activity_fingerprint({**ACTIVITY, column: value}),
+                activity_fingerprint({**ACTIVITY, column: "changed"}),
+                column
+            )
+
+        # A stored row already carrying its hash fingerprints the same
+        self.assertEqual(activity_fingerprint(with_fingerprint(ACTIVITY)), fingerprint)
+
+    def test_changes_with_real_fields(self):
+        fingerprint = activity_fingerprint(ACTIVITY)
+        for column, value in [
+            ("duration", 3601.0),
+            ("start_time", datetime(2026, 3, 3, 7, 31)),
+            ("hr_time_z2_seconds", 0.0),
+            ("average_hr", None),
+        ]:
+            self.assertNotEqual(activity_fingerprint({**ACTIVITY, column: value}), fingerprint, column)
+        # A new column is a change too
+        self.assertNotEqual(activity_fingerprint({**ACTIVITY, "max_hr": 180}), fingerprint)
+
+if __name__ == "__main__":
+    unittest.main()
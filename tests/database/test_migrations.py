@@ -0,0 +1,126 @@
+import unittest
+from unittest import mock
+from src.database.migrations import MIGRATIONS, AddColumn, CreateIndex, Migration, MigrationRunner, RunSQL
+from tests.database.fake_db import FakeCursor, FakePool
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_migrations.py -v
+class FailingStep(RunSQL):
+    def apply(self, cur):
+        super().apply(cur)
+        raise RuntimeError("step failed")
+
+
+def migrations():
+    return [
+        Migration(3, "three", [RunSQL("UPDATE t SET c = 1", lock="ROW EXCLUSIVE", blocks="writes")]),
+        Migration(1, "one", [RunSQL("SELECT 1", lock="none", blocks="nothing")]),
+        Migration(2, "two", [
+            AddColumn("t", "c", "INTEGER", default=0),
+            CreateIndex("idx_t_c", "t", "(c)"),
+        ]),
+    ]
+
+
+def migration_cursor(applied=(), lock_acquired=True):
+    return (
+        FakeCursor()
+        .respond("pg_partitioned_table", [("r", None)])
+        .respond("FROM schema_migrations", [(version, f"m{version}", None, 0.1) for version in applied])
+        .respond("pg_try_advisory_lock", [(lock_acquired,)])
+        .respond("pg_table_size", [(1200, 8192)])
+        .respond("pg_size_pretty", [("8192 bytes",)])
+    )
+
+
+class TestMigrationRunner(unittest.TestCase):
+
+    def run_with(self, cursor, method, *args):
+        pool = FakePool(cursor)
+        with mock.patch("src.database.migrations.get_pool", return_value=pool):
+            return getattr(MigrationRunner(migrations()), method)(*args)
+
+    def test_shipped_versions_are_sequential(self):
+        self.assertEqual([m.version for m in MIGRATIONS], list(range(1, len(MIGRATIONS) + 1)))
+
+    def test_pending_in_version_order_up_to_target(self):
+        cursor = migration_cursor(applied=[1])
+        self.assertEqual([m.version for m in self.run_with(cursor, "pending")], [2, 3])
+        self.assertEqual([m.version for m in self.run_with(cursor, "pending", 2)], [2])
+        self.assertEqual(self.run_with(cursor, "pending", 1), [])
+
+    def test_plan_describes_without_applying(self):
+        cursor = migration_cursor(applied=[1])
+        lines = self.run_with(cursor, "plan", 2)
+        self.assertEqual(lines, [
+            "0002 two",
+            "    ADD COLUMN t.c INTEGER DEFAULT 0",
+            "        lock: ACCESS EXCLUSIVE, catalog change only (blocks reads and writes, for milliseconds)",
+            "        cost: no table rewrite (~1,200 rows, 8192 bytes)",
+            "    CREATE INDEX CONCURRENTLY idx_t_c ON t (c)",
+            "        lock: SHARE UPDATE EXCLUSIVE (blocks other DDL and VACUUM only; reads and writes continue)",
+            "        cost: two scans of t (~1,200 rows, 8192 bytes) plus a sort",
+        ])
+        for statement, _ in cursor.executed:
+            self.assertFalse(statement.startswith(("BEGIN", "ALTER", "CREATE INDEX", "INSERT")), statement)
+
+    def test_apply_splits_transactional_and_concurrent_steps(self):
+        cursor = migration_cursor(applied=[1])
+        applied = self.run_with(cursor, "apply")
+        self.assertEqual([m.version for m in applied], [2, 3])
+
+        statements = [
+            statement for statement, _ in cursor.executed
+            if statement.startswith(("BEGIN", "COMMIT", "ALTER", "CREATE INDEX", "UPDATE", "INSERT", "SELECT pg_"))
+        ]
+        self.assertEqual(statements, [
+            "SELECT pg_try_advisory_lock(%s)",
+            # AddColumn runs in its own transaction
+            "BEGIN",
+            'ALTER TABLE "t" ADD COLUMN IF NOT EXISTS "c" INTEGER DEFAULT 0',
+            "COMMIT",
+            # CREATE INDEX CONCURRENTLY runs outside any transaction
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_t_c" ON "t" (c)',
+            "INSERT INTO schema_migrations (version, name, duration_seconds) VALUES (%s, %s, %s)",
+            "BEGIN",
+            "UPDATE t SET c = 1",
+            "COMMIT",
+            "INSERT INTO schema_migrations (version, name, duration_seconds) VALUES (%s, %s, %s)",
+            "SELECT pg_advisory_unlock(%s)",
+        ])
+        recorded = [params[:2] for _, params in cursor.statements("INSERT INTO schema_migrations")]
+        self.assertEqual(recorded, [(2, "two"), (3, "three")])
+
+    def test_apply_stops_at_target(self):
+        cursor = migration_cursor()
+        applied = self.run_with(cursor, "apply", 2)
+        self.assertEqual([m.version for m in applied], [1, 2])
+        self.assertEqual(cursor.statements("UPDATE t"), [])
+
+    def test_failed_step_rolls_back_and_is_not_recorded(self):
+        cursor = migration_cursor()
+        pool = FakePool(cursor)
+        runner = MigrationRunner([
+            Migration(1, "one", [FailingStep("UPDATE t SET c = 1", lock="ROW EXCLUSIVE", blocks="writes")]),
+        ])
+        with mock.patch("src.database.migrations.get_pool", return_value=pool):
+            with self.assertRaises(RuntimeError):
+                runner.apply()
+
+        statements = [statement for statement, _ in cursor.executed]
+        self.assertEqual(statements[statements.index("BEGIN"):], [
+            "BEGIN",
+            "SELECT set_config('lock_timeout', %s, true)",
+            "UPDATE t SET c = 1",
+            "ROLLBACK",
+            "SELECT pg_advisory_unlock(%s)",
+        ])
+        self.assertEqual(cursor.statements("INSERT INTO schema_migrations"), [])
+
+    def test_apply_refuses_while_another_runner_holds_the_lock(self):
+        cursor = migration_cursor(lock_acquired=False)
+        with self.assertRaisesRegex(RuntimeError, "Another process"):
+            self.run_with(cursor, "apply")
+        self.assertEqual(cursor.statements("BEGIN"), [])
+
+if __name__ == "__main__":
+    unittest.main()
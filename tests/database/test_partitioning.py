@@ -0,0 +1,169 @@
+import unittest
+from datetime import date, datetime
+from unittest import mock
+from src.database.partitioning import (
+    PartitionMigration, create_partitions, detach_partition, ensure_year_partitions, partition_by_sql, partition_key
+)
+from tests.database.fake_db import FakeCursor, FakePool, render
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_partitioning.py -v
+COLUMNS = [("activity_id",), ("user_id",), ("start_time",), ("updated_at",), ("duration",)]
+INDEXES = [("idx_activities_user", "CREATE INDEX idx_activities_user ON public.activities USING btree (user_id, start_time DESC)")]
+
+
+class TestPartitionDDL(unittest.TestCase):
+
+    def test_strategies(self):
+        self.assertEqual(partition_key("range"), ("activity_id", "start_time"))
+        self.assertEqual(partition_key("hash"), ("activity_id", "user_id"))
+        self.assertEqual(partition_key(None), ("activity_id",))
+        self.assertEqual(partition_by_sql("range"), "PARTITION BY RANGE (start_time)")
+        with self.assertRaisesRegex(ValueError, "Unknown partitioning strategy"):
+            partition_key("list")
+
+    def test_ensure_year_partitions(self):
+        cursor = FakeCursor().respond("FROM pg_inherits", [("activities_y2025", "FOR VALUES FROM ...")])
+        self.assertEqual(ensure_year_partitions(cursor, [2026, 2025, 2026]), ["activities_y2026"])
+        (statement, params), = cursor.statements("CREATE TABLE")
+        self.assertEqual(
+            statement,
+            'CREATE TABLE "activities_y2026" PARTITION OF "activities" FOR VALUES FROM (%(lower)s) TO (%(upper)s)'
+        )
+        self.assertEqual(params, {"lower": date(2026, 1, 1), "upper": date(2027, 1, 1)})
+
+        # Rows of the new year move out of the default partition before it is attached
+        cursor = FakeCursor().respond("FROM pg_inherits", [("activities_default", "DEFAULT")])
+        ensure_year_partitions(cursor, [2026])
+        (statement, _), = cursor.statements("CREATE TABLE")
+        self.assertEqual(statement, " ".join("""
+            CREATE TABLE "activities_y2026" (LIKE "activities" INCLUDING DEFAULTS);
+            WITH moved AS ( DELETE FROM "activities_default"
+            WHERE start_time >= %(lower)s AND start_time < %(upper)s RETURNING * )
+            INSERT INTO "activities_y2026" SELECT * FROM moved;
+            ALTER TABLE "activities" ATTACH PARTITION "activities_y2026" FOR VALUES FROM (%(lower)s) TO (%(upper)s);
+        """.split()))
+
+    def test_hash_partitions(self):
+        cursor = FakeCursor()
+        create_partitions(cursor, "hash", hash_partitions=2)
+        self.assertEqual(cursor.executed, [
+            ('CREATE TABLE IF NOT EXISTS "activities_h0" PARTITION OF "activities" '
+             'FOR VALUES WITH (MODULUS %s, REMAINDER %s)', (2, 0)),
+            ('CREATE TABLE IF NOT EXISTS "activities_h1" PARTITION OF "activities" '
+             'FOR VALUES WITH (MODULUS %s, REMAINDER %s)', (2, 1)),
+        ])
+
+    def test_detach_partition(self):
+        def detach(partitions, **kwargs):
+            cursor = FakeCursor().respond("FROM pg_inherits", partitions)
+            pool = FakePool(cursor)
+            with mock.patch("src.database.partitioning.get_pool", return_value=pool), mock.patch("builtins.print"):
+                detach_partition("activities_y2016", **kwargs)
+            statement, = [text for text, _ in cursor.statements("DETACH")]
+            self.assertTrue(pool.connections[-1].autocommit)
+            return statement
+
+        year = ("activities_y2016", "FOR VALUES FROM ('2016-01-01') TO ('2017-01-01')")
+        self.assertEqual(detach([year]), 'ALTER TABLE "activities" DETACH PARTITION "activities_y2016" CONCURRENTLY')
+        # PostgreSQL refuses a concurrent detach while a default partition exists
+        self.assertEqual(
+            detach([year, ("activities_default", "DEFAULT")]),
+            'ALTER TABLE "activities" DETACH PARTITION "activities_y2016"'
+        )
+        with self.assertRaisesRegex(ValueError, "not a partition"):
+            detach([("activities_y2017", "FOR VALUES ...")])
+
+
+class TestPartitionMigration(unittest.TestCase):
+
+    def test_create_target(self):
+        cursor = (
+            FakeCursor()
+            .respond("MIN(start_time)", [(2024,)])
+            .respond("pg_get_indexdef", INDEXES)
+        )
+        PartitionMigration("range")._create_target(cursor, datetime(2026, 10, 17, 12, 0))
+        statements = [text for text, _ in cursor.executed]
+
+        self.assertEqual(statements[0], (
+            'CREATE TABLE "activities_partitioned" ( LIKE "activities" INCLUDING DEFAULTS, '
+            'PRIMARY KEY ("activity_id", "start_time") ) PARTITION BY RANGE ("start_time")'
+        ))
+        self.assertEqual(cursor.executed[1], ('COMMENT ON TABLE "activities_partitioned" IS %s', ("2026-10-17T12:00:00",)))
+        # One partition per year from the oldest activity through next year, plus a default
+        years = [params["lower"].year for _, params in cursor.statements("FOR VALUES FROM")]
+        self.assertEqual(years, [2024, 2025, 2026, 2027])
+        self.assertIn('CREATE TABLE IF NOT EXISTS "activities_default" PARTITION OF "activities_partitioned" DEFAULT', statements)
+        self.assertEqual(statements[-1], (
+            'CREATE INDEX "idx_activities_user_partitioned" ON "activities_partitioned" '
+            'USING btree (user_id, start_time DESC)'
+        ))
+
+    def test_catch_up_predicate(self):
+        cursor = FakeCursor().respond("information_schema.columns", COLUMNS)
+        statement = render(PartitionMigration("hash")._apply_changes_sql(cursor))
+
+        self.assertIn('SELECT "activity_id", "user_id", "start_time", "updated_at", "duration" '
+                      'FROM "activities" WHERE updated_at >= %(since)s', statement)
+        # Rows whose partition key changed are removed from their old partition first
+        self.assertIn('DELETE FROM "activities_partitioned" t USING changed c WHERE t.activity_id = c.activity_id '
+                      'AND t."user_id" IS DISTINCT FROM c."user_id"', statement)
+        self.assertIn('ON CONFLICT ("activity_id", "user_id") DO UPDATE SET "start_time" = EXCLUDED."start_time", '
+                      '"updated_at" = EXCLUDED."updated_at", "duration" = EXCLUDED."duration" '
+                      'WHERE "activities_partitioned".updated_at IS DISTINCT FROM EXCLUDED.updated_at', statement)
+
+    def test_catch_up_until_a_pass_is_small(self):
+        marks = [datetime(2026, 10, 17, 12, minute) for minute in range(3)]
+        cursor = (
+            FakeCursor()
+            .respond("information_schema.columns", COLUMNS)
+            .respond("pg_stat_activity", *[[(mark,)] for mark in marks])
+            .respond("WITH changed AS", 12, 3)
+        )
+        started = datetime(2026, 10, 17, 11, 0)
+        with mock.patch("src.database.partitioning.get_pool", return_value=FakePool(cursor)):
+            since = PartitionMigration("range", batch_size=5).catch_up(started)
+
+        # Each pass applies rows updated since the mark taken before the previous pass
+        self.assertEqual(since, marks[1])
+        passes = [params for _, params in cursor.statements("WITH changed AS")]
+        self.assertEqual(passes, [{"since": started}, {"since": marks[0]}])
+
+    def test_swap_renames_under_one_lock(self):
+        cursor = (
+            FakeCursor()
+            .respond("information_schema.columns", COLUMNS)
+            .respond("FROM pg_constraint", [("activities_pkey",)])
+            .respond("pg_get_indexdef", INDEXES)
+            .respond("WITH changed AS", 0)
+        )
+        pool = FakePool(cursor)
+        since = datetime(2026, 10, 17, 12, 0)
+        with mock.patch("src.database.partitioning.get_pool", return_value=pool):
+            PartitionMigration("range").swap(since)
+
+        statements = [
+            text for text, _ in cursor.executed
+            if not text.startswith("SELECT") or text.startswith("SELECT set_config")
+        ]
+        self.assertEqual(statements[:2], [
+            "SELECT set_config('lock_timeout', %s, true)",
+            'LOCK TABLE "activities" IN ACCESS EXCLUSIVE MODE',
+        ])
+        self.assertTrue(statements[2].startswith("WITH changed AS"))
+        self.assertEqual(cursor.statements("WITH changed AS")[0][1], {"since": since})
+        self.assertEqual(statements[3:], [
+            'DROP INDEX "activities_migration_updated_at"',
+            'ALTER TABLE "activities" RENAME TO "activities_unpartitioned"',
+            'ALTER INDEX "activities_pkey" RENAME TO "activities_unpartitioned_pkey"',
+            'ALTER INDEX "idx_activities_user" RENAME TO "idx_activities_user_unpartitioned"',
+            'ALTER TABLE "activities_partitioned" RENAME TO "activities"',
+            'ALTER INDEX "activities_partitioned_pkey" RENAME TO "activities_pkey"',
+            'ALTER INDEX "idx_activities_user_partitioned" RENAME TO "idx_activities_user"',
+            'COMMENT ON TABLE "activities" IS NULL',
+        ])
+        # Everything happens in the one locked transaction
+        self.assertEqual([conn.commits for conn in pool.connections], [1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from src.database.personal_records_db import _frontier
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_personal_records.py -v
+def best_since(entries, since, lower_is_better):
+    values = [value for start_time, _, value in entries if start_time >= since]
+    if not values:
+        return None
+    return min(values) if lower_is_better else max(values)
+
+
+class TestPersonalRecords(unittest.TestCase):
+
+    def test_frontier_drops_dominated_entries(self):
+        day = datetime(2024, 1, 1)
+        entries = [
+            (day, 1, 1500.0),
+            (day + timedelta(days=1), 2, 1600.0),  # beaten by the later 1550
+            (day + timedelta(days=2), 3, 1550.0),
+            (day + timedelta(days=3), 4, 1550.0),  # a later tie replaces 3
+        ]
+        frontier = _frontier(entries, lower_is_better=True)
+        self.assertEqual(sorted(entry[1] for entry in frontier), [1, 4])
+
+    def test_earliest_frontier_entry_is_best_since(self):
+        random.seed(1)
+        day = datetime(2024, 1, 1)
+        entries = [(day + timedelta(hours=random.randint(0, 5000)), i, float(random.randint(1, 100))) for i in range(300)]
+        for lower_is_better in (True, False):
+            # Merging in batches gives the same frontier as computing it at once
+            frontier = []
+            for start in range(0, len(entries), 40):
+                frontier = _frontier(frontier + entries[start:start + 40], lower_is_better)
+            self.assertEqual(frontier, _frontier(entries, lower_is_better))
+
+            for hours in range(0, 5000, 250):
+                since = day + timedelta(hours=hours)
+                in_window = sorted(entry for entry in frontier if entry[0] >= since)
+                expected = best_since(entries, since, lower_is_better)
+                self.assertEqual(in_window[0][2] if in_window else None, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from src.database.row_mapping import record_type, SchemaRegistry
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_row_mapping.py -v
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def execute(self, query, params=None):
+        self.queries += 1
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestRowMapping(unittest.TestCase):
+
+    def test_record_access(self):
+        Record = record_type(("activity_id", "duration", "vo2_max"))
+        record = Record._make((1, 3600.0, None))
+
+        # Attribute, key and index access
+        self.assertEqual(record.duration, 3600.0)
+        self.assertEqual(record["activity_id"], 1)
+        self.assertEqual(record[1], 3600.0)
+
+        # Dict-style helpers
+        self.assertIsNone(record.get("vo2_max"))
+        self.assertEqual(record.get("missing", 0), 0)
+        self.assertIn("duration", record)
+        self.assertEqual(record.to_dict(), {"activity_id": 1, "duration": 3600.0, "vo2_max": None})
+
+        with self.assertRaises(KeyError):
+            record["missing"]
+
+    def test_record_type_is_cached(self):
+        self.assertIs(record_type(("a", "b")), record_type(("a", "b")))
+        self.assertIsNot(record_type(("a", "b")), record_type(("a", "c")))
+
+    def test_schema_registry_caches_until_invalidated(self):
+        registry = SchemaRegistry()
+        cur = FakeCursor([("activity_id",), ("duration",)])
+
+        self.assertEqual(registry.columns(cur, "activities"), ("activity_id", "duration"))
+        registry.columns(cur, "activities")
+        self.assertEqual(cur.queries, 1)
+
+        registry.invalidate("activities")
+        registry.columns(cur, "activities")
+        self.assertEqual(cur.queries, 2)
+
+    def test_schema_registry_primary_key(self):
+        registry = SchemaRegistry()
+        cur = FakeCursor([("activity_id",), ("start_time",)])
+
+        self.assertEqual(registry.primary_key(cur, "activities"), ("activity_id", "start_time"))
+        registry.primary_key(cur, "activities")
+        self.assertEqual(cur.queries, 1)
+
+        # Invalidating all tables also drops cached keys
+        registry.invalidate()
+        registry.primary_key(cur, "activities")
+        self.assertEqual(cur.queries, 2)
+
+    def test_schema_registry_validate(self):
+        registry = SchemaRegistry()
+        cur = FakeCursor([("activity_id",), ("duration",)])
+
+        self.assertEqual(registry.validate(cur, "activities", ["duration"]), ["duration"])
+        with self.assertRaises(ValueError):
+            registry.validate(cur, "activities", ["duration; DROP TABLE activities"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+from datetime import datetime
+from src.database.summary_cache import LocalSharedCache, LRUCache, SummaryCache, week_starts_between
+
+# PYTHONPATH=$(pwd)/src pytest tests/database/test_summary_cache.py -v
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def __call__(self, keys):
+        self.calls.append(list(keys))
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+class TestSummaryCache(unittest.TestCase):
+
+    def test_lru_eviction_and_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(2, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=10)
+        cache.get("a")  # "a" is now most recently used
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.evictions, 1)
+
+        cache.set("d", 4, ttl=10)
+        clock.now = 10
+        self.assertEqual(cache.get("d"), (False, None))
+
+    def test_read_through_and_negative_caching(self):
+        cache = SummaryCache(local=LRUCache(10))
+        loader = CountingLoader({"w1": {"total": 1.0}})
+
+        self.assertEqual(cache.get_many({"w1": None, "w2": None}, loader), {"w1": {"total": 1.0}, "w2": None})
+        self.assertEqual(cache.get_many({"w1": None, "w2": None}, loader), {"w1": {"total": 1.0}, "w2": None})
+        self.assertEqual(loader.calls, [["w1", "w2"]])
+
+        stats = cache.stats()
+        self.assertEqual((stats.local_hits, stats.misses), (2, 2))
+        self.assertEqual(stats.hit_rate, 0.5)
+
+    def test_shared_tier_survives_new_container(self):
+        shared = LocalSharedCache()
+        start = datetime(2024, 1, 1)
+        loader = CountingLoader({"w1": {"start_date": start}})
+
+        SummaryCache(local=LRUCache(10), shared=shared).get_many({"w1": None}, loader)
+        cold = SummaryCache(local=LRUCache(10), shared=shared)
+
+        # Datetimes round-trip through the shared tier's JSON encoding
+        self.assertEqual(cold.get_many({"w1": None}, loader), {"w1": {"start_date": start}})
+        self.assertEqual(len(loader.calls), 1)
+        self.assertEqual(cold.stats().shared_hits, 1)
+
+    def test_invalidation(self):
+        shared = LocalSharedCache()
+        cache = SummaryCache(local=LRUCache(10), shared=shared)
+        loader = CountingLoader({"w1": 1})
+        cache.get_many({"w1": None}, loader)
+
+        loader.values["w1"] = 2
+        cache.invalidate(["w1"])
+        self.assertEqual(cache.get_many({"w1": None}, loader), {"w1": 2})
+        self.assertEqual(cache.stats().invalidations, 1)
+
+    def test_invalidation_during_load_is_not_overwritten(self):
+        shared = LocalSharedCache()
+        reader = SummaryCache(local=LRUCache(10), shared=shared)
+        writer = SummaryCache(local=LRUCache(10), shared=shared)
+        rows = {"wk": "old"}
+
+        def load_then_write(keys):
+            loaded = {key: rows[key] for key in keys}
+            # The writer commits and invalidates after the reader's query, before its fill
+            rows["wk"] = "new"
+            writer.invalidate(["wk"])
+            return loaded
+
+        self.assertEqual(reader.get_many({"wk": None}, load_then_write), {"wk": "old"})
+        self.assertEqual(shared.get_many(["wk"]), {})
+        self.assertEqual(reader.get_many({"wk": None}, lambda keys: dict(rows)), {"wk": "new"})
+        self.assertEqual(SummaryCache(local=LRUCache(10), shared=shared).get_many({"wk": None}, dict), {"wk": "new"})
+
+    def test_local_invalidation_during_load_is_not_overwritten(self):
+        cache = SummaryCache(local=LRUCache(10))
+        rows = {"wk": "old"}
+
+        def load_then_write(keys):
+            loaded = {key: rows[key] for key in keys}
+            rows["wk"] = "new"
+            cache.invalidate(["wk"])
+            return loaded
+
+        cache.get_many({"wk": None}, load_then_write)
+        self.assertEqual(cache.get_many({"wk": None}, lambda keys: dict(rows)), {"wk": "new"})
+
+    def test_shared_tier_bounds_completed_weeks(self):
+        class RecordingSharedCache(LocalSharedCache):
+            ttls = []
+
+            def set_many_if_unchanged(self, items, guards, ttl=None):
+                self.ttls.append(ttl)
+                return super().set_many_if_unchanged(items, guards, ttl)
+
+        shared = RecordingSharedCache()
+        cache = SummaryCache(local=LRUCache(10), shared=shared, current_week_ttl=60, shared_ttl=3600)
+        cache.get_many({"done": None, "current": 60}, lambda keys: {key: 1 for key in keys})
+        self.assertEqual(sorted(shared.ttls), [60, 3600])
+
+    def test_generation_bumps_are_atomic_across_containers(self):
+        shared = LocalSharedCache()
+        first = SummaryCache(local=LRUCache(10), shared=shared)
+        second = SummaryCache(local=LRUCache(10), shared=shared)
+        # Both containers hold generation 0 locally when they bump
+        self.assertEqual((first.generation("athlete:1"), second.generation("athlete:1")), (0, 0))
+        first.bump_generation("athlete:1")
+        second.bump_generation("athlete:1")
+        self.assertEqual(SummaryCache(local=LRUCache(10), shared=shared).generation("athlete:1"), 2)
+
+    def test_generations(self):
+        cache = SummaryCache(local=LRUCache(10))
+        self.assertEqual(cache.generation("athlete:1"), 0)
+        cache.bump_generation("athlete:1")
+        self.assertEqual(cache.generation("athlete:1"), 1)
+        self.assertEqual(cache.generation("athlete:2"), 0)
+
+    def test_current_week_gets_short_ttl(self):
+        cache = SummaryCache(local=LRUCache(10), current_week_ttl=60, clock=lambda: datetime(2024, 1, 10))
+        self.assertIsNone(cache.ttl_for_week(datetime(2024, 1, 1)))
+        self.assertEqual(cache.ttl_for_week(datetime(2024, 1, 8)), 60)
+
+    def test_week_starts_between(self):
+        self.assertEqual(
+            week_starts_between(datetime(2024, 1, 3, 12), datetime(2024, 1, 15)),
+            [datetime(2024, 1, 1), datetime(2024, 1, 8), datetime(2024, 1, 15)]
+        )
+
+if __name__ == "__main__":
+    unittest.main()
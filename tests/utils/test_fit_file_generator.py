@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.utils.fit_cache import FitCache
+# The generator checks phase types against the schema classes it imports itself
+from src.utils.fit_file_generator import FitFileGenerator, TrainingPlan
+
+# PYTHONPATH=$(pwd)/src pytest tests/utils/test_fit_file_generator.py -v
+INTENSITY = {"effort": "easy", "pace_min": 2.5, "pace_max": 3.0, "perceived_exertion_min": 2, "perceived_exertion_max": 3}
+
+
+def training_plan(num_weeks):
+    def workout(week, day):
+        return {
+            "workout_type": "run",
+            "workout_subtype": ["easy"],
+            "scheduled_date": f"2026-02-{week * 7 + day + 1:02d}",
+            "total_distance": {"value": 8000, "unit": "meters"},
+            "estimated_duration": {"value": 2700, "unit": "seconds"},
+            "terrain": "road",
+            "phases": [{
+                "type": "steady_state", "duration_type": "time", "duration_value": 2700,
+                "duration_unit": "seconds", "intensity": INTENSITY, "notes": "",
+            }],
+            "additional_instructions": "",
+        }
+
+    return TrainingPlan.model_validate({
+        "plan_duration": {"value": num_weeks, "unit": "weeks"},
+        "athlete_level": "beginner",
+        "primary_goal": "5k",
+        "plan_notes": "",
+        "weeks": [{
+            "week_number": week + 1,
+            "start_date": f"2026-02-{week * 7 + 1:02d}",
+            "end_date": f"2026-02-{week * 7 + 7:02d}",
+            "area_of_focus": "base_training",
+            "total_distance": {"value": 24000, "unit": "meters"},
+            "total_time": {"value": 8100, "unit": "seconds"},
+            "workouts": [workout(week, day) for day in range(3)],
+            "rest_days": [],
+            "week_notes": "",
+        } for week in range(num_weeks)],
+    })
+
+
+class CountingGenerator(FitFileGenerator):
+    encoded = 0
+
+    def _encode_workout(self, workout):
+        self.encoded += 1
+        return super()._encode_workout(workout)
+
+
+class TestFitCache(unittest.TestCase):
+
+    def test_regenerating_plan_reencodes_only_changed_workouts(self):
+        plan = training_plan(3)
+        with tempfile.TemporaryDirectory() as output_dir:
+            first = CountingGenerator(output_dir)
+            artifacts = first.generate_workout_artifacts(plan)
+            self.assertEqual(first.encoded, 9)
+            original = {workout_id: a.fit_file_path.read_bytes() for workout_id, a in artifacts.items()}
+
+            plan.weeks[1].workouts[0].phases[0].duration_value = 3000
+            # A new generator starts from the manifest written by the first one
+            second = CountingGenerator(output_dir)
+            artifacts = second.generate_workout_artifacts(plan)
+            self.assertEqual(second.encoded, 1)
+
+            changed = [
+                workout_id for workout_id, a in artifacts.items()
+                if a.fit_file_path.read_bytes() != original[workout_id]
+            ]
+            self.assertEqual(changed, ["week2_2026-02-08_easy"])
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FitCache(Path(directory), max_bytes=20)
+            cache.put("a", b"x" * 8)
+            cache.put("b", b"y" * 8)
+            self.assertEqual(cache.get("a"), b"x" * 8)
+            cache.put("c", b"z" * 8)
+
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.size_bytes, 16)
+            cache.save()
+            self.assertEqual(FitCache(Path(directory)).get("c"), b"z" * 8)
+
+
+class TestPlanGeneration(unittest.TestCase):
+
+    def test_parallel_generation_matches_sequential_and_collects_errors(self):
+        plan = training_plan(2)
+        plan.weeks[1].workouts[2].phases[0].duration_value = -1
+
+        with tempfile.TemporaryDirectory() as sequential_dir, tempfile.TemporaryDirectory() as parallel_dir:
+            sequential = FitFileGenerator(sequential_dir, cache_max_bytes=0).generate_plan_artifacts(plan)
+            parallel = FitFileGenerator(parallel_dir, cache_max_bytes=0).generate_plan_artifacts(plan, max_workers=2)
+
+            self.assertEqual(list(parallel.artifacts), list(sequential.artifacts))
+            self.assertEqual(len(parallel.artifacts), 5)
+            self.assertEqual(list(parallel.errors), ["week2_2026-02-10_easy"])
+            self.assertIn("Duration must be positive", parallel.errors["week2_2026-02-10_easy"])
+            # Only complete files are left behind, no temporary ones
+            self.assertEqual(sorted(os.listdir(parallel_dir)), sorted(os.listdir(sequential_dir)))
+            for workout_id, artifacts in parallel.artifacts.items():
+                # Files differ only in their creation timestamp
+                self.assertEqual(
+                    len(artifacts.fit_file_path.read_bytes()),
+                    len(sequential.artifacts[workout_id].fit_file_path.read_bytes())
+                )
+
+    def test_in_memory_generation_writes_nothing(self):
+        plan = training_plan(1)
+        with tempfile.TemporaryDirectory() as working_dir:
+            cwd = os.getcwd()
+            os.chdir(working_dir)
+            try:
+                result = FitFileGenerator(None).generate_plan_artifacts(plan)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(os.listdir(working_dir), [])
+
+        self.assertEqual(result.errors, {})
+        for artifacts in result.artifacts.values():
+            self.assertIsNone(artifacts.fit_file_path)
+            # A FIT file starts with a 12-byte header ending in ".FIT"
+            self.assertEqual(artifacts.fit_bytes[8:12], b".FIT")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = CountingGenerator(output_dir)
+            workout = plan.weeks[0].workouts[0]
+            self.assertEqual(generator.encode_workout(workout), generator.encode_workout(workout))
+            self.assertEqual(generator.encoded, 1)
+            self.assertEqual(sorted(os.listdir(output_dir)), ["fit_cache", "fit_cache.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
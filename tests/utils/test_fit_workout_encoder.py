@@ -0,0 +1,70 @@
+import unittest
+
+from src.utils.fit_crc import crc16
+# The encoder checks phase types against the schema classes it imports itself
+from src.utils.fit_workout_encoder import Workout, encode_workout
+from src.utils.fit_file_generator import FitFileGenerator
+
+# PYTHONPATH=$(pwd)/src pytest tests/utils/test_fit_workout_encoder.py -v
+TIME_CREATED_MS = 1767225600123
+
+
+def phase(phase_type, duration_type, duration_value, pace_min=2.5, pace_max=3.0):
+    return {
+        "type": phase_type, "duration_type": duration_type, "duration_value": duration_value,
+        "duration_unit": "seconds" if duration_type == "time" else "meters",
+        "intensity": {"effort": "moderate", "pace_min": pace_min, "pace_max": pace_max,
+                      "perceived_exertion_min": 3, "perceived_exertion_max": 6},
+        "notes": "",
+    }
+
+
+def workout(phases):
+    return Workout.model_validate({
+        "workout_type": "run",
+        "workout_subtype": ["tempo"],
+        "scheduled_date": "2026-03-03",
+        "total_distance": {"value": 10000, "unit": "meters"},
+        "estimated_duration": {"value": 3600, "unit": "seconds"},
+        "terrain": "road",
+        "phases": phases,
+        "additional_instructions": "",
+    })
+
+
+class TestStructEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = FitFileGenerator(None)
+
+    def test_matches_fit_file_builder(self):
+        workouts = [
+            workout([]),
+            workout([phase("steady_state", "distance", 10000.55, 2.95, 3.456)]),
+            workout([
+                phase("warmup", "time", 600.5),
+                {"type": "interval_set", "repetitions": 5, "intervals": [
+                    phase("work", "distance", 1000, 3.8, 4.1),
+                    phase("recovery", "time", 90, 2.0, 2.4),
+                ]},
+                {"type": "interval_set", "repetitions": 0, "intervals": [phase("work", "time", 60)]},
+                phase("cooldown", "time", 4294.967),
+            ]),
+        ]
+        for w in workouts:
+            expected = self.generator._encode_workout_with_builder(w, TIME_CREATED_MS)
+            self.assertEqual(encode_workout(w, TIME_CREATED_MS), expected)
+            # A file's CRC covers everything before it, so the whole file checks to 0
+            self.assertEqual(crc16(expected), 0)
+
+    def test_rejects_what_fit_file_builder_rejects(self):
+        too_long = workout([phase("steady_state", "time", 4295)])
+        with self.assertRaises(ValueError) as builder_error:
+            self.generator._encode_workout_with_builder(too_long, TIME_CREATED_MS)
+        with self.assertRaises(ValueError) as struct_error:
+            encode_workout(too_long, TIME_CREATED_MS)
+        self.assertEqual(str(struct_error.exception), str(builder_error.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()